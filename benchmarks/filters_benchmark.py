@@ -0,0 +1,58 @@
+"""
+Compares the throughput of filters over batches of items. All the filters
+evaluate the same predicate.
+
+Usage: python benchmarks/filters_benchmark.py [batch_size ...]
+"""
+import random
+import sys
+import timeit
+
+from exporters.filters.key_value_filters import KeyValueFilter
+from exporters.filters.pythonexp_filter import PythonexpFilter
+from exporters.filters.vectorized_filter import VectorizedFilter
+from exporters.meta import ExportMeta
+from exporters.records.base_record import BaseRecord
+
+
+FILTERS = [
+    ('KeyValueFilter', KeyValueFilter, {'keys': [
+        {'name': 'address.country', 'value': ['es', 'uk'], 'operator': 'in'},
+        {'name': 'name', 'value': 'item1', 'operator': 're_match'},
+    ]}),
+    ('PythonexpFilter', PythonexpFilter, {
+        'python_expression': "item['address']['country'] in ('es', 'uk')"
+                             " and re.match('item1', item['name'])",
+    }),
+    ('VectorizedFilter', VectorizedFilter, {
+        'expression': "address.country in ['es', 'uk'] and name.match('item1')",
+        'batch_size': 100000,
+    }),
+]
+
+
+def make_batch(size):
+    return [
+        BaseRecord({
+            'name': 'item%d' % i,
+            'price': random.randint(0, 1000),
+            'address': {'country': random.choice(['es', 'uk', 'us', 'fr'])},
+            'description': 'x' * 100,
+        })
+        for i in range(size)
+    ]
+
+
+def run(batch_sizes, repeat=3):
+    for batch_size in batch_sizes:
+        batch = make_batch(batch_size)
+        print('batch size: {}'.format(batch_size))
+        for name, filter_class, options in FILTERS:
+            batch_filter = filter_class({'options': options}, ExportMeta(None))
+            seconds = min(timeit.repeat(
+                lambda: list(batch_filter.filter_batch(batch)), number=1, repeat=repeat))
+            print('  {:<20} {:>10.0f} items/s'.format(name, batch_size / seconds))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or [10000, 100000])
@@ -0,0 +1,97 @@
+"""
+Compares the throughput of the filter, transform and grouper stages when
+chaining their batch methods and when running them as a fused pipeline.
+
+Usage: python benchmarks/pipeline_benchmark.py [batch_size ...]
+"""
+import random
+import sys
+import timeit
+
+from exporters.filters.key_value_filters import KeyValueFilter
+from exporters.filters.no_filter import NoFilter
+from exporters.groupers.file_key_grouper import FileKeyGrouper
+from exporters.groupers.no_grouper import NoGrouper
+from exporters.meta import ExportMeta
+from exporters.pipeline.fused_pipeline import FusedPipeline
+from exporters.records.base_record import BaseRecord
+from exporters.transform.no_transform import NoTransform
+from exporters.transform.pythonexp_transform import PythonexpTransform
+
+
+def defaults():
+    return [
+        NoFilter({}, ExportMeta(None)),
+        NoTransform({}, ExportMeta(None)),
+        NoFilter({}, ExportMeta(None)),
+        NoGrouper({}, ExportMeta(None)),
+    ]
+
+
+def configured():
+    return [
+        KeyValueFilter({'options': {'keys': [
+            {'name': 'address.country', 'value': ['es', 'uk', 'us'], 'operator': 'in'},
+        ]}}, ExportMeta(None)),
+        PythonexpTransform({'options': {'python_expressions': [
+            "item.update(total=item['price'] * 2)",
+        ]}}, ExportMeta(None)),
+        NoFilter({}, ExportMeta(None)),
+        FileKeyGrouper({'options': {'keys': ['address.country']}}, ExportMeta(None)),
+    ]
+
+
+PIPELINES = [
+    ('defaults', defaults),
+    ('configured', configured),
+]
+
+
+def with_batch_methods(stages):
+    filter_before, transform, filter_after, grouper = stages
+    return [
+        (filter_before, filter_before.filter_batch),
+        (transform, transform.transform_batch),
+        (filter_after, filter_after.filter_batch),
+        (grouper, grouper.group_batch),
+    ]
+
+
+def chained(stages):
+    def process_batch(batch):
+        for _, process_stage in with_batch_methods(stages):
+            batch = process_stage(batch)
+        return batch
+    return process_batch
+
+
+def fused(stages):
+    return FusedPipeline(with_batch_methods(stages)).process_batch
+
+
+def make_batch(size):
+    return [
+        BaseRecord({
+            'name': 'item%d' % i,
+            'price': random.randint(0, 1000),
+            'address': {'country': random.choice(['es', 'uk', 'us', 'fr'])},
+        })
+        for i in range(size)
+    ]
+
+
+def run(batch_sizes, repeat=3):
+    for batch_size in batch_sizes:
+        batch = make_batch(batch_size)
+        print('batch size: {}'.format(batch_size))
+        for name, make_stages in PIPELINES:
+            for mode, build in [('chained', chained), ('fused', fused)]:
+                process_batch = build(make_stages())
+                seconds = min(timeit.repeat(
+                    lambda: list(process_batch(batch)), number=1, repeat=repeat))
+                print('  {:<20} {:>10.0f} items/s'.format(
+                    '{} ({})'.format(name, mode), batch_size / seconds))
+
+
+if __name__ == '__main__':
+    run([int(size) for size in sys.argv[1:]] or [10000, 100000])
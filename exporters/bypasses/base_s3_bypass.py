@@ -16,6 +16,7 @@ class BaseS3Bypass(BaseBypass):
         - No grouper module is set up.
         - writer has no option items_limit set in configuration.
         - writer has default items_per_buffer_write and size_per_buffer_write per default.
+        - reader has no option incremental_manifest set in configuration.
     """
 
     def __init__(self, config, metadata):
@@ -39,6 +40,9 @@ class BaseS3Bypass(BaseBypass):
         if not config.grouper_options['name'].endswith('NoGrouper'):
             cls._log_skip_reason('custom grouper configured')
             return False
+        if config.reader_options['options'].get('incremental_manifest'):
+            cls._log_skip_reason('incremental manifest configuration (incremental_manifest)')
+            return False
         if config.writer_options['options'].get('items_limit'):
             cls._log_skip_reason('items limit configuration (items_limit)')
             return False
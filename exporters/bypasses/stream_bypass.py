@@ -126,6 +126,9 @@ class StreamBypass(BaseBypass):
         reader = module_loader.load_reader(self.config.reader_options, self.metadata)
         writer = module_loader.load_writer(self.config.writer_options, self.metadata)
         with closing(reader), closing(writer):
+            if not self.bypass_state.state_position:
+                # a new job, it doesn't add streams read by unfinished ones to the manifest
+                reader.set_last_position(None)
             for stream in reader.get_read_streams():
                 if stream.filename not in self.bypass_state.skipped:
                     ensure_tell_method(stream.file_obj)
@@ -136,9 +139,11 @@ class StreamBypass(BaseBypass):
                         if hasattr(stream, 'close'):
                             stream.close()
                     logging.log(logging.INFO, 'Finished copying file {}'.format(stream.filename))
+                    reader.add_stream_to_manifest(stream.filename)
                     self.bypass_state.commit_copied(stream.filename, stream.size)
                 else:
                     logging.log(logging.INFO, 'Skip file {}'.format(stream.filename))
+            reader.finish_reading()
 
     def close(self):
         if self.bypass_state:
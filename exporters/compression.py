@@ -1,25 +1,337 @@
 import gzip
+import io
 import os
+import struct
+import sys
+import time
 import zipfile
+import zlib
+from multiprocessing.pool import ThreadPool
 from exporters.exceptions import UnsupportedCompressionFormat
 
 
+class CountingFile(object):
+    """
+    File opened in append mode that keeps count of its size as bytes are
+    written to it, so that it never needs to be stat'ed again. If digests
+    are given, they are updated with the written bytes, so the file doesn't
+    need to be read again to hash it.
+
+    If memory_size is given and the file doesn't exist yet, the bytes are
+    kept in memory until there are more than memory_size of them, then they
+    are moved to the file. If the file is closed while in memory, its bytes
+    are left in the content attribute, and nothing is written to disk.
+    """
+
+    def __init__(self, path, digests=None, memory_size=0, **options):
+        self.name = path
+        self.mode = 'ab'
+        self.digests = digests
+        self.memory_size = memory_size
+        self.content = None
+        if memory_size and not os.path.exists(path):
+            self.file = io.BytesIO()
+            self.size = 0
+        else:
+            self.file = open(path, 'ab')
+            self.size = os.fstat(self.file.fileno()).st_size
+
+    @property
+    def compressed_size(self):
+        return self.size
+
+    @property
+    def in_memory(self):
+        return isinstance(self.file, io.BytesIO)
+
+    def write(self, content):
+        self.file.write(content)
+        self.size += len(content)
+        if self.digests is not None:
+            self.digests.update(content)
+        if self.size > self.memory_size and self.in_memory:
+            self.spill()
+
+    def spill(self):
+        """
+        Moves the bytes kept in memory to the file, the next ones are
+        written to the file too.
+        """
+        if self.in_memory:
+            content = self.file.getvalue()
+            self.file = open(self.name, 'ab')
+            self.file.write(content)
+
+    def flush(self):
+        self.file.flush()
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        if self.in_memory:
+            self.content = self.file.getvalue()
+        self.file.close()
+
+    def discard(self):
+        """
+        Closes the file without moving the bytes kept in memory to it, and
+        drops the next bytes written. For files that are deleted anyway.
+        """
+        self.file.close()
+        self.file = open(os.devnull, 'wb')
+
+
+def open_uncompressed_file(path, compression_level=None, **options):
+    return CountingFile(path, **options)
+
+
+class GzipCountingFile(gzip.GzipFile):
+    """
+    Appends a new gzip member to a file, counting the compressed bytes
+    written to it.
+    """
+
+    def __init__(self, path, compression_level=None, **options):
+        if compression_level is None:
+            compression_level = 9
+        self.raw_file = CountingFile(path, **options)
+        gzip.GzipFile.__init__(self, path, 'ab', compression_level, fileobj=self.raw_file)
+
+    @property
+    def compressed_size(self):
+        return self.raw_file.size
+
+    def close(self):
+        try:
+            gzip.GzipFile.close(self)
+        finally:
+            self.raw_file.close()
+
+
+# size of the blocks compressed in parallel, as in pigz
+PARALLEL_GZIP_BLOCK_SIZE = 128 * 1024
+# zlib only accepts a preset dictionary for compression from python 3.3
+_ZDICT_SUPPORTED = sys.version_info >= (3, 3)
+_compression_pools = {}
+
+
+def _get_compression_pool(threads):
+    """
+    Returns a thread pool shared by all the files compressed with the same
+    number of threads.
+    """
+    if threads not in _compression_pools:
+        _compression_pools[threads] = ThreadPool(threads)
+    return _compression_pools[threads]
+
+
+def _deflate_block(block, compression_level, dictionary):
+    # zlib releases the GIL while compressing
+    if dictionary:
+        compressor = zlib.compressobj(
+            compression_level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    # a sync flush ends the block on a byte boundary without ending the
+    # deflate stream, so blocks can be concatenated
+    return compressor.compress(block) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+class ParallelGzipFile(object):
+    """
+    Appends a new gzip member to a file, compressing its content in blocks
+    on a pool of threads, like pigz does. The blocks are joined in order in
+    a single deflate stream, so the output is a regular gzip file. Each
+    block is primed with the end of the previous one when zlib supports
+    it, otherwise the ratio is a bit worse than with a single compressor.
+
+    The compressed bytes written to the file are counted, they lag behind
+    the content written while blocks are being compressed.
+    """
+
+    def __init__(self, path, compression_level=None, compression_threads=2,
+                 block_size=PARALLEL_GZIP_BLOCK_SIZE, **options):
+        if compression_level is None:
+            compression_level = 9
+        self.compression_level = compression_level
+        self.block_size = block_size
+        self.pool = _get_compression_pool(compression_threads)
+        # bounds the memory used by blocks waiting to be written
+        self.max_pending_blocks = 2 * compression_threads
+        self.pending_blocks = []
+        self.buffer = []
+        self.buffered_size = 0
+        self.previous_block = None
+        self.crc = zlib.crc32(b'')
+        self.size = 0
+        self.raw_file = CountingFile(path, **options)
+        # no file name, no modification flags, unknown OS
+        self.raw_file.write(b'\x1f\x8b\x08\x00' + struct.pack('<L', int(time.time())) +
+                            b'\x00\xff')
+
+    @property
+    def compressed_size(self):
+        return self.raw_file.size
+
+    def write(self, content):
+        self.buffer.append(content)
+        self.buffered_size += len(content)
+        if self.buffered_size >= self.block_size:
+            self._compress_buffer()
+
+    def _compress_buffer(self):
+        data = b''.join(self.buffer)
+        self.buffer = []
+        self.buffered_size = 0
+        for start in range(0, len(data), self.block_size):
+            self._compress_block(data[start:start + self.block_size])
+
+    def _compress_block(self, block):
+        self.crc = zlib.crc32(block, self.crc)
+        self.size += len(block)
+        dictionary = None
+        if _ZDICT_SUPPORTED and self.previous_block:
+            dictionary = self.previous_block[-32 * 1024:]
+        self.previous_block = block
+        self.pending_blocks.append(self.pool.apply_async(
+            _deflate_block, (block, self.compression_level, dictionary)))
+        while len(self.pending_blocks) > self.max_pending_blocks:
+            self._write_next_block()
+
+    def _write_next_block(self):
+        self.raw_file.write(self.pending_blocks.pop(0).get())
+
+    def close(self):
+        try:
+            if self.buffer:
+                self._compress_buffer()
+            while self.pending_blocks:
+                self._write_next_block()
+            # an empty final block ends the deflate stream
+            final_block = zlib.compressobj(
+                self.compression_level, zlib.DEFLATED, -zlib.MAX_WBITS).flush()
+            self.raw_file.write(final_block + struct.pack(
+                '<LL', self.crc & 0xffffffff, self.size & 0xffffffff))
+        finally:
+            self.raw_file.close()
+
+
+def open_gzip_file(path, compression_threads=None, **options):
+    """
+    Opens a gzip file, compressed in parallel if compression_threads
+    is greater than one.
+    """
+    if compression_threads and compression_threads > 1:
+        return ParallelGzipFile(path, compression_threads=compression_threads, **options)
+    return GzipCountingFile(path, **options)
+
+
+# general purpose flag for sizes and crc written after the data
+ZIP_DATA_DESCRIPTOR_FLAG = 0x08
+ZIP64_VERSION = 45
+# zip64 extra field with the sizes left empty, as in the local header
+ZIP64_LOCAL_EXTRA = struct.pack('<HHQQ', 1, 16, 0, 0)
+
+
 class StreamZipFile(object):
+    """
+    Zip file with a single entry, deflated as content is written to it. The
+    crc and sizes of the entry go after its data, in a data descriptor, so
+    the file is written only once. As the entry size isn't known when its
+    local header is written, the header always has a zip64 extra field, and
+    the data descriptor has 8 byte sizes. The other zip64 records are only
+    added if the sizes don't fit in the usual ones.
 
-    def __init__(self, path):
+    A suspended file ends its deflate block and returns the entry state,
+    a resumed file receives it back and appends more blocks to the entry.
+    """
+
+    def __init__(self, path, compression_level=None, resume_state=None, **options):
+        if compression_level is None:
+            compression_level = zlib.Z_DEFAULT_COMPRESSION
         self.path = path
-        os.mknod(self.path)
-        self.tmp_filename = path[:-4]
-        self.tmp_file = open(self.tmp_filename, 'a')
+        self.arcname = os.path.basename(path)[:-4].encode('utf-8')
+        self.header_size = (struct.calcsize(zipfile.structFileHeader) + len(self.arcname) +
+                            len(ZIP64_LOCAL_EXTRA))
+        self.compressor = zlib.compressobj(compression_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        self.raw_file = CountingFile(path, **options)
+        if resume_state:
+            self.crc, self.size, self.dos_time, self.dos_date = resume_state
+        else:
+            self.crc, self.size = zlib.crc32(b''), 0
+            self.dos_time, self.dos_date = self._get_dos_date_time()
+            self._write_local_header()
+
+    @property
+    def compressed_size(self):
+        return self.raw_file.size
+
+    def _get_dos_date_time(self):
+        year, month, day, hour, minute, second = time.localtime()[:6]
+        return (hour << 11 | minute << 5 | second // 2,
+                (year - 1980) << 9 | month << 5 | day)
+
+    def _write_local_header(self):
+        # crc and sizes are left empty, they are in the data descriptor
+        header = struct.pack(
+            zipfile.structFileHeader, zipfile.stringFileHeader, ZIP64_VERSION, 0,
+            ZIP_DATA_DESCRIPTOR_FLAG, zipfile.ZIP_DEFLATED, self.dos_time, self.dos_date,
+            0, 0xffffffff, 0xffffffff, len(self.arcname), len(ZIP64_LOCAL_EXTRA))
+        self.raw_file.write(header + self.arcname + ZIP64_LOCAL_EXTRA)
 
     def write(self, content):
-        self.tmp_file.write(content)
+        self.crc = zlib.crc32(content, self.crc)
+        self.size += len(content)
+        compressed = self.compressor.compress(content)
+        if compressed:
+            self.raw_file.write(compressed)
+
+    def suspend(self):
+        """
+        Ends the current deflate block on a byte boundary, without ending the
+        entry, and closes the file. Returns the state needed to resume it.
+        """
+        self.raw_file.write(self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        self.raw_file.close()
+        return self.crc, self.size, self.dos_time, self.dos_date
 
     def close(self):
-        self.tmp_file.close()
-        filename = os.path.basename(self.tmp_filename)
-        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.write(self.tmp_filename, arcname=filename)
+        try:
+            self.raw_file.write(self.compressor.flush())
+            crc = self.crc & 0xffffffff
+            compressed_size = self.raw_file.size - self.header_size
+            zip64 = max(self.size, compressed_size) > zipfile.ZIP64_LIMIT
+            self.raw_file.write(struct.pack(
+                '<4sLQQ', b'PK\x07\x08', crc, compressed_size, self.size))
+            self._write_central_directory(crc, compressed_size, zip64)
+        finally:
+            self.raw_file.close()
+
+    def _write_central_directory(self, crc, compressed_size, zip64):
+        central_directory_offset = self.raw_file.size
+        extra = b''
+        sizes = compressed_size, self.size
+        if zip64:
+            extra = struct.pack('<HHQQ', 1, 16, self.size, compressed_size)
+            sizes = 0xffffffff, 0xffffffff
+        central_directory = struct.pack(
+            zipfile.structCentralDir, zipfile.stringCentralDir, ZIP64_VERSION, 3, ZIP64_VERSION,
+            0, ZIP_DATA_DESCRIPTOR_FLAG, zipfile.ZIP_DEFLATED, self.dos_time, self.dos_date,
+            crc, sizes[0], sizes[1], len(self.arcname), len(extra), 0, 0, 0,
+            0o600 << 16, 0) + self.arcname + extra
+        self.raw_file.write(central_directory)
+        if zip64:
+            end_offset = self.raw_file.size
+            self.raw_file.write(struct.pack(
+                zipfile.structEndArchive64, zipfile.stringEndArchive64, 44, ZIP64_VERSION,
+                ZIP64_VERSION, 0, 0, 1, 1, len(central_directory), central_directory_offset))
+            self.raw_file.write(struct.pack(
+                zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator, 0,
+                end_offset, 1))
+        self.raw_file.write(struct.pack(
+            zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0, 1, 1,
+            len(central_directory), min(central_directory_offset, 0xffffffff), 0))
 
 
 def get_compress_file(compression_format):
@@ -28,12 +340,38 @@ def get_compress_file(compression_format):
     return FILE_COMPRESSION[compression_format]
 
 
+def get_compression_extension(compression_format):
+    """
+    Returns the file extension for a compression format, None if the
+    files are not compressed.
+    """
+    if compression_format == 'none':
+        return None
+    return COMPRESSION_EXTENSIONS.get(compression_format, compression_format)
+
+
+# Compressed files opened by FILE_COMPRESSION factories should keep
+# count of the bytes written to disk in their compressed_size attribute.
+# Factories receive the path and the compression options: compression_level,
+# None for the codec default, compression_dictionary, for zstd, and
+# compression_threads, for gz. Other options are given to the CountingFile
+# the compressed bytes are written to: the digests to update with them and
+# the memory_size to keep them in memory.
 FILE_COMPRESSION = {
-    'gz': lambda path: gzip.open(path, 'a'),
+    'gz': open_gzip_file,
     'zip': StreamZipFile,
-    'none': lambda path: open(path, 'a'),
+    'none': open_uncompressed_file,
 }
 
+# valid compression_level ranges, the other formats don't support it
+COMPRESSION_LEVELS = {
+    'gz': (0, 9),
+    'zip': (0, 9),
+}
+
+# formats whose file extension is not the format name
+COMPRESSION_EXTENSIONS = {}
+
 
 try:
     from bz2file import BZ2File
@@ -41,4 +379,118 @@ except ImportError:
     import logging
     logging.info('Install bz2file to enable BZ2 compression.')
 else:
-    FILE_COMPRESSION['bz2'] = lambda path: BZ2File(path, 'a')
+    class BZ2CountingFile(BZ2File):
+        """
+        Appends a new bz2 stream to a file, counting the compressed bytes
+        written to it.
+        """
+
+        def __init__(self, path, compression_level=None, **options):
+            if compression_level is None:
+                compression_level = 9
+            self.raw_file = CountingFile(path, **options)
+            BZ2File.__init__(self, self.raw_file, 'a', compresslevel=compression_level)
+
+        @property
+        def compressed_size(self):
+            return self.raw_file.size
+
+        def close(self):
+            try:
+                BZ2File.close(self)
+            finally:
+                self.raw_file.close()
+
+    FILE_COMPRESSION['bz2'] = BZ2CountingFile
+    COMPRESSION_LEVELS['bz2'] = (1, 9)
+
+
+try:
+    import zstandard
+except ImportError:
+    import logging
+    logging.info('Install zstandard to enable zstd compression.')
+else:
+    _zstd_dictionaries = {}
+
+    def _load_zstd_dictionary(path, compression_level):
+        """
+        Loads a trained zstd dictionary (as made by zstd --train) only once,
+        it is shared by all the files written with it.
+        """
+        key = (path, compression_level)
+        if key not in _zstd_dictionaries:
+            with open(path, 'rb') as f:
+                dictionary = zstandard.ZstdCompressionDict(f.read())
+            dictionary.precompute_compress(level=compression_level)
+            _zstd_dictionaries[key] = dictionary
+        return _zstd_dictionaries[key]
+
+    class ZstdCountingFile(object):
+        """
+        Appends a new zstd frame to a file, counting the compressed bytes
+        written to it. A trained dictionary can be given in the
+        compression_dictionary option, it improves the ratio a lot for
+        small files.
+        """
+
+        def __init__(self, path, compression_level=None, compression_dictionary=None,
+                     **options):
+            if compression_level is None:
+                compression_level = 3
+            self.raw_file = CountingFile(path, **options)
+            kwargs = {}
+            if compression_dictionary:
+                kwargs['dict_data'] = _load_zstd_dictionary(
+                    compression_dictionary, compression_level)
+            # compressors can't be shared between open files
+            compressor = zstandard.ZstdCompressor(level=compression_level, **kwargs)
+            self.file = compressor.stream_writer(self.raw_file)
+
+        @property
+        def compressed_size(self):
+            return self.raw_file.size
+
+        def write(self, content):
+            self.file.write(content)
+
+        def close(self):
+            # ends the frame and closes the raw file
+            self.file.close()
+
+    FILE_COMPRESSION['zstd'] = ZstdCountingFile
+    COMPRESSION_LEVELS['zstd'] = (1, 22)
+    COMPRESSION_EXTENSIONS['zstd'] = 'zst'
+
+
+try:
+    import lz4.frame
+except ImportError:
+    import logging
+    logging.info('Install lz4 to enable LZ4 compression.')
+else:
+    class LZ4CountingFile(lz4.frame.LZ4FrameFile):
+        """
+        Appends a new LZ4 frame to a file, counting the compressed bytes
+        written to it.
+        """
+
+        def __init__(self, path, compression_level=None, **options):
+            if compression_level is None:
+                compression_level = lz4.frame.COMPRESSIONLEVEL_MIN
+            self.raw_file = CountingFile(path, **options)
+            lz4.frame.LZ4FrameFile.__init__(
+                self, self.raw_file, 'wb', compression_level=compression_level)
+
+        @property
+        def compressed_size(self):
+            return self.raw_file.size
+
+        def close(self):
+            try:
+                lz4.frame.LZ4FrameFile.close(self)
+            finally:
+                self.raw_file.close()
+
+    FILE_COMPRESSION['lz4'] = LZ4CountingFile
+    COMPRESSION_LEVELS['lz4'] = (0, lz4.frame.COMPRESSIONLEVEL_MAX)
@@ -3,23 +3,70 @@ from exporters.records.base_record import BaseRecord
 import json
 import csv
 
-__all__ = ['BaseDeserializer', 'JsonLinesDeserializer', 'CSVDeserializer']
+__all__ = ['BaseDeserializer', 'JsonLinesDeserializer', 'CSVDeserializer',
+           'AvroDeserializer']
 
 
 class BaseDeserializer(BasePipelineItem):
+    # fields to keep in deserialized records, None to keep them all
+    projection = None
+
+    def set_projection(self, fields):
+        """
+        Sets the only fields that will be kept in deserialized records.
+        """
+        self.projection = None if fields is None else frozenset(fields)
+
     def deserialize(self, stream):
         raise NotImplementedError()
 
 
 class JsonLinesDeserializer(BaseDeserializer):
     def deserialize(self, stream):
+        projection = self.projection
+        if projection is None:
+            for line in stream.iterlines():
+                yield BaseRecord(json.loads(line))
+            return
         for line in stream.iterlines():
-            yield BaseRecord(json.loads(line))
+            item = json.loads(line)
+            # dropped values are released right away instead of going through the pipeline
+            yield BaseRecord((key, item[key]) for key in projection if key in item)
 
 
 class CSVDeserializer(BaseDeserializer):
     def deserialize(self, stream):
         stream.mode = "lines"
-        reader = csv.DictReader(stream)
-        for item in reader:
-            yield BaseRecord(item)
+        if self.projection is None:
+            reader = csv.DictReader(stream)
+            for item in reader:
+                yield BaseRecord(item)
+            return
+        reader = csv.reader(stream)
+        try:
+            header = next(reader)
+        except StopIteration:
+            return
+        columns = [(index, field) for index, field in enumerate(header)
+                   if field in self.projection]
+        for row in reader:
+            if not row:
+                continue
+            yield BaseRecord((field, row[index] if index < len(row) else None)
+                             for index, field in columns)
+
+
+class AvroDeserializer(BaseDeserializer):
+    """
+    Reads Avro object container files, decoding them block by block.
+    """
+
+    def deserialize(self, stream):
+        import fastavro
+        projection = self.projection
+        if projection is None:
+            for record in fastavro.reader(stream):
+                yield BaseRecord(record)
+            return
+        for record in fastavro.reader(stream):
+            yield BaseRecord((key, record[key]) for key in projection if key in record)
@@ -1,5 +1,7 @@
 from .json_export_formatter import JsonExportFormatter
 from .xml_export_formatter import XMLExportFormatter  # NOQA
 from .csv_export_formatter import CSVExportFormatter  # NOQA
+from .parquet_export_formatter import ParquetExportFormatter  # NOQA
+from .avro_export_formatter import AvroExportFormatter  # NOQA
 
 DEFAULT_FORMATTER_CLASS = JsonExportFormatter
@@ -0,0 +1,177 @@
+import six
+from collections import OrderedDict
+from exporters.exceptions import ConfigurationError
+from exporters.export_formatter.base_export_formatter import (
+    BaseExportFormatter, WriteOnlyFile)
+
+
+AVRO_CODECS = ('null', 'deflate', 'snappy', 'zstandard')
+
+
+def infer_type(values):
+    """
+    Returns the avro type of the given values, a union if they have
+    different types. Integers are also allowed to be floats, and values
+    that are all nulls to be strings, for the values of later items.
+    """
+    types = OrderedDict()
+    map_values, array_items = [], []
+    for value in values:
+        if value is None:
+            types['null'] = 'null'
+        elif isinstance(value, bool):
+            types['boolean'] = 'boolean'
+        elif isinstance(value, six.integer_types):
+            types['long'] = 'long'
+        elif isinstance(value, float):
+            types['double'] = 'double'
+        elif isinstance(value, six.string_types):
+            types['string'] = 'string'
+        elif isinstance(value, dict):
+            types['map'] = None
+            map_values.extend(six.itervalues(value))
+        elif isinstance(value, (list, tuple)):
+            types['array'] = None
+            array_items.extend(value)
+        else:
+            raise TypeError('Unsupported data type for avro: %s (%s)' % (
+                value, type(value).__name__))
+    if 'map' in types:
+        types['map'] = {'type': 'map', 'values': infer_type(map_values)}
+    if 'array' in types:
+        types['array'] = {'type': 'array', 'items': infer_type(array_items)}
+    if 'long' in types:
+        types['double'] = 'double'
+    if not types or list(types) == ['null']:
+        return ['null', 'string']
+    if len(types) == 1:
+        return list(types.values())[0]
+    return list(types.values())
+
+
+def infer_schema(items, name):
+    """
+    Returns a record schema with the fields of the given items. Fields are
+    nullable, as they may be missing in other items.
+    """
+    fields = sorted(set(key for item in items for key in item))
+    schema_fields = []
+    for field in fields:
+        field_type = infer_type([item.get(field) for item in items])
+        if not isinstance(field_type, list):
+            field_type = [field_type]
+        field_type = ['null'] + [t for t in field_type if t != 'null']
+        schema_fields.append({'name': field, 'type': field_type, 'default': None})
+    return {'type': 'record', 'name': name, 'fields': schema_fields}
+
+
+class AvroFileWriter(object):
+    """
+    Writes items to an Avro object container file, in blocks of about
+    sync_interval bytes compressed with codec.
+
+    If the formatter has no schema, it's inferred from the first batch of
+    items written to the file, see infer_type. Items that don't match it
+    later on, like a field that had only numbers getting a string, or fields
+    missing in the first batch, raise a ValueError, so the schema option
+    should be set when fields vary.
+    """
+
+    def __init__(self, write, schema, record_name, codec, sync_interval):
+        self.file = WriteOnlyFile(write)
+        self.schema = schema
+        self.record_name = record_name
+        self.codec = codec
+        self.sync_interval = sync_interval
+        self.writer = None
+        # names of the inferred schema fields
+        self.fields = None
+
+    def _open_writer(self, items):
+        import fastavro
+        from fastavro.write import Writer
+        schema = self.schema
+        if not schema:
+            schema = infer_schema(items, self.record_name)
+            self.fields = set(field['name'] for field in schema['fields'])
+        self.writer = Writer(self.file, fastavro.parse_schema(schema), codec=self.codec,
+                             sync_interval=self.sync_interval)
+
+    def _check_new_fields(self, items):
+        new_fields = set(key for item in items for key in item) - self.fields
+        if new_fields:
+            raise ValueError('Fields {} are not in the avro schema inferred from the first '
+                             'items, set the formatter schema option'.format(sorted(new_fields)))
+
+    def write_batch(self, items):
+        if self.writer is None:
+            self._open_writer(items)
+        elif self.fields is not None:
+            self._check_new_fields(items)
+        write = self.writer.write
+        for item in items:
+            write(item)
+
+    def close(self):
+        """
+        Writes the last block.
+        """
+        if self.writer is None:
+            self._open_writer([])
+        self.writer.flush()
+
+
+class AvroExportFormatter(BaseExportFormatter):
+    """
+    This export formatter provides a way of exporting items in Avro object container files,
+    compressed by the formatter, so the writer compression must be none. Avro group files
+    can't be resumed, so when more than max_open_group_files groups are written, the least
+    recently used group files are ended and written, and the group continues in a new file.
+
+        - schema(dict)
+            Avro schema of the items. If not given, a record schema with nullable fields is
+            inferred from the first items of every file. Integer fields also accept floats,
+            and fields with only nulls accept strings, but items with other types or fields
+            than the first ones fail
+
+        - record_name(str)
+            Name of the inferred record schema
+
+        - codec(str)
+            Compression codec of the file blocks, one of null, deflate, snappy or zstandard
+
+        - sync_interval(int)
+            Approximate size in bytes of the file blocks, before compression
+    """
+    file_extension = 'avro'
+    item_separator = ''
+    writes_files = True
+
+    supported_options = {
+        'schema': {'type': dict, 'default': {}},
+        'record_name': {'type': six.string_types, 'default': 'Item'},
+        'codec': {'type': six.string_types, 'default': 'deflate'},
+        'sync_interval': {'type': six.integer_types, 'default': 64000},
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(AvroExportFormatter, self).__init__(*args, **kwargs)
+        self.schema = self.read_option('schema')
+        self.record_name = self.read_option('record_name')
+        self.codec = self.read_option('codec')
+        if self.codec not in AVRO_CODECS:
+            raise ConfigurationError('The avro codec can only be one of the '
+                                     'following: "{}"'.format(AVRO_CODECS))
+        self.sync_interval = self.read_option('sync_interval')
+
+    def format(self, item):
+        raise NotImplementedError('Avro items can only be written to files')
+
+    def open_file_writer(self, write):
+        return AvroFileWriter(write, self.schema, self.record_name, self.codec,
+                              self.sync_interval)
+
+    def get_required_fields(self):
+        if self.schema.get('type') == 'record':
+            return set(field['name'] for field in self.schema.get('fields', []))
+        return None
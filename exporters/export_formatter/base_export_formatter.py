@@ -1,10 +1,41 @@
 from exporters.pipeline.base_pipeline_item import BasePipelineItem
 
 
+class WriteOnlyFile(object):
+    """
+    File object passing the bytes written to it to a write function, for the
+    libraries used by file writers, see open_file_writer.
+    """
+    closed = False
+
+    def __init__(self, write):
+        self._write = write
+        self.position = 0
+
+    def write(self, data):
+        self._write(data)
+        self.position += len(data)
+
+    def tell(self):
+        return self.position
+
+    def seekable(self):
+        return False
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
 class BaseExportFormatter(BasePipelineItem):
 
     file_extension = None
     item_separator = '\n'
+    # formatters of binary file formats (like Parquet) set it, and write the
+    # items of a file through open_file_writer() instead of format()
+    writes_files = False
 
     def __init__(self, options, metadata=None):
         super(BaseExportFormatter, self).__init__(options, metadata)
@@ -12,8 +43,30 @@ class BaseExportFormatter(BasePipelineItem):
     def format(self, item):
         raise NotImplementedError
 
+    def format_batch(self, items):
+        """
+        Returns the formatted items joined by item_separator, in a single
+        string. Formatters can redefine it to format whole batches faster.
+        """
+        return self.item_separator.join([self.format(item) for item in items])
+
+    def open_file_writer(self, write):
+        """
+        Returns an object writing items to a file through the write function,
+        with write_batch(items) and close() methods. Only used when
+        writes_files is set.
+        """
+        raise NotImplementedError
+
     def format_header(self):
         return ''
 
     def format_footer(self):
         return ''
+
+    def get_required_fields(self):
+        """
+        Returns the set of item fields this formatter needs, or None if it may
+        need any of them. Used to compute the exporter projection.
+        """
+        return None
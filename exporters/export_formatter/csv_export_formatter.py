@@ -37,6 +37,7 @@ class CSVExportFormatter(BaseExportFormatter):
         self.show_titles = self.read_option('show_titles')
         self.delimiter = self.read_option('delimiter')
         self.fields = self._get_fields()
+        self._output, self._writerows = self._get_rows_writer()
 
     def _get_fields_from_schema(self):
         schema = self.read_option('schema')
@@ -54,19 +55,30 @@ class CSVExportFormatter(BaseExportFormatter):
             return key, value.encode('utf-8')
         return key, value
 
+    def _encode_value(self, value):
+        if isinstance(value, six.text_type):
+            return value.encode('utf-8')
+        if isinstance(value, (dict, list, tuple)):
+            from boltons.iterutils import remap
+            return remap(value, visit=self._encode_string)
+        return value
+
     def _create_csv_writer(self, outputf):
         return csv.DictWriter(outputf, fieldnames=self.fields,
                               quoting=csv.QUOTE_NONNUMERIC,
                               delimiter=self.delimiter,
                               extrasaction='ignore')
 
-    def _item_to_csv(self, item):
-        from boltons.iterutils import remap
+    def _get_rows_writer(self):
+        # rows are written to a buffer that is emptied after every batch
         output = io.BytesIO()
-        writer = self._create_csv_writer(output)
-        item = remap(item, visit=self._encode_string)
-        writer.writerow(item)
-        return output.getvalue().rstrip()
+        writer = csv.writer(output, quoting=csv.QUOTE_NONNUMERIC,
+                            delimiter=self.delimiter, lineterminator='\n')
+        return output, writer.writerows
+
+    def _get_row(self, item):
+        encode, get = self._encode_value, item.get
+        return [encode(get(field, '')) for field in self.fields]
 
     def format_header(self):
         if self.show_titles:
@@ -76,4 +88,13 @@ class CSVExportFormatter(BaseExportFormatter):
             return output.getvalue().rstrip() + '\n'
 
     def format(self, item):
-        return self._item_to_csv(item)
+        return self.format_batch([item])
+
+    def format_batch(self, items):
+        self._output.seek(0)
+        self._output.truncate()
+        self._writerows([self._get_row(item) for item in items])
+        return self._output.getvalue()[:-1]
+
+    def get_required_fields(self):
+        return set(self.fields)
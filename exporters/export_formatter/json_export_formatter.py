@@ -6,7 +6,7 @@ from exporters.export_formatter.base_export_formatter import BaseExportFormatter
 def default(o):
     if isinstance(o, datetime.datetime):
         return o.isoformat()
-    return json.JSONEncoder.default(o)
+    return json.JSONEncoder().default(o)
 
 
 class JsonExportFormatter(BaseExportFormatter):
@@ -33,10 +33,16 @@ class JsonExportFormatter(BaseExportFormatter):
         if not self.jsonlines:
             self.file_extension = 'json'
             self.item_separator = ',\n'
+        # a single encoder for all the items, without indent it uses the C
+        # accelerated encoding when available
+        options = dict(indent=2, sort_keys=True) if self.pretty_print else dict()
+        self.encode = json.JSONEncoder(default=default, **options).encode
 
     def format(self, item):
-        options = dict(indent=2, sort_keys=True) if self.pretty_print else dict()
-        return json.dumps(item, default=default, **options)
+        return self.encode(item)
+
+    def format_batch(self, items):
+        return self.item_separator.join([self.encode(item) for item in items])
 
     def format_header(self):
         if self.jsonlines:
@@ -0,0 +1,223 @@
+import six
+from exporters.exceptions import ConfigurationError
+from exporters.export_formatter.base_export_formatter import (
+    BaseExportFormatter, WriteOnlyFile)
+from exporters.utils import str_list
+
+
+PARQUET_COMPRESSIONS = ('snappy', 'gzip', 'zstd', 'lz4', 'brotli', 'none')
+
+# arrow types for the json schema types
+SCHEMA_TYPES = {
+    'string': 'string',
+    'integer': 'int64',
+    'number': 'float64',
+    'boolean': 'bool_',
+}
+
+
+class ParquetFileWriter(object):
+    """
+    Writes items to a Parquet file, in row groups of row_group_size items.
+
+    If the formatter has no schema, the columns and their types are taken
+    from the items of the first row group, with the columns that only have
+    nulls in it typed as strings. Values of later row groups are converted
+    to the column types only when it doesn't lose data, and fields missing
+    in the first row group can't be added. Otherwise, a ValueError naming
+    the field is raised.
+    """
+
+    def __init__(self, write, schema, fields, row_group_size, compression, use_dictionary):
+        self.file = WriteOnlyFile(write)
+        self.schema = schema
+        self.fields = fields
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.use_dictionary = use_dictionary
+        # columns are taken from the items
+        self.infer_columns = schema is None and not fields
+        self.writer = None
+        self.rows = []
+
+    def write_batch(self, items):
+        self.rows.extend(items)
+        while len(self.rows) >= self.row_group_size:
+            self._write_row_group(self.rows[:self.row_group_size])
+            del self.rows[:self.row_group_size]
+
+    def _get_columns(self, rows):
+        if self.schema is not None:
+            return [field.name for field in self.schema]
+        if self.fields:
+            return self.fields
+        return sorted(set(key for row in rows for key in row))
+
+    def _to_array(self, name, values):
+        import pyarrow as pa
+        try:
+            return pa.array(values)
+        except (pa.ArrowException, TypeError):
+            raise ValueError('Values of field "{}" have different types, set the '
+                             'formatter schema option'.format(name))
+
+    def _get_inferred_table(self, rows):
+        import pyarrow as pa
+        columns = self._get_columns(rows)
+        arrays = []
+        for name in columns:
+            array = self._to_array(name, [row.get(name) for row in rows])
+            if array.type == pa.null():
+                array = pa.array([None] * len(rows), type=pa.string())
+            arrays.append(array)
+        return pa.Table.from_arrays(arrays, names=columns)
+
+    def _check_new_fields(self, rows):
+        columns = set(self.schema.names)
+        new_fields = set(key for row in rows for key in row) - columns
+        if new_fields:
+            raise ValueError('Fields {} are not in the parquet columns taken from the '
+                             'first row group, set the formatter fields or schema '
+                             'options'.format(sorted(new_fields)))
+
+    def _get_column(self, field, values):
+        import pyarrow as pa
+        # values are never casted without checking, as arrow truncates them
+        array = self._to_array(field.name, values)
+        if array.type == field.type:
+            return array
+        if array.type == pa.null():
+            return pa.array(values, type=field.type)
+        # other values would be written as their text to string columns
+        if not pa.types.is_string(field.type) or pa.types.is_binary(array.type):
+            try:
+                return array.cast(field.type)
+            except pa.ArrowException:
+                pass
+        raise ValueError('Values of field "{}" of type {} can\'t be written to a parquet '
+                         'column of type {}, set the formatter schema option'.format(
+                             field.name, array.type, field.type))
+
+    def _get_table(self, rows):
+        import pyarrow as pa
+        if self.schema is None:
+            return self._get_inferred_table(rows)
+        if self.infer_columns:
+            self._check_new_fields(rows)
+        arrays = [self._get_column(field, [row.get(field.name) for row in rows])
+                  for field in self.schema]
+        return pa.Table.from_arrays(arrays, schema=self.schema)
+
+    def _open_writer(self, schema):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.schema = schema
+        self.writer = pq.ParquetWriter(
+            pa.PythonFile(self.file, mode='w'), schema, compression=self.compression,
+            use_dictionary=self.use_dictionary)
+
+    def _write_row_group(self, rows):
+        table = self._get_table(rows)
+        if self.writer is None:
+            self._open_writer(table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        """
+        Writes the remaining items and the file footer.
+        """
+        if self.rows or self.writer is None:
+            self._write_row_group(self.rows)
+            self.rows = []
+        self.writer.close()
+
+
+class ParquetExportFormatter(BaseExportFormatter):
+    """
+    This export formatter provides a way of exporting items in Parquet format. Items are
+    kept in memory until a row group is full, and written in columns, compressed by the
+    formatter, so the writer compression must be none. Parquet group files can't be
+    resumed, so when more than max_open_group_files groups are written, the least recently
+    used group files are ended and written, and the group continues in a new file.
+
+        - fields(list)
+            List of item fields to be exported, all the fields found in the first row group
+            are exported otherwise
+
+        - schema(dict)
+            Valid json schema of dataset items, used to get the fields and their types
+
+        - row_group_size(int)
+            Number of items in each row group
+
+        - compression(str)
+            Compression codec of the columns, one of snappy, gzip, zstd, lz4, brotli or none
+
+        - use_dictionary(bool)
+            If set to True, columns will be dictionary encoded
+    """
+    file_extension = 'parquet'
+    item_separator = ''
+    writes_files = True
+
+    supported_options = {
+        'fields': {'type': str_list, 'default': []},
+        'schema': {'type': dict, 'default': {}},
+        'row_group_size': {'type': six.integer_types, 'default': 10000},
+        'compression': {'type': six.string_types, 'default': 'snappy'},
+        'use_dictionary': {'type': bool, 'default': True},
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(ParquetExportFormatter, self).__init__(*args, **kwargs)
+        self.fields = self.read_option('fields')
+        self.row_group_size = self.read_option('row_group_size')
+        if self.row_group_size < 1:
+            raise ConfigurationError('row_group_size must be at least 1')
+        self.compression = self.read_option('compression')
+        if self.compression not in PARQUET_COMPRESSIONS:
+            raise ConfigurationError('The parquet compression can only be one of the '
+                                     'following: "{}"'.format(PARQUET_COMPRESSIONS))
+        self.use_dictionary = self.read_option('use_dictionary')
+        self.schema_fields = self._get_schema_fields()
+
+    def _get_schema_fields(self):
+        schema = self.read_option('schema')
+        if not schema:
+            return None
+        properties = schema.get('properties', {})
+        fields = self.fields or sorted(properties)
+        return [(name, self._get_field_type(properties.get(name, {}))) for name in fields]
+
+    def _get_field_type(self, field_schema):
+        types = field_schema.get('type', [])
+        if isinstance(types, six.string_types):
+            types = [types]
+        types = [t for t in types if t != 'null']
+        if len(types) != 1 or types[0] not in SCHEMA_TYPES:
+            raise ConfigurationError('Unsupported type in parquet schema: {}'.format(
+                field_schema))
+        return SCHEMA_TYPES[types[0]]
+
+    def _get_schema(self):
+        import pyarrow as pa
+        if self.schema_fields is None:
+            return None
+        return pa.schema([pa.field(name, getattr(pa, arrow_type)())
+                          for name, arrow_type in self.schema_fields])
+
+    def format(self, item):
+        raise NotImplementedError('Parquet items can only be written to files')
+
+    def open_file_writer(self, write):
+        return ParquetFileWriter(
+            write, self._get_schema(), self.fields, self.row_group_size,
+            self.compression, self.use_dictionary)
+
+    def get_required_fields(self):
+        if self.fields:
+            return set(self.fields)
+        properties = self.read_option('schema').get('properties')
+        if properties:
+            return set(properties)
+        return None
@@ -1,5 +1,7 @@
 import six
 import logging
+import numbers
+import re
 from exporters.export_formatter.base_export_formatter import BaseExportFormatter
 from exporters.utils import str_list
 import collections
@@ -7,6 +9,27 @@ import collections
 
 DEFAULT_XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>'
 
+# element names that dicttoxml keeps as they are
+SIMPLE_NAME_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_.-]*\Z')
+
+# values of the type attribute, as given by dicttoxml
+XML_TYPES = {str: 'str', six.text_type: 'str', bool: 'bool', float: 'float'}
+XML_TYPES.update((t, 'int') for t in six.integer_types)
+
+
+class UnsupportedName(Exception):
+    pass
+
+
+def escape_xml(value):
+    if isinstance(value, bytes):
+        try:
+            value = value.decode('utf-8')
+        except UnicodeDecodeError:
+            value = six.text_type(value)
+    return (value.replace('&', '&amp;').replace('"', '&quot;').replace("'", '&apos;')
+            .replace('<', '&lt;').replace('>', '&gt;'))
+
 
 class XMLExportFormatter(BaseExportFormatter):
     """
@@ -30,11 +53,22 @@ class XMLExportFormatter(BaseExportFormatter):
         self.root_name = self.read_option('root_name')
         self.xml_header = self.read_option('xml_header')
         self.fields_order = self._get_fields()
+        self.ordered_fields = self._get_ordered_field_names()
+        self.listed_fields = frozenset(self.ordered_fields)
+        self.converters = self._get_converters()
+        self.valid_names = {}
 
     def _get_fields(self):
         fields = self.read_option('fields_order')
         return {key: idx for idx, key in enumerate(fields)}
 
+    def _get_ordered_field_names(self):
+        # fields with an index past the number of fields (which happens when
+        # fields_order has duplicates) sort along with the unlisted ones
+        fields_len = len(self.fields_order)
+        return [key for key in sorted(self.fields_order, key=self.fields_order.get)
+                if self.fields_order[key] < fields_len]
+
     def format_header(self):
         if self.xml_header:
             return '{}\n<{}>\n'.format(self.xml_header, self.root_name)
@@ -44,13 +78,113 @@ class XMLExportFormatter(BaseExportFormatter):
         return '\n</{}>'.format(self.root_name)
 
     def format(self, item):
+        return self.format_batch([item])
+
+    def format_batch(self, items):
+        formatted = []
+        for item in items:
+            parts = []
+            try:
+                self._add_fields(self._get_ordered_fields(item), parts)
+            except UnsupportedName:
+                formatted.append(self._format_with_dicttoxml(item))
+                continue
+            formatted.append('<{0}>{1}</{0}>'.format(
+                self.item_name, u''.join(parts).encode('utf-8')))
+        return self.item_separator.join(formatted)
+
+    def _get_ordered_fields(self, item):
+        if not self.ordered_fields:
+            return six.iteritems(item)
+        fields = [(key, item[key]) for key in self.ordered_fields if key in item]
+        listed = self.listed_fields
+        fields.extend((key, value) for key, value in six.iteritems(item)
+                      if key not in listed)
+        return fields
+
+    def _format_with_dicttoxml(self, item):
         import dicttoxml
         dicttoxml.LOG.setLevel(logging.WARNING)
-        fields_len = len(self.fields_order)
-        ordered_item = collections.OrderedDict(
-            sorted(item.items(),
-                   key=lambda kv: self.fields_order.get(kv[0], fields_len))
-        )
+        ordered_item = collections.OrderedDict(self._get_ordered_fields(item))
         return '<{0}>{1}</{0}>'.format(
             self.item_name, dicttoxml.dicttoxml(ordered_item, root=False,
                                                 attr_type=self.attr_type))
+
+    def _get_converters(self):
+        converters = {
+            bool: self._add_scalar, float: self._add_scalar,
+            str: self._add_string, six.text_type: self._add_string,
+            type(None): self._add_none, dict: self._add_dict,
+            list: self._add_list, tuple: self._add_list,
+        }
+        converters.update((t, self._add_scalar) for t in six.integer_types)
+        return converters
+
+    def _get_converter(self, value):
+        if isinstance(value, numbers.Number):
+            converter = self._add_scalar
+        elif type(value) in (str, six.text_type):
+            converter = self._add_string
+        elif hasattr(value, 'isoformat'):
+            converter = self._add_date
+        elif isinstance(value, dict):
+            converter = self._add_dict
+        elif isinstance(value, collections.Iterable):
+            converter = self._add_list
+        elif value is None:
+            converter = self._add_none
+        else:
+            raise TypeError('Unsupported data type: %s (%s)' % (
+                value, type(value).__name__))
+        self.converters[type(value)] = converter
+        return converter
+
+    def _get_name(self, key):
+        valid = self.valid_names.get(key)
+        if valid is None:
+            valid = isinstance(key, six.string_types) and bool(SIMPLE_NAME_RE.match(key))
+            self.valid_names[key] = valid
+        if not valid:
+            raise UnsupportedName(key)
+        return key
+
+    def _type_attr(self, xml_type):
+        return u' type="{}"'.format(xml_type) if self.attr_type else u''
+
+    def _add_fields(self, fields, parts):
+        converters = self.converters
+        for key, value in fields:
+            converter = converters.get(type(value)) or self._get_converter(value)
+            converter(self._get_name(key), value, parts)
+
+    def _add_scalar(self, name, value, parts):
+        xml_type = XML_TYPES.get(type(value), 'number')
+        parts.append(u'<{0}{1}>{2}</{0}>'.format(name, self._type_attr(xml_type), value))
+
+    def _add_string(self, name, value, parts):
+        parts.append(u'<{0}{1}>{2}</{0}>'.format(
+            name, self._type_attr('str'), escape_xml(value)))
+
+    def _add_date(self, name, value, parts):
+        self._add_string(name, value.isoformat(), parts)
+
+    def _add_none(self, name, value, parts):
+        parts.append(u'<{0}{1}></{0}>'.format(name, self._type_attr('null')))
+
+    def _add_dict(self, name, value, parts):
+        parts.append(u'<{}{}>'.format(name, self._type_attr('dict')))
+        self._add_fields(six.iteritems(value), parts)
+        parts.append(u'</{}>'.format(name))
+
+    def _add_list(self, name, value, parts, in_list=False):
+        # dicttoxml leaves a space after the name of untyped lists in lists
+        open_tag = u'<{} >' if in_list and not self.attr_type else u'<{}{}>'
+        parts.append(open_tag.format(name, self._type_attr('list')))
+        converters = self.converters
+        for element in value:
+            converter = converters.get(type(element)) or self._get_converter(element)
+            if converter == self._add_list:
+                self._add_list('item', element, parts, in_list=True)
+            else:
+                converter('item', element, parts)
+        parts.append(u'</{}>'.format(name))
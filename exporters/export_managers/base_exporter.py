@@ -1,3 +1,4 @@
+import copy
 import datetime
 import traceback
 from collections import OrderedDict
@@ -9,6 +10,7 @@ from exporters.meta import ExportMeta
 from exporters.module_loader import ModuleLoader
 from exporters.notifications.notifiers_list import NotifiersList
 from exporters.notifications.receiver_groups import CLIENTS, TEAM
+from exporters.pipeline.fused_pipeline import FusedPipeline
 from exporters.writers.base_writer import ItemsLimitReached
 from exporters.readers.base_stream_reader import is_stream_reader
 
@@ -43,6 +45,14 @@ class BaseExporter(object):
             self.config.persistence_options, metadata)
         self.grouper = self.module_loader.load_grouper(
             self.config.grouper_options, metadata)
+        if is_stream_reader(self.reader):
+            self.reader.deserializer.set_projection(self._get_projection())
+        self.pipeline = FusedPipeline([
+            (self.filter_before, self.filter_before.filter_batch),
+            (self.transform, self.transform.transform_batch),
+            (self.filter_after, self.filter_after.filter_batch),
+            (self.grouper, self.grouper.group_batch),
+        ])
         self.notifiers = NotifiersList(self.config.notifiers, metadata)
         if self.config.disable_retries:
             disable_retries()
@@ -51,6 +61,26 @@ class BaseExporter(object):
             self.config.stats_options, metadata)
         self.bypass_cases = []
 
+    def _get_projection(self):
+        """
+        Returns the fields needed by the export, or None if all fields are needed
+        or no projection was configured.
+        """
+        projection = self.config.projection
+        if projection is not True:
+            return projection
+        fields = set()
+        for module in [self.filter_before, self.transform, self.filter_after,
+                       self.grouper, self.export_formatter, self.writer]:
+            required_fields = module.get_required_fields()
+            if required_fields is None:
+                self.logger.info('{} may need any field, no projection will be used'.format(
+                    module.__class__.__name__))
+                return None
+            fields.update(required_fields)
+        self.logger.info('Projecting items to fields: {}'.format(sorted(fields)))
+        return sorted(fields)
+
     def _run_pipeline_iteration(self):
         times = OrderedDict([('started', datetime.datetime.now())])
         self.logger.debug('Getting new batch')
@@ -59,19 +89,16 @@ class BaseExporter(object):
         else:
             next_batch = self.reader.get_next_batch()
         times.update(read=datetime.datetime.now())
-        next_batch = self.filter_before.filter_batch(next_batch)
-        times.update(filtered=datetime.datetime.now())
-        next_batch = self.transform.transform_batch(next_batch)
-        times.update(transformed=datetime.datetime.now())
-        next_batch = self.filter_after.filter_batch(next_batch)
-        times.update(filtered_after=datetime.datetime.now())
-        next_batch = self.grouper.group_batch(next_batch)
-        times.update(grouped=datetime.datetime.now())
+        next_batch = self.pipeline.process_batch(next_batch)
+        times.update(processed=datetime.datetime.now())
         try:
             self.writer.write_batch(batch=next_batch)
             times.update(written=datetime.datetime.now())
-            last_position = self._get_last_position()
-            self.persistence.commit_position(last_position)
+            # with upload threads, the position is committed once the files
+            # written so far are uploaded, so it's copied as it is now. The
+            # filters keep the state it has until it is committed
+            last_position = copy.deepcopy(self._get_last_position())
+            self.writer.when_written(lambda: self._commit_position(last_position))
             times.update(persisted=datetime.datetime.now())
         except ItemsLimitReached:
             # we have written some amount of records up to the limit
@@ -81,9 +108,16 @@ class BaseExporter(object):
         else:
             self._iteration_stats_report(times)
 
+    def _commit_position(self, last_position):
+        self.persistence.commit_position(last_position)
+        self.filter_before.position_committed(last_position['filter_before_position'])
+        self.filter_after.position_committed(last_position['filter_after_position'])
+
     def _get_last_position(self):
         last_position = self.reader.get_last_position()
         last_position['writer_metadata'] = self.writer.get_all_metadata()
+        last_position['filter_before_position'] = self.filter_before.get_last_position()
+        last_position['filter_after_position'] = self.filter_after.get_last_position()
         return last_position
 
     def _init_export_job(self):
@@ -92,6 +126,8 @@ class BaseExporter(object):
         if last_position is not None:
             self.writer.update_metadata(last_position.get('writer_metadata'))
             self.metadata.accurate_items_count = last_position.get('accurate_items_count', False)
+            self.filter_before.set_last_position(last_position.get('filter_before_position'))
+            self.filter_after.set_last_position(last_position.get('filter_after_position'))
         self.reader.set_last_position(last_position)
 
     def _clean_export_job(self):
@@ -100,10 +136,15 @@ class BaseExporter(object):
         except:
             raise
         finally:
+            self.filter_before.close()
+            self.filter_after.close()
             self.writer.close()
 
     def _finish_export_job(self):
         self.writer.finish_writing()
+        self.reader.finish_reading()
+        self.filter_before.finish_filtering()
+        self.filter_after.finish_filtering()
         self.metadata.end_time = datetime.datetime.now()
 
     def bypass_exporter(self, bypass_class):
@@ -2,7 +2,7 @@ import collections
 from importlib import import_module
 from inspect import isclass
 import json
-from exporters.utils import maybe_cast_list
+from exporters.utils import maybe_cast_list, str_list
 from exporters.exceptions import ConfigCheckError
 from exporters.readers.base_stream_reader import StreamBasedReader
 from exporters.defaults import (
@@ -63,6 +63,14 @@ class ExporterConfig(object):
     def disable_retries(self):
         return self.exporter_options.get('disable_retries', False)
 
+    @property
+    def projection(self):
+        """
+        Fields needed downstream, the only ones kept by deserializers: a list
+        of field names, or True to compute them from the configured modules.
+        """
+        return self.exporter_options.get('projection')
+
     def get_supported_options(self, module_type):
         options_name = '{}_options'.format(module_type)
         if not hasattr(self, options_name):
@@ -122,6 +130,15 @@ def check_for_errors(config, raise_exception=True):
         if section_errors:
             errors['formatter'] = section_errors
 
+    if not errors.get('formatter') and _formatter_writes_files(exporter_options):
+        if not _is_file_writer(config):
+            errors['formatter'] = ('The formatter writes whole files, it can only be used '
+                                   'with file based writers.')
+
+    projection_error = _get_projection_error(exporter_options)
+    if projection_error:
+        errors['projection'] = projection_error
+
     if not _is_stream_reader(config):
         for section in STREAM_READER_SECTIONS:
             if config.get(section) and not errors.get(section):
@@ -138,6 +155,16 @@ def check_for_errors(config, raise_exception=True):
         return errors
 
 
+def _get_projection_error(exporter_options):
+    projection = exporter_options.get('projection')
+    if projection is None or projection is True:
+        return None
+    if not isinstance(maybe_cast_list(projection, str_list), str_list):
+        return 'Wrong type: found {}, expected a list of field names or true'.format(
+            type(projection))
+    return None
+
+
 def _get_section_errors(config_section):
     if 'name' not in config_section:
         return 'Module name is missing'
@@ -207,6 +234,23 @@ def _is_stream_reader(config):
     return issubclass(reader, StreamBasedReader)
 
 
+def _formatter_writes_files(exporter_options):
+    try:
+        formatter = _get_module(exporter_options['formatter']['name'])
+    except Exception:
+        return False
+    return getattr(formatter, 'writes_files', False)
+
+
+def _is_file_writer(config):
+    from exporters.writers.filebase_base_writer import FilebaseBaseWriter
+    try:
+        writer = _get_module(config['writer']['name'])
+    except Exception:
+        return True
+    return issubclass(writer, FilebaseBaseWriter)
+
+
 def _get_module_supported_options(module_name):
     try:
         return _get_module(module_name).supported_options
@@ -16,8 +16,8 @@ class BaseFilter(BasePipelineItem):
         self.set_metadata('filtered_out', 0)
         self.total = 0
 
-    def _log_progress(self):
-        if self.total % self.log_at_every == 0:
+    def _log_progress(self, previous_total):
+        if self.total // self.log_at_every > previous_total // self.log_at_every:
             self.logger.info('Filtered out %d records from %d total' %
                              (self.get_metadata('filtered_out'), self.total))
 
@@ -25,15 +25,28 @@ class BaseFilter(BasePipelineItem):
         """
         Receives the batch, filters it, and returns it.
         """
-        for item in batch:
-            if self.filter(item):
-                yield item
-            else:
-                self.set_metadata('filtered_out',
-                                  self.get_metadata('filtered_out') + 1)
+        return self._filter_batch(batch, self.get_predicate())
 
-            self.total += 1
-            self._log_progress()
+    def _filter_batch(self, batch, predicate):
+        # counters are kept locally and added to metadata once per batch
+        total = filtered_out = 0
+        try:
+            for item in batch:
+                total += 1
+                if predicate(item):
+                    yield item
+                else:
+                    filtered_out += 1
+        finally:
+            self.count_filtered(total, filtered_out)
+
+    def count_filtered(self, total, filtered_out):
+        """
+        Adds the counts of a filtered batch to the filter metadata.
+        """
+        self.increment_metadata('filtered_out', filtered_out)
+        self.total += total
+        self._log_progress(self.total - total)
 
     def filter(self, item):
         """
@@ -41,9 +54,74 @@ class BaseFilter(BasePipelineItem):
         """
         raise NotImplementedError
 
+    def get_predicate(self):
+        """
+        Returns the function telling whether an item must be included. Filters
+        with a faster precompiled predicate can return it instead of filter.
+        """
+        return self.filter
+
+    def apply(self, item):
+        """
+        Filters a single item, returning it if it must be included or None if not.
+        The exporter runs filters item by item with the predicate instead, unless
+        apply is redefined.
+        """
+        if self.filter(item):
+            return item
+        return None
+
+    def supports_apply(self):
+        """
+        Filters can be applied item by item unless they customize filter_batch
+        without providing a matching apply.
+        """
+        return self.apply_matches('filter_batch')
+
+    def get_required_fields(self):
+        """
+        Returns the set of item fields this filter needs, or None if it may
+        need any of them. Used to compute the exporter projection.
+        """
+        return None
+
+    def get_last_position(self):
+        """
+        Called from the manager before commiting a position. Returns the state
+        needed to resume filtering from there, if any.
+        """
+        return None
+
+    def set_last_position(self, last_position):
+        """
+        Called from the manager when resuming a job, with the state returned
+        by get_last_position() for the last commited position.
+        """
+        pass
+
+    def position_committed(self, last_position):
+        """
+        Called from the manager once a position, with the state returned by
+        get_last_position(), has been commited. The state needed to resume
+        older positions can be released then.
+        """
+        pass
+
+    def finish_filtering(self):
+        """
+        Called from the manager once the export has successfully finished.
+        """
+        pass
+
+    def close(self):
+        pass
+
     def set_metadata(self, key, value, module='filter'):
         super(BaseFilter, self).set_metadata(key, value, module)
 
+    def increment_metadata(self, key, amount, module='filter'):
+        super(BaseFilter, self).increment_metadata(key, amount, module)
+
     def update_metadata(self, data, module='filter'):
         super(BaseFilter, self).update_metadata(data, module)
 
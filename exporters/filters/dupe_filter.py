@@ -1,4 +1,8 @@
+import six
+
+from exporters.exceptions import ConfigurationError
 from exporters.filters.base_filter import BaseFilter
+from exporters.filters.dupe_key_stores import KEY_STORES
 
 
 class DupeFilter(BaseFilter):
@@ -7,19 +11,56 @@ class DupeFilter(BaseFilter):
 
         - key_field (str)
             item's key to be used to identify dupes
+
+        - backend (str)
+            Where seen keys are kept. One of "memory" (default, a python set),
+            "disk" (exact sqlite key store with an LRU cache of recent keys) or
+            "bloom" (scalable Bloom filter, may drop unique items with a
+            probability of error_rate). Disk and bloom stores are snapshotted
+            on every commited position, so dedupe survives resuming the job.
+
+        - store_path (str)
+            Directory where disk and bloom stores are kept, required by those
+            backends. Use a location owned by the job (not a shared temporary
+            directory), as resumed jobs read their stores back from it.
+
+        - error_rate (float)
+            False positive rate of the bloom backend.
+
+        - cache_size (int)
+            Number of recent keys cached in memory by the disk backend.
     """
     # List of options
     supported_options = {
-        'key_field': {'type': basestring, 'default': '_key'}
+        'key_field': {'type': basestring, 'default': '_key'},
+        'backend': {'type': six.string_types, 'default': 'memory'},
+        'store_path': {'type': six.string_types, 'default': None},
+        'error_rate': {'type': float, 'default': 0.001},
+        'cache_size': {'type': six.integer_types, 'default': 100000},
     }
 
     def __init__(self, *args, **kwargs):
         super(DupeFilter, self).__init__(*args, **kwargs)
         self.key_field = self.read_option('key_field')
-        self.key_set = set()
+        backend = self.read_option('backend')
+        if backend not in KEY_STORES:
+            raise ConfigurationError('The dupe filter backend can only be one of the'
+                                     ' following: {}'.format(sorted(KEY_STORES)))
+        if backend != 'memory' and not self.read_option('store_path'):
+            raise ConfigurationError('The {} dupe filter backend needs a store_path'
+                                     ' option'.format(backend))
+        self.key_store_class = KEY_STORES[backend]
+        self.key_set = self._create_key_store()
         self.logger.info('{} initialized. Key field: "{}"'.format(
             self.__class__.__name__, self.key_field))
 
+    def _create_key_store(self, state=None):
+        return self.key_store_class(
+            self.read_option('store_path'),
+            state=state,
+            error_rate=self.read_option('error_rate'),
+            cache_size=self.read_option('cache_size'))
+
     def filter(self, item):
         items_key = item.get(self.key_field)
         if not items_key:  # unable to determine duplicates, won't be filtered
@@ -27,7 +68,28 @@ class DupeFilter(BaseFilter):
                                 ' unable to filter it.')
             return True
 
-        if items_key not in self.key_set:
-            self.key_set.add(items_key)
-            return True
-        return False
+        return self.key_set.add(items_key)
+
+    def get_required_fields(self):
+        return {self.key_field}
+
+    def get_last_position(self):
+        return self.key_set.checkpoint()
+
+    def position_committed(self, last_position):
+        if last_position is not None:
+            self.key_set.release(last_position)
+
+    def set_last_position(self, last_position):
+        if last_position is None:
+            return
+        self.key_set.close()
+        self.key_set.delete()
+        self.key_set = self._create_key_store(state=last_position)
+
+    def finish_filtering(self):
+        self.key_set.close()
+        self.key_set.delete()
+
+    def close(self):
+        self.key_set.close()
@@ -0,0 +1,295 @@
+import hashlib
+import math
+import os
+import pickle
+import sqlite3
+import struct
+import uuid
+from collections import OrderedDict
+
+import six
+
+from exporters.utils import remove_if_exists
+
+
+def _key_bytes(key):
+    # strings and other keys are prefixed, so 1 and '1' are different keys
+    if isinstance(key, six.binary_type):
+        return b's' + key
+    if isinstance(key, six.text_type):
+        return b's' + key.encode('utf-8')
+    return b'r' + repr(key).encode('utf-8')
+
+
+class MemoryKeyStore(object):
+    """
+    Keeps every seen key in a python set. Fast, but unbounded and not resumable.
+    """
+
+    def __init__(self, directory, **kwargs):
+        self.keys = set()
+
+    def add(self, key):
+        """
+        Adds a key to the store. Returns False if the key was already there.
+        """
+        if key in self.keys:
+            return False
+        self.keys.add(key)
+        return True
+
+    def checkpoint(self):
+        """
+        Makes the current keys durable and returns the state needed to resume them.
+        """
+        return None
+
+    def release(self, state):
+        """
+        Called once a state returned by checkpoint() has been committed, so the
+        older ones won't be resumed anymore.
+        """
+        pass
+
+    def close(self):
+        pass
+
+    def delete(self):
+        pass
+
+
+class DiskKeyStore(object):
+    """
+    Exact key store backed by a sqlite database, with an in-memory LRU cache
+    of recently seen keys. New keys are written back in chunks, and committed
+    on checkpoint(), which returns the last row written. Resuming a state
+    deletes the keys written after that row.
+    """
+
+    def __init__(self, directory, state=None, cache_size=100000, write_chunk_size=10000,
+                 **kwargs):
+        if state is None:
+            self.path = os.path.join(directory, 'dupe-keys-{}.db'.format(uuid.uuid4()))
+        else:
+            self.path = state['path']
+        self.cache_size = cache_size
+        self.write_chunk_size = write_chunk_size
+        self.cache = OrderedDict()
+        self.pending = set()
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS dupe_keys (key BLOB PRIMARY KEY)')
+        if state is not None:
+            # keys seen after the resumed checkpoint, their items are read again
+            self.connection.execute('DELETE FROM dupe_keys WHERE rowid > ?', (state['row'],))
+        self.connection.commit()
+
+    def _in_database(self, key):
+        return self.connection.execute(
+            'SELECT 1 FROM dupe_keys WHERE key = ?',
+            (sqlite3.Binary(key),)).fetchone() is not None
+
+    def _flush(self):
+        if self.pending:
+            self.connection.executemany(
+                'INSERT OR IGNORE INTO dupe_keys (key) VALUES (?)',
+                ((sqlite3.Binary(key),) for key in self.pending))
+            self.pending = set()
+
+    def _cache(self, key):
+        self.cache[key] = True
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def add(self, key):
+        key = _key_bytes(key)
+        if key in self.cache:
+            # move it to the most recently used end
+            self.cache[key] = self.cache.pop(key)
+            return False
+        is_new = key not in self.pending and not self._in_database(key)
+        self._cache(key)
+        if is_new:
+            self.pending.add(key)
+            if len(self.pending) >= self.write_chunk_size:
+                self._flush()
+        return is_new
+
+    def checkpoint(self):
+        self._flush()
+        self.connection.commit()
+        row = self.connection.execute('SELECT MAX(rowid) FROM dupe_keys').fetchone()[0]
+        return {'path': self.path, 'row': row or 0}
+
+    def release(self, state):
+        pass
+
+    def close(self):
+        self.connection.close()
+
+    def delete(self):
+        remove_if_exists(self.path)
+
+
+class _BloomFilter(object):
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_hashes = max(1, int(math.ceil(math.log(1.0 / error_rate, 2))))
+        self.num_bits = max(8, int(math.ceil(
+            capacity * abs(math.log(error_rate)) / (math.log(2) ** 2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, h1, h2):
+        num_bits = self.num_bits
+        return [(h1 + i * h2) % num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, hashes):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(*hashes))
+
+    def add(self, hashes):
+        bits = self.bits
+        for p in self._positions(*hashes):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+
+class BloomKeyStore(object):
+    """
+    Scalable Bloom filter: a series of Bloom filters, each one twice as big as
+    the previous one and with half its error rate, so memory grows with the
+    number of keys while the overall false positive rate stays under error_rate.
+    Some unique items may be considered dupes with that probability.
+
+    The hashes of the keys added since the last checkpoint() are appended to a
+    log file, and the filters are only dumped to a new snapshot file once the
+    log gets bigger than them, so checkpoints don't get slower as filters grow.
+    Each snapshot starts a new generation of files, with its own log, and the
+    files of older generations are kept until release() is called with a
+    state of a newer one, so every state returned by checkpoint() can be
+    resumed until then.
+    """
+
+    growth = 2
+    tightening_ratio = 0.5
+    hash_format = struct.Struct('<QQ')
+
+    def __init__(self, directory, state=None, error_rate=0.001, initial_capacity=1000000,
+                 **kwargs):
+        self.pending = []
+        if state is None:
+            self.path = os.path.join(directory, 'dupe-keys-{}.bloom'.format(uuid.uuid4()))
+            self.filters = [
+                _BloomFilter(initial_capacity, error_rate * (1 - self.tightening_ratio))]
+            self.oldest_generation = self.generation = 0
+            self._write_snapshot()
+        else:
+            self.path = state['path']
+            self.oldest_generation = 0
+            self.generation = state['generation']
+            with open(self._snapshot_path(self.generation), 'rb') as f:
+                self.filters = pickle.load(f)
+            self.logged = state['logged']
+            self._replay_log()
+            self._remove_newer_generations()
+
+    def _snapshot_path(self, generation):
+        return '{}.{}'.format(self.path, generation)
+
+    def _log_path(self, generation):
+        return '{}.{}.log'.format(self.path, generation)
+
+    @property
+    def log_path(self):
+        return self._log_path(self.generation)
+
+    def _write_snapshot(self):
+        snapshot_path = self._snapshot_path(self.generation)
+        tmp_path = snapshot_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.filters, f, pickle.HIGHEST_PROTOCOL)
+        os.rename(tmp_path, snapshot_path)
+        with open(self.log_path, 'wb'):
+            pass
+        self.logged = 0
+
+    def _replay_log(self):
+        size = self.logged * self.hash_format.size
+        with open(self.log_path, 'r+b') as f:
+            data = f.read(size)
+            if len(data) < size:
+                raise ValueError('The bloom filter log {} has {} keys, {} expected'.format(
+                    self.log_path, len(data) // self.hash_format.size, self.logged))
+            # keys logged after the resumed checkpoint are dropped
+            f.truncate(size)
+        for offset in range(0, size, self.hash_format.size):
+            self._add_hashes(self.hash_format.unpack_from(data, offset))
+
+    def _remove_generation(self, generation):
+        remove_if_exists(self._snapshot_path(generation))
+        remove_if_exists(self._log_path(generation))
+
+    def _remove_newer_generations(self):
+        # written after the resumed checkpoint
+        generation = self.generation + 1
+        while os.path.exists(self._snapshot_path(generation)):
+            self._remove_generation(generation)
+            generation += 1
+
+    def _hashes(self, key):
+        return self.hash_format.unpack(hashlib.md5(_key_bytes(key)).digest())
+
+    def add(self, key):
+        hashes = self._hashes(key)
+        if self._add_hashes(hashes):
+            self.pending.append(hashes)
+            return True
+        return False
+
+    def _add_hashes(self, hashes):
+        if any(hashes in bloom for bloom in self.filters):
+            return False
+        current = self.filters[-1]
+        if current.count >= current.capacity:
+            current = _BloomFilter(current.capacity * self.growth,
+                                   current.error_rate * self.tightening_ratio)
+            self.filters.append(current)
+        current.add(hashes)
+        return True
+
+    def checkpoint(self):
+        filters_size = sum(len(bloom.bits) for bloom in self.filters)
+        if (self.logged + len(self.pending)) * self.hash_format.size > filters_size:
+            # older states need the current generation files as they are
+            self.generation += 1
+            self._write_snapshot()
+        else:
+            with open(self.log_path, 'ab') as f:
+                f.write(b''.join(self.hash_format.pack(*hashes) for hashes in self.pending))
+            self.logged += len(self.pending)
+        self.pending = []
+        return {'path': self.path, 'generation': self.generation, 'logged': self.logged}
+
+    def release(self, state):
+        """
+        Removes the files only needed to resume states older than the given one.
+        """
+        while self.oldest_generation < state['generation']:
+            self._remove_generation(self.oldest_generation)
+            self.oldest_generation += 1
+
+    def close(self):
+        pass
+
+    def delete(self):
+        for generation in range(self.oldest_generation, self.generation + 1):
+            self._remove_generation(generation)
+        self._remove_newer_generations()
+
+
+KEY_STORES = {
+    'memory': MemoryKeyStore,
+    'disk': DiskKeyStore,
+    'bloom': BloomKeyStore,
+}
@@ -23,6 +23,30 @@ OPERATORS = {
 DEFAULT_OPERATOR = '=='
 
 
+def _compile_regex_matcher(pattern):
+    match = re.compile(pattern).match
+
+    def matcher(found):
+        if not isinstance(found, six.text_type):
+            found = u'%s' % found
+        return match(found) is not None
+    return matcher
+
+
+def _compile_in_matcher(values):
+    try:
+        values_set = frozenset(values)
+    except TypeError:  # unhashable values can only be looked up in the list
+        return lambda found: found in values
+
+    def matcher(found):
+        try:
+            return found in values_set
+        except TypeError:
+            return found in values
+    return matcher
+
+
 class KeyValueBaseFilter(BaseFilter):
     "Base class to key-value filters"
 
@@ -36,6 +60,7 @@ class KeyValueBaseFilter(BaseFilter):
         self.keys = self.read_option('keys')
         self.nested_field_separator = self.read_option('nested_field_separator')
         self._validate_keys_operator()
+        self.predicate = self._compile_predicate()
         self.logger.info('{} has been initiated. Keys: {}'.format(
             self.__class__.__name__, self.keys))
 
@@ -45,22 +70,72 @@ class KeyValueBaseFilter(BaseFilter):
             if op and op not in OPERATORS:
                 raise InvalidOperator('{} operator not valid in key {}'.format(op, key))
 
-    def filter(self, item):
-        for key in self.keys:
-            if self.nested_field_separator:
-                nested_fields = key['name'].split(self.nested_field_separator)
+    def _compile_getter(self, name):
+        """Return a function getting the value for the key name from an item.
+        Nested paths are split only once, and missing paths raise KeyError.
+        """
+        if not self.nested_field_separator:
+            return operator.itemgetter(name)
+
+        path = tuple(name.split(self.nested_field_separator))
+        if len(path) == 1:
+            field = path[0]
+
+            def get_value(item):
                 try:
-                    value = nested_dict_value(item, nested_fields)
-                except KeyError:
-                    self.logger.debug('Missing path {} from item. Item dismissed'.format(
-                            nested_fields))
+                    return item[field]
+                except (KeyError, TypeError):
+                    return nested_dict_value(item, path)
+        else:
+            def get_value(item):
+                value = item
+                try:
+                    for field in path:
+                        value = value[field]
+                except (KeyError, TypeError, IndexError):
+                    return nested_dict_value(item, path)
+                return value
+        return get_value
+
+    def _compile_matcher(self, key):
+        """Return a function telling whether a found value matches the key.
+        Should be overriden by derived classes implementing a faster custom match.
+        """
+        op = OPERATORS[key.get('operator', DEFAULT_OPERATOR)]
+        expected = key['value']
+        return lambda found: self._match_value(found, expected, op)
+
+    def _compile_predicate(self):
+        checks = tuple(
+            (key['name'], self._compile_getter(key['name']), self._compile_matcher(key))
+            for key in self.keys
+        )
+        catch = KeyError if self.nested_field_separator else ()
+        logger = self.logger
+
+        def predicate(item):
+            for name, get_value, match in checks:
+                try:
+                    value = get_value(item)
+                except catch:
+                    logger.debug('Missing path {} from item. Item dismissed'.format(
+                        name.split(self.nested_field_separator)))
                     return False
-            else:
-                value = item[key['name']]
-            if not self._match_value(
-                    value, key['value'], OPERATORS[key.get('operator', DEFAULT_OPERATOR)]):
-                return False
-        return True
+                if not match(value):
+                    return False
+            return True
+        return predicate
+
+    def filter(self, item):
+        return self.predicate(item)
+
+    def get_predicate(self):
+        return self.predicate
+
+    def get_required_fields(self):
+        if not self.nested_field_separator:
+            return {key['name'] for key in self.keys}
+        return {key['name'].split(self.nested_field_separator)[0] for key in self.keys}
 
     def _match_value(self, value_found, value_expected, op=None):
         """Return True if value found matches the expected.
@@ -81,6 +156,19 @@ class KeyValueFilter(KeyValueBaseFilter):
     def _match_value(self, found, expected, op):
         return op(found, expected)
 
+    def _compile_matcher(self, key):
+        op = key.get('operator', DEFAULT_OPERATOR)
+        expected = key['value']
+        if op == '==':
+            return lambda found: found == expected
+        if op == 'contains':
+            return lambda found: expected in found
+        if op == 're_match':
+            return _compile_regex_matcher(expected)
+        if op == 'in' and isinstance(expected, list):
+            return _compile_in_matcher(expected)
+        return super(KeyValueFilter, self)._compile_matcher(key)
+
 
 class KeyValueRegexFilter(KeyValueBaseFilter):
     """
@@ -95,3 +183,7 @@ class KeyValueRegexFilter(KeyValueBaseFilter):
         if found is None:
             return False
         return OPERATORS['re_match'](found, expected)
+
+    def _compile_matcher(self, key):
+        match = _compile_regex_matcher(key['value'])
+        return lambda found: found is not None and match(found)
@@ -6,9 +6,15 @@ class NoFilter(BaseFilter):
     It leaves the batch as is. This is provided for the cases where no filters are needed
     on the original items.
     """
-
     def __init__(self, *args, **kwargs):
         super(NoFilter, self).__init__(*args, **kwargs)
 
     def filter_batch(self, batch):
         return batch
+
+    def is_noop(self):
+        # subclasses may do something with the batch
+        return type(self) is NoFilter
+
+    def get_required_fields(self):
+        return set()
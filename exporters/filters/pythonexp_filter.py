@@ -33,12 +33,13 @@ class PythonexpFilter(BaseFilter):
         self.expression = self.read_option('python_expression')
         self.imports = load_imports(self.read_option('imports'))
         self.interpreter = Interpreter()
+        self.context = create_context(**self.imports)
         self.logger.info('PythonexpFilter has been initiated.'
                          ' Expression: {!r}'.format(self.expression))
 
     def filter(self, item):
         try:
-            context = create_context(item=item, **self.imports)
+            context = dict(self.context, item=item)
             return self.interpreter.eval(self.expression, context=context)
         except Exception as ex:
             self.logger.error(str(ex))
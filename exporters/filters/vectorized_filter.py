@@ -0,0 +1,293 @@
+import ast
+import itertools
+import numbers
+import operator
+import re
+
+import six
+
+from exporters.exceptions import InvalidExpression
+from exporters.filters.base_filter import BaseFilter
+
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+
+
+def _string_method(test):
+    """
+    Returns a function applying a string test to a column. The test is run as a
+    numpy ufunc when the column only holds strings, otherwise non string values
+    fail the test.
+    """
+    def apply(series):
+        import numpy as np
+        import pandas as pd
+        values = series.values
+        if pd.api.types.infer_dtype(values, skipna=False) in ('string', 'unicode'):
+            result = np.frompyfunc(test, 1, 1)(values).astype(bool)
+        else:
+            result = np.fromiter(
+                (isinstance(v, six.string_types) and bool(test(v)) for v in values),
+                dtype=bool, count=len(values))
+        return pd.Series(result, index=series.index)
+    return apply
+
+
+_STRING_METHODS = {
+    'startswith': lambda arg: _string_method(operator.methodcaller('startswith', arg)),
+    'endswith': lambda arg: _string_method(operator.methodcaller('endswith', arg)),
+    'contains': lambda arg: _string_method(lambda v: arg in v),
+    'match': lambda arg: _string_method(re.compile(arg).match),
+}
+
+
+def _is_number(value):
+    return isinstance(value, numbers.Number) and not isinstance(value, bool)
+
+
+class _Columns(object):
+    """
+    Column arrays for the fields used by an expression, built from a list of items.
+    Missing values are set to None (NaN on numeric columns). Nested fields are
+    extracted from their parent column, so shared prefixes are only read once.
+    """
+
+    def __init__(self, items, paths):
+        import pandas as pd
+        self.pd = pd
+        self.size = len(items)
+        values = {(): items}
+        for path in sorted(paths, key=len):
+            for depth in range(1, len(path) + 1):
+                if path[:depth] not in values:
+                    values[path[:depth]] = self._get_values(values[path[:depth - 1]],
+                                                            path[depth - 1])
+        self.columns = {path: pd.Series(values[path], dtype=object) for path in paths}
+        self.numeric_columns = {}
+
+    @staticmethod
+    def _get_values(values, field):
+        try:
+            return list(map(operator.methodcaller('get', field), values))
+        except (AttributeError, TypeError):  # not all values are dicts
+            return [_Columns._get_value(value, field) for value in values]
+
+    @staticmethod
+    def _get_value(value, field):
+        try:
+            return value[field]
+        except (KeyError, TypeError, IndexError):
+            return None
+
+    def get(self, path):
+        return self.columns[path]
+
+    def get_numeric(self, path):
+        if path not in self.numeric_columns:
+            self.numeric_columns[path] = self.pd.to_numeric(self.columns[path], errors='coerce')
+        return self.numeric_columns[path]
+
+
+class VectorizedExpression(object):
+    """
+    Compiles a restricted boolean expression into a function evaluating it over
+    column arrays. Supported syntax:
+
+        - Field references, using the nested field separator for nested fields:
+          "price", "address.country" or field("address,country") with other separators.
+        - Comparisons with literals or other fields: ==, !=, <, <=, >, >=.
+        - Membership: "country in ['es', 'uk']" or "country.isin(['es', 'uk'])",
+          and "not in".
+        - Null checks: "country is None", "country is not None".
+        - String methods: startswith, endswith, contains and match (regex match).
+        - Boolean operators: and, or, not.
+    """
+
+    def __init__(self, expression, nested_field_separator='.'):
+        if not isinstance(expression, six.string_types) or not expression.strip():
+            raise InvalidExpression('Vectorized filter expressions must be non empty strings')
+        self.expression = expression
+        self.nested_field_separator = nested_field_separator
+        self.paths = set()
+        tree = ast.parse(expression.strip(), mode='eval')
+        self.evaluate = self._compile_condition(tree.body)
+
+    def _invalid(self, node):
+        return InvalidExpression("'%s' not allowed in vectorized filter expressions" %
+                                 node.__class__.__name__)
+
+    def _field_name(self, node):
+        if isinstance(node, ast.Name) and node.id not in ('None', 'True', 'False'):
+            return node.id
+        if isinstance(node, ast.Attribute):
+            parent = self._field_name(node.value)
+            if parent is not None:
+                return parent + '.' + node.attr
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and \
+                node.func.id == 'field' and len(node.args) == 1 and not node.keywords:
+            name = self._literal(node.args[0])
+            if not isinstance(name, six.string_types):
+                raise InvalidExpression('field() takes a field name string')
+            return name
+        return None
+
+    def _field(self, node):
+        name = self._field_name(node)
+        if name is None:
+            return None
+        if self.nested_field_separator:
+            path = tuple(name.split(self.nested_field_separator))
+        else:
+            path = (name,)
+        self.paths.add(path)
+        return path
+
+    def _literal(self, node):
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            raise self._invalid(node)
+
+    def _compile_condition(self, node):
+        if isinstance(node, ast.BoolOp):
+            conditions = [self._compile_condition(value) for value in node.values]
+            combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+            return lambda columns: six.moves.reduce(
+                combine, [condition(columns) for condition in conditions])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            condition = self._compile_condition(node.operand)
+            return lambda columns: ~condition(columns)
+        if isinstance(node, ast.Compare):
+            conditions = []
+            left = node.left
+            for op, right in zip(node.ops, node.comparators):
+                conditions.append(self._compile_comparison(left, op, right))
+                left = right
+            return lambda columns: six.moves.reduce(
+                operator.and_, [condition(columns) for condition in conditions])
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+            return self._compile_method(node)
+        raise self._invalid(node)
+
+    def _compile_method(self, node):
+        path = self._field(node.func.value)
+        method = node.func.attr
+        if path is None or len(node.args) != 1 or node.keywords:
+            raise self._invalid(node)
+        argument = self._literal(node.args[0])
+        if method == 'isin':
+            values = list(argument)
+            return lambda columns: columns.get(path).isin(values)
+        if method in _STRING_METHODS:
+            if not isinstance(argument, six.string_types):
+                raise InvalidExpression('{}() takes a string argument'.format(method))
+            apply_method = _STRING_METHODS[method](argument)
+            return lambda columns: apply_method(columns.get(path)).astype(bool)
+        raise InvalidExpression("'{}' method not allowed in vectorized filter"
+                                " expressions".format(method))
+
+    def _compile_comparison(self, left, op, right):
+        if isinstance(op, (ast.In, ast.NotIn)):
+            path = self._field(left)
+            if path is None:
+                raise self._invalid(left)
+            values = list(self._literal(right))
+            if isinstance(op, ast.In):
+                return lambda columns: columns.get(path).isin(values)
+            return lambda columns: ~columns.get(path).isin(values)
+        if isinstance(op, (ast.Is, ast.IsNot)):
+            path = self._field(left)
+            if path is None or self._literal(right) is not None:
+                raise InvalidExpression('"is" can only be used as "field is None"')
+            if isinstance(op, ast.Is):
+                return lambda columns: columns.get(path).isnull()
+            return lambda columns: columns.get(path).notnull()
+        if type(op) not in _COMPARISONS:
+            raise self._invalid(op)
+        compare = _COMPARISONS[type(op)]
+        left_path, right_path = self._field(left), self._field(right)
+        if left_path is None and right_path is None:
+            raise InvalidExpression('Comparisons must involve at least one field')
+        left_value = None if left_path else self._literal(left)
+        right_value = None if right_path else self._literal(right)
+        numeric = _is_number(left_value) or _is_number(right_value)
+
+        def operand(path, value):
+            if path is None:
+                return lambda columns: value
+            if numeric:
+                return lambda columns: columns.get_numeric(path)
+            return lambda columns: columns.get(path)
+
+        get_left, get_right = operand(left_path, left_value), operand(right_path, right_value)
+        return lambda columns: compare(get_left(columns), get_right(columns)).astype(bool)
+
+    def mask(self, items):
+        """
+        Returns a boolean numpy array telling which of the items match the expression.
+        """
+        columns = _Columns(items, self.paths)
+        return self.evaluate(columns).values
+
+
+class VectorizedFilter(BaseFilter):
+    """
+    Filter items evaluating a restricted expression over whole batches of items
+    with pandas, instead of one item at a time. Needs numpy and pandas installed.
+
+        - expression (str)
+            Boolean expression. Fields are referenced by name, nested fields using
+            the nested field separator, e.g.:
+            "price > 10 and address.country.isin(['es', 'uk'])
+            and name.startswith('A') and not sku.match('^X[0-9]+')"
+
+        - nested_field_separator (str)
+            Separator for nested fields. If it is not a dot, nested fields must
+            be referenced with field("address,country").
+
+        - batch_size (int)
+            Number of items evaluated at once.
+    """
+    supported_options = {
+        'expression': {'type': six.string_types},
+        'nested_field_separator': {'type': six.string_types, 'default': '.'},
+        'batch_size': {'type': six.integer_types, 'default': 10000},
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(VectorizedFilter, self).__init__(*args, **kwargs)
+        import pandas  # NOQA -- fail early if pandas is not installed
+        self.expression = VectorizedExpression(
+            self.read_option('expression'), self.read_option('nested_field_separator'))
+        self.batch_size = self.read_option('batch_size')
+        self.logger.info('{} has been initiated. Expression: {!r}'.format(
+            self.__class__.__name__, self.expression.expression))
+
+    def filter(self, item):
+        return bool(self.expression.mask([item])[0])
+
+    def get_required_fields(self):
+        return {path[0] for path in self.expression.paths}
+
+    def filter_batch(self, batch):
+        batch = iter(batch)
+        while True:
+            chunk = list(itertools.islice(batch, self.batch_size))
+            if not chunk:
+                break
+            mask = self.expression.mask(chunk)
+            passed = 0
+            for item, keep in itertools.izip(chunk, mask):
+                if keep:
+                    passed += 1
+                    yield item
+            self.increment_metadata('filtered_out', len(chunk) - passed)
+            self.total += len(chunk)
+            self._log_progress(self.total - len(chunk))
@@ -1 +1 @@
-from .file_key_grouper import FileKeyGrouperfrom .python_exp_grouper import PythonExpGrouper__all__ = ['FileKeyGrouper', 'PythonExpGrouper']
\ No newline at end of file
+from .file_key_grouper import FileKeyGrouperfrom .hash_partition_grouper import HashPartitionGrouperfrom .python_exp_grouper import PythonExpGrouper__all__ = ['FileKeyGrouper', 'HashPartitionGrouper', 'PythonExpGrouper']
\ No newline at end of file
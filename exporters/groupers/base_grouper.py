@@ -20,6 +20,24 @@ class BaseGrouper(BasePipelineItem):
         """
         raise NotImplementedError
 
+    def apply(self, item):
+        """
+        Fills the group_membership attribute of a single item and returns it.
+        Groupers that can work item by item should implement it, so the exporter
+        can run them in a single loop with the other stages.
+        """
+        raise NotImplementedError
+
+    def supports_apply(self):
+        return self.overrides(BaseGrouper, 'apply') and self.apply_matches('group_batch')
+
+    def get_required_fields(self):
+        """
+        Returns the set of item fields this grouper needs, or None if it may
+        need any of them. Used to compute the exporter projection.
+        """
+        return None
+
     def set_metadata(self, key, value, module='grouper'):
         super(BaseGrouper, self).set_metadata(key, value, module)
 
@@ -27,11 +27,17 @@ class FileKeyGrouper(BaseGrouper):
                 membership = 'unknown'
             return membership
 
+    def get_required_fields(self):
+        return {key.split('.')[0] for key in self.keys}
+
+    def apply(self, item):
+        item.group_key = self.keys
+        membership = []
+        for key in self.keys:
+            membership.append(self._get_nested_value(item, key))
+        item.group_membership = tuple(membership)
+        return item
+
     def group_batch(self, batch):
         for item in batch:
-            item.group_key = self.keys
-            membership = []
-            for key in self.keys:
-                membership.append(self._get_nested_value(item, key))
-            item.group_membership = tuple(membership)
-            yield item
+            yield self.apply(item)
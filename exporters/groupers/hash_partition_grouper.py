@@ -0,0 +1,45 @@
+import hashlib
+import json
+
+import six
+
+from exporters.exceptions import ConfigurationError
+from exporters.groupers.file_key_grouper import FileKeyGrouper
+
+
+class HashPartitionGrouper(FileKeyGrouper):
+    """
+    Groups items in a fixed number of partitions, by a hash of their keys. Items
+    with the same keys always go to the same partition, and partitions are named
+    with zero padded numbers (e.g. "07" of 16 partitions), so that the exported
+    files can be consumed in parallel.
+
+        - keys (list)
+            A list of keys to hash, nested keys are separated by dots
+
+        - partitions (int)
+            Number of partitions
+    """
+    supported_options = {
+        'partitions': {'type': six.integer_types}
+    }
+
+    def __init__(self, *args, **kwargs):
+        super(HashPartitionGrouper, self).__init__(*args, **kwargs)
+        self.partitions = self.read_option('partitions')
+        if self.partitions < 1:
+            raise ConfigurationError('partitions must be a positive number')
+        self.partition_names = [
+            str(partition).zfill(len(str(self.partitions - 1)))
+            for partition in range(self.partitions)
+        ]
+
+    def get_partition(self, item):
+        values = [self._get_nested_value(item, key) for key in self.keys]
+        digest = hashlib.md5(json.dumps(values, sort_keys=True, default=repr)).digest()
+        return int(digest[:8].encode('hex'), 16) % self.partitions
+
+    def apply(self, item):
+        item.group_key = self.keys
+        item.group_membership = (self.partition_names[self.get_partition(item)],)
+        return item
@@ -5,9 +5,15 @@ class NoGrouper(BaseGrouper):
     """
     Default group module, used when no grouping strategies are needed.
     """
-
     def __init__(self, *args, **kwargs):
         super(NoGrouper, self).__init__(*args, **kwargs)
 
     def group_batch(self, batch):
         return batch
+
+    def is_noop(self):
+        # subclasses may do something with the batch
+        return type(self) is NoGrouper
+
+    def get_required_fields(self):
+        return set()
@@ -1,5 +1,5 @@
 from exporters.groupers.base_grouper import BaseGrouper
-from exporters.python_interpreter import Interpreter, create_context
+from exporters.python_interpreter import Interpreter
 from exporters.utils import str_list
 
 
@@ -18,19 +18,23 @@ class PythonExpGrouper(BaseGrouper):
         super(PythonExpGrouper, self).__init__(*args, **kwargs)
         self.expressions = self.read_option('python_expressions', [])
         self.interpreter = Interpreter()
+        self._evaluate = None
 
-    def _get_membership(self, item):
+    def apply(self, item):
         try:
-            context = create_context(item=item)
-            return [
-                self.interpreter.eval(expression, context=context)
-                for expression in self.expressions
-            ]
+            if self._evaluate is None:
+                self._evaluate = self.interpreter.evaluator(self.expressions)
+            item.group_membership = tuple(self._evaluate(item))
         except Exception as ex:
             self.logger.error(str(ex))
             raise
+        return item
 
     def group_batch(self, batch):
-        for item in batch:
-            item.group_membership = tuple(self._get_membership(item))
-            yield item
+        try:
+            for item, membership in self.interpreter.eval_batch(self.expressions, batch):
+                item.group_membership = tuple(membership)
+                yield item
+        except Exception as ex:
+            self.logger.error(str(ex))
+            raise
@@ -41,12 +41,44 @@ class BasePipelineItem(object):
             elif option_value is None:
                 raise ConfigurationError('Missing value for option %s' % option_name)
 
+    def overrides(self, base_class, method_name):
+        """
+        Returns whether the item class redefines a method of base_class.
+        """
+        method = six.get_unbound_function(getattr(type(self), method_name))
+        return method is not six.get_unbound_function(getattr(base_class, method_name))
+
+    def apply_matches(self, batch_method_name):
+        """
+        Returns whether the apply method of the item class is defined along with
+        its batch method, or after it in a subclass, so applying it item by item
+        does the same as the batch method.
+        """
+        def defining_class(method_name):
+            return next(cls for cls in type(self).__mro__ if method_name in vars(cls))
+        return issubclass(defining_class('apply'), defining_class(batch_method_name))
+
+    def is_noop(self):
+        """
+        Returns whether the item leaves batches as they are, so the exporter
+        can leave it out of the pipeline.
+        """
+        return False
+
     def read_option(self, option_name, default=None):
         return read_option(option_name, self.options, self.supported_options, default)
 
     def set_metadata(self, key, value, module):
         self.metadata.per_module[module][key] = value
 
+    def increment_metadata(self, key, amount, module):
+        """
+        Adds amount to an integer metadata value. Hot paths should count locally
+        and call this once per batch instead of once per item.
+        """
+        module_metadata = self.metadata.per_module[module]
+        module_metadata[key] = module_metadata.get(key, 0) + amount
+
     def update_metadata(self, d, module):
         self.metadata.per_module[module].update(d)
 
@@ -0,0 +1,86 @@
+from exporters.filters.base_filter import BaseFilter
+
+
+_FUSED_TEMPLATE = """
+def process_batch(batch):
+    {counters}
+    try:
+        for item in batch:
+            {body}
+            yield item
+    finally:
+        {report}
+"""
+
+
+def _fuse(stages):
+    """
+    Returns a generator function running the stages over a batch in a single
+    loop, without any per stage generator. The loop body is generated for the
+    given stages: filters are called as predicates (or through their apply
+    method, if they redefine it) and skip the item, transforms and groupers
+    replace it with the result of their apply method. Filters are counted in
+    local variables, and their counters are updated once the batch is done.
+    """
+    namespace = {}
+    counters, body, report = [], [], []
+    for index, stage in enumerate(stages):
+        total, filtered_out = 'total_{}'.format(index), 'filtered_out_{}'.format(index)
+        if isinstance(stage, BaseFilter):
+            counters.append('{} = {} = 0'.format(total, filtered_out))
+            body.append('{} += 1'.format(total))
+            if stage.overrides(BaseFilter, 'apply'):
+                namespace['apply_{}'.format(index)] = stage.apply
+                body.append('item = apply_{}(item)'.format(index))
+                body.append('if item is None:')
+            else:
+                namespace['predicate_{}'.format(index)] = stage.get_predicate()
+                body.append('if not predicate_{}(item):'.format(index))
+            body.append('    {} += 1'.format(filtered_out))
+            body.append('    continue')
+            namespace['count_{}'.format(index)] = stage.count_filtered
+            report.append('count_{}({}, {})'.format(index, total, filtered_out))
+        else:
+            namespace['apply_{}'.format(index)] = stage.apply
+            body.append('item = apply_{}(item)'.format(index))
+    source = _FUSED_TEMPLATE.format(
+        counters='\n    '.join(counters) or 'pass',
+        body='\n            '.join(body),
+        report='\n        '.join(report) or 'pass')
+    exec(compile(source, '<fused pipeline>', 'exec'), namespace)
+    return namespace['process_batch']
+
+
+class FusedPipeline(object):
+    """
+    Runs the filter, transform and grouper stages of an export over a batch.
+
+    No-op stages are left out, and consecutive stages supporting it are run
+    item by item in a single loop, instead of chaining one generator per stage.
+    Stages that only work on whole batches keep using their batch method.
+    Only filters can drop items.
+    """
+
+    def __init__(self, stages):
+        """
+        Receives a list of (stage, batch_method) tuples, in pipeline order.
+        """
+        self.segments = []
+        fused = []
+        for stage, process_batch in stages:
+            if stage.is_noop():
+                continue
+            if stage.supports_apply():
+                fused.append(stage)
+                continue
+            if fused:
+                self.segments.append(_fuse(fused))
+                fused = []
+            self.segments.append(process_batch)
+        if fused:
+            self.segments.append(_fuse(fused))
+
+    def process_batch(self, batch):
+        for process_batch in self.segments:
+            batch = process_batch(batch)
+        return batch
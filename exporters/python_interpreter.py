@@ -4,28 +4,40 @@ import ast
 from .exceptions import InvalidExpression
 
 
-def create_context(**kwargs):
-    import datetime
-    import re
-    import itertools
-    import calendar
-    import math
-    import random
-    context = dict(kwargs)
-    context.update(
-        dict(
+_base_context = None
+
+
+def _get_base_context():
+    global _base_context
+    if _base_context is None:
+        import datetime
+        import re
+        import itertools
+        import calendar
+        import math
+        import random
+        _base_context = dict(
             datetime=datetime,
             re=re,
             itertools=itertools,
             calendar=calendar,
             math=math,
             random=random,
-        ),
-    )
+        )
+    return _base_context
+
+
+def create_context(**kwargs):
+    context = dict(kwargs)
+    context.update(_get_base_context())
     return context
 
 
 class Interpreter(object):
+    """
+    Evaluates restricted python expressions. Expressions are checked and compiled
+    only once, and their code objects are cached.
+    """
 
     ast_allowed_nodes = (
         'keyword',
@@ -52,6 +64,9 @@ class Interpreter(object):
         type(None), bool  # others
     )
 
+    def __init__(self):
+        self._compiled = {}
+
     def check(self, expression):
         if not isinstance(expression, six.string_types):
             raise InvalidExpression('Python expressions must be defined as strings')
@@ -75,11 +90,46 @@ class Interpreter(object):
 
         self._check_node(start_node)
 
+    def compile(self, expression):
+        """
+        Checks the expression and returns its compiled code object.
+        """
+        code = self._compiled.get(expression)
+        if code is None:
+            self.check(expression)
+            code = compile(expression, '<expression>', 'eval')
+            self._compiled[expression] = code
+        return code
+
     def eval(self, expression, context=None, check=True):
         if check:
-            self.check(expression)
+            return eval(self.compile(expression), context)
         return eval(expression, context)
 
+    def evaluator(self, expressions, **kwargs):
+        """
+        Returns a function evaluating the expressions for an item, and returning
+        the list of results. The context is built once, and every item gets its
+        own copy, so names set by expressions (e.g. comprehension variables)
+        don't leak to the next items.
+        """
+        codes = [self.compile(expression) for expression in expressions]
+        base_context = create_context(**kwargs)
+
+        def evaluate(item):
+            context = dict(base_context, item=item)
+            return [eval(code, context) for code in codes]
+        return evaluate
+
+    def eval_batch(self, expressions, items, **kwargs):
+        """
+        Evaluates the expressions for every item, yielding (item, results) tuples.
+        The context is built once for the whole batch, and copied for every item.
+        """
+        evaluate = self.evaluator(expressions, **kwargs)
+        for item in items:
+            yield item, evaluate(item)
+
     def _check_node(self, node):
         if isinstance(node, list):
             self._check_node_list(node)
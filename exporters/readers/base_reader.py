@@ -17,9 +17,8 @@ class BaseReader(BasePipelineItem):
         self.last_position = {}
         self.set_metadata('read_items', 0)
 
-    def increase_read(self):
-        self.set_metadata('read_items',
-                          self.get_metadata('read_items') + 1)
+    def increase_read(self, count=1):
+        self.increment_metadata('read_items', count)
 
     def get_next_batch(self):
         """
@@ -48,9 +47,18 @@ class BaseReader(BasePipelineItem):
         """
         return self.last_position
 
+    def finish_reading(self):
+        """
+        Called from the manager once the export has successfully finished.
+        """
+        pass
+
     def set_metadata(self, key, value, module='reader'):
         super(BaseReader, self).set_metadata(key, value, module)
 
+    def increment_metadata(self, key, amount, module='reader'):
+        super(BaseReader, self).increment_metadata(key, amount, module)
+
     def update_metadata(self, data, module='reader'):
         super(BaseReader, self).update_metadata(data, module)
 
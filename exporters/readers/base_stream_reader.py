@@ -3,6 +3,7 @@ from exporters.readers.base_reader import BaseReader
 from exporters.iterio import cohere_stream
 from exporters.decompressors import ZLibDecompressor
 from exporters.deserializers import JsonLinesDeserializer
+from exporters.readers.streams_manifest import StreamsManifest
 
 
 class StreamBasedReader(BaseReader):
@@ -16,17 +17,25 @@ class StreamBasedReader(BaseReader):
     Avaliable Options:
         - batch_size (int)
             Number of items to be returned in each batch
+
+        - incremental_manifest (str)
+            Path to a local manifest file. If set, only streams that are new or
+            have changed since they were read by a previous successful export are
+            read, and the manifest is updated when the export finishes.
     """
 
     # List of options to set up the reader
     supported_options = {
         'batch_size': {'type': six.integer_types, 'default': 10000},
+        'incremental_manifest': {'type': six.string_types, 'default': None},
     }
 
     def __init__(self, *args, **kwargs):
         super(StreamBasedReader, self).__init__(*args, **kwargs)
         self.iterator = None
         self.batch_size = self.read_option('batch_size')
+        manifest_path = self.read_option('incremental_manifest')
+        self.manifest = StreamsManifest(manifest_path) if manifest_path else None
 
     decompressor = ZLibDecompressor({}, None)
     deserializer = JsonLinesDeserializer({}, None)
@@ -42,7 +51,8 @@ class StreamBasedReader(BaseReader):
                 items_iter = self.deserializer.deserialize(stream)
                 for record in items_iter:
                     yield record
-                self.last_position['readed_streams'].append(fn)
+                self.set_stream_as_read(fn)
+                self.add_stream_to_manifest(fn)
             finally:
                 stream.close()
         self.finished = True
@@ -68,6 +78,37 @@ class StreamBasedReader(BaseReader):
         """
         raise NotImplementedError()
 
+    def set_stream_as_read(self, stream_name):
+        """
+        Records in the last position that the given stream has been fully read
+        """
+        self.last_position['readed_streams'].append(stream_name)
+
+    def is_stream_pending(self, stream_name, size, signature):
+        """
+        Returns whether a stream has to be read, checking its size and signature
+        (modification time, etag...) against the incremental manifest, if any.
+        Readers should call it before opening the stream.
+        """
+        if self.manifest is None:
+            return True
+        return self.manifest.is_pending(stream_name, size, signature)
+
+    def add_stream_to_manifest(self, stream_name):
+        if self.manifest is not None:
+            row = self.manifest.add(stream_name)
+            if row is not None:
+                # streams read after the position are forgotten when resuming it
+                self.last_position['manifest_row'] = row
+
+    def finish_reading(self):
+        if self.manifest is not None:
+            self.manifest.save()
+
+    def close(self):
+        if self.manifest is not None:
+            self.manifest.close()
+
     def set_last_position(self, last_position):
         """
         Called from the manager, it is in charge of updating the last position of data commited
@@ -75,6 +116,8 @@ class StreamBasedReader(BaseReader):
         """
         last_position = last_position or {}
         last_position.setdefault('readed_streams', [])
+        if self.manifest is not None:
+            self.manifest.discard_after(last_position.get('manifest_row', 0))
         self.last_position = last_position
 
 
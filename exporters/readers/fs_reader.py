@@ -1,6 +1,11 @@
 import os
 import re
 
+try:
+    from os import scandir
+except ImportError:  # python < 3.5
+    from scandir import scandir
+
 from exporters.readers.base_stream_reader import StreamBasedReader
 from exporters.exceptions import ConfigurationError
 from exporters.bypasses.stream_bypass import Stream
@@ -38,6 +43,9 @@ class FSReader(StreamBasedReader):
             - "pattern": (optional) regular expression to filter filenames,
               e.g. "output.*\.jl\.gz$"
 
+    Directories are listed lazily, one level at a time and in sorted order,
+    so reading starts as soon as the first file is found. Resume state keeps
+    a cursor with the last read file instead of the list of every read path.
     """
 
     # List of options to set up the reader
@@ -49,15 +57,13 @@ class FSReader(StreamBasedReader):
         super(FSReader, self).__init__(*args, **kwargs)
         self.input_specification = self.read_option('input')
 
-        self.files = self._get_input_files(self.input_specification)
-        self.read_files = []
-        self.current_file = None
-        self.last_line = 0
+        self.input_units = self._get_input_units(self.input_specification)
+        self.current_unit = None
         self.logger.info('FSReader has been initiated')
 
     @classmethod
-    def _get_input_files(cls, input_specification):
-        """Get list of input files according to input definition.
+    def _get_input_units(cls, input_specification):
+        """Validate the input definition and get the list of input units.
 
         Input definition can be:
 
@@ -69,6 +75,8 @@ class FSReader(StreamBasedReader):
         toplevel directory under which input files will be sought and an optional
         filepath pattern
 
+        Filenames are returned as they are, directory dicts are returned with
+        their pointers resolved. No directory is listed here.
         """
         if isinstance(input_specification, (basestring, dict)):
             input_specification = [input_specification]
@@ -94,10 +102,11 @@ class FSReader(StreamBasedReader):
                 if dir_pointer is not missing:
                     directory = cls._get_pointer(dir_pointer)
 
-                out.extend(cls._get_directory_files(
-                    directory=directory,
-                    pattern=input_unit.get('pattern'),
-                    include_dot_files=input_unit.get('include_dot_files', False)))
+                out.append({
+                    'directory': directory,
+                    'pattern': input_unit.get('pattern'),
+                    'include_dot_files': input_unit.get('include_dot_files', False),
+                })
             else:
                 raise ConfigurationError('Input must only contain strings or dicts')
         return out
@@ -112,26 +121,74 @@ class FSReader(StreamBasedReader):
 
     @classmethod
     def _get_directory_files(cls, directory, pattern=None,
-                             include_dot_files=False):
-        match_funcs = []
-        if pattern is not None:
-            match_funcs.append(re.compile(pattern).search)
-
-        if not include_dot_files:
-            def is_non_dot_file(filepath):
-                return not os.path.basename(filepath).startswith('.')
+                             include_dot_files=False, start_after=None):
+        """Lazily yield (filepath, stat) tuples for the files under directory.
 
-            match_funcs.append(is_non_dot_file)
-
-        return [
-            filepath
-            for dirpath, directories, filenames in os.walk(directory)
-            for filepath in (os.path.join(dirpath, f) for f in filenames)
-            if all(mf(filepath) for mf in match_funcs)
-        ]
+        Files are yielded in the same order as sorting all their paths would give,
+        but each directory is only listed when the walk reaches it. If start_after
+        is given, files up to that path are skipped, as well as whole directories
+        that sort before it.
+        """
+        search = re.compile(pattern).search if pattern is not None else None
+
+        def sort_key(entry):
+            # children of a directory "a" are "a/...", so sorting directories
+            # by "a/" keeps the walk in the order of the full paths
+            return entry.name + os.sep if entry.is_dir() else entry.name
+
+        def walk(dirpath):
+            try:
+                entries = sorted(scandir(dirpath), key=sort_key)
+            except OSError:
+                return
+            for entry in entries:
+                filepath = os.path.join(dirpath, entry.name)
+                if entry.is_dir():
+                    if entry.is_symlink():
+                        continue
+                    subtree = filepath + os.sep
+                    if start_after is not None and subtree < start_after and \
+                            not start_after.startswith(subtree):
+                        continue
+                    for item in walk(filepath):
+                        yield item
+                    continue
+                if start_after is not None and filepath <= start_after:
+                    continue
+                if not include_dot_files and entry.name.startswith('.'):
+                    continue
+                if search is not None and not search(filepath):
+                    continue
+                yield filepath, entry.stat()
+
+        return walk(directory)
+
+    def _get_unit_files(self, input_unit, start_after=None):
+        if isinstance(input_unit, basestring):
+            if start_after is None:
+                yield input_unit, os.stat(input_unit)
+            return
+        # files given explicitly are read on their own, not again from a directory
+        explicit_files = set(u for u in self.input_units if isinstance(u, basestring))
+        for fpath, stat in self._get_directory_files(start_after=start_after, **input_unit):
+            if fpath not in explicit_files:
+                yield fpath, stat
 
     def get_read_streams(self):
-        for fpath in sorted(self.files):
-            size = os.path.getsize(fpath)
-            with open(fpath, 'rb') as f:
-                yield Stream(f, fpath, size)
+        cursor = self.last_position.get('fs_cursor')
+        for index, input_unit in enumerate(self.input_units):
+            start_after = None
+            if cursor is not None:
+                if index < cursor['unit']:
+                    continue
+                if index == cursor['unit']:
+                    start_after = cursor['path']
+            self.current_unit = index
+            for fpath, stat in self._get_unit_files(input_unit, start_after):
+                if not self.is_stream_pending(fpath, stat.st_size, repr(stat.st_mtime)):
+                    continue
+                with open(fpath, 'rb') as f:
+                    yield Stream(f, fpath, stat.st_size)
+
+    def set_stream_as_read(self, stream_name):
+        self.last_position['fs_cursor'] = {'unit': self.current_unit, 'path': stream_name}
@@ -88,11 +88,15 @@ class HubstorageReader(BaseReader):
         """
         if self.collection_scanner.is_enabled:
             batch = self.collection_scanner.get_new_batch()
-            for item in batch:
-                base_item = BaseRecord(item)
-                self.increase_read()
-                self.last_position['last_key'] = item['_key']
-                yield base_item
+            read = 0
+            try:
+                for item in batch:
+                    base_item = BaseRecord(item)
+                    read += 1
+                    self.last_position['last_key'] = item['_key']
+                    yield base_item
+            finally:
+                self.increase_read(read)
             self.logger.debug('Done reading batch')
         else:
             self.logger.debug('No more batches')
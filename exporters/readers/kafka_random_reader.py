@@ -105,10 +105,14 @@ class KafkaRandomReader(BaseReader):
         """
         messages = self.get_from_kafka()
         if messages:
-            for message in messages:
-                item = BaseRecord(message)
-                self.increase_read()
-                yield item
+            read = 0
+            try:
+                for message in messages:
+                    item = BaseRecord(message)
+                    read += 1
+                    yield item
+            finally:
+                self.increase_read(read)
 
         self.logger.debug('Done reading batch')
         self.last_position = self.consumer.offsets
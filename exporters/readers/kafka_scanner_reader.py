@@ -72,14 +72,17 @@ class KafkaScannerReader(BaseReader):
         of BaseRecord objects.
         When it has nothing else to read, it must set class variable "finished" to True.
         """
+        read = 0
         try:
             batch = self.get_from_kafka()
             for message in batch:
                 item = BaseRecord(message)
-                self.increase_read()
+                read += 1
                 yield item
         except:
             self.finished = True
+        finally:
+            self.increase_read(read)
         self.logger.debug('Done reading batch')
 
     def set_last_position(self, last_position):
@@ -194,5 +194,8 @@ class S3Reader(StreamBasedReader):
         from exporters.bypasses.stream_bypass import Stream
         for key_name in self.keys:
             key = self.bucket.get_key(key_name)
+            if not self.is_stream_pending(key_name, key.size, key.etag):
+                self.logger.debug('Skipping S3 key {}. Already read'.format(key_name))
+                continue
             file_obj = urlopen(key.generate_url(S3_URL_EXPIRES_IN))
             yield Stream(file_obj, key_name, key.size)
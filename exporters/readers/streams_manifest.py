@@ -0,0 +1,70 @@
+import sqlite3
+
+
+class StreamsManifest(object):
+    """
+    Local index of the streams read by previous successful exports.
+
+    Each stream is stored with its size and a signature (modification time,
+    etag...) so that an incremental export can tell new or changed streams
+    apart from the ones it has already read. Streams read during the current
+    job are kept in a separate table, numbered as they are added, and only
+    moved to the index when save() is called. Readers keep the number of the
+    last one in their position, so that a resumed job can forget the ones
+    read after it with discard_after().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.text_factory = str
+        with self.connection:
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS streams '
+                '(name TEXT PRIMARY KEY, size INTEGER, signature TEXT)')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS read_streams '
+                '(row INTEGER PRIMARY KEY, name TEXT, size INTEGER, signature TEXT)')
+        self.candidates = {}
+
+    def is_pending(self, name, size, signature):
+        """
+        Returns whether the stream is new or has changed since it was last read.
+        """
+        row = self.connection.execute(
+            'SELECT size, signature FROM streams WHERE name = ?', (name,)).fetchone()
+        if row is not None and tuple(row) == (size, signature):
+            return False
+        self.candidates[name] = (size, signature)
+        return True
+
+    def add(self, name):
+        """
+        Marks a stream checked with is_pending() as completely read, and returns
+        its number in the streams read by the current job.
+        """
+        entry = self.candidates.pop(name, None)
+        if entry is None:
+            return None
+        with self.connection:
+            return self.connection.execute(
+                'INSERT INTO read_streams (name, size, signature) VALUES (?, ?, ?)',
+                (name,) + entry).lastrowid
+
+    def discard_after(self, row):
+        """
+        Forgets the streams read by the current job after the given number, all
+        of them if it's 0.
+        """
+        with self.connection:
+            self.connection.execute('DELETE FROM read_streams WHERE row > ?', (row,))
+
+    def save(self):
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO streams (name, size, signature) '
+                'SELECT name, size, signature FROM read_streams ORDER BY row')
+            self.connection.execute('DELETE FROM read_streams')
+
+    def close(self):
+        self.connection.close()
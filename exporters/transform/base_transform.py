@@ -20,6 +20,25 @@ class BaseTransform(BasePipelineItem):
         """
         raise NotImplementedError
 
+    def apply(self, item):
+        """
+        Transforms a single item and returns the resulting item. Transforms that
+        can work item by item should implement it, so the exporter can run them
+        in a single loop with the other stages.
+        """
+        raise NotImplementedError
+
+    def supports_apply(self):
+        return self.overrides(BaseTransform, 'apply') and self.apply_matches('transform_batch')
+
+    def get_required_fields(self):
+        """
+        Returns the set of item fields this transform needs, or None if it may
+        need any of them. As transformed items can have any fields, only the
+        no-op transform lets the exporter compute a projection.
+        """
+        return None
+
     def set_metadata(self, key, value, module='transform'):
         super(BaseTransform, self).set_metadata(key, value, module)
 
@@ -28,3 +28,6 @@ class FlatsonTransform(BaseTransform):
     def transform_batch(self, batch):
         for record in batch:
             yield self.flatson.flatten_dict(record)
+
+    def apply(self, item):
+        return self.flatson.flatten_dict(item)
@@ -1,5 +1,7 @@
+import itertools
+import json
+
 import six
-import yaml
 from exporters.records.base_record import BaseRecord
 from exporters.transform.base_transform import BaseTransform
 
@@ -12,17 +14,32 @@ def _compile_jq(jq_expr):
     return jq.jq(jq_expr)
 
 
+def _first_output_expression(jq_expr):
+    """Wraps a JQ expression so that it outputs at most one value per input,
+    as when applying it to items one by one.
+    """
+    return '[({})] | .[:1] | .[]'.format(jq_expr)
+
+
 class JQTransform(BaseTransform):
     """
     It applies jq transformations to items. To see documentation
     about possible jq transformations please refer to its
     `official documentation <http://stedolan.github.io/jq/manual/>`_.
 
+    Items are fed to jq in chunks, as a stream of JSON documents, and only
+    the first output for each item is kept. Items for which the filter has
+    no output are dropped.
+
         - jq_filter (str)
             Valid jq filter
+
+        - batch_size (int)
+            Number of items transformed with a single jq call
     """
     supported_options = {
-        'jq_filter': {'type': six.string_types}
+        'jq_filter': {'type': six.string_types},
+        'batch_size': {'type': six.integer_types, 'default': 1000},
     }
 
     def __init__(self, *args, **kwargs):
@@ -30,18 +47,25 @@ class JQTransform(BaseTransform):
         self.jq_expression = self.read_option('jq_filter')
         self.logger.info('JQTransform has been initiated. Expression: {}'.format(
             self.jq_expression))
-        self.jq_program = _compile_jq(self.jq_expression)
-
-    def transform_batch(self, batch):
-        for item in batch:
-            try:
-                transformed_item = self.jq_program.transform(item)
-            except StopIteration:
-                # jq.transform() raise StopIteration for filtered items
-                continue
+        self.jq_program = _compile_jq(_first_output_expression(self.jq_expression))
+        self.batch_size = self.read_option('batch_size')
 
-            if not isinstance(transformed_item, dict):
-                transformed_item = yaml.safe_load(transformed_item)
+    def _transform_chunk(self, chunk):
+        json_lines = u'\n'.join(json.dumps(item) for item in chunk)
+        # outputs are compact JSON documents, one per line. Filtered items have
+        # no output at all, so it is safe to parse them all in a single call.
+        output = self.jq_program.transform(text=json_lines, text_output=True)
+        return json.loads(u'[{}]'.format(output.replace(u'\n', u',')))
 
-            yield BaseRecord(transformed_item)
+    def transform_batch(self, batch):
+        batch = iter(batch)
+        while True:
+            chunk = list(itertools.islice(batch, self.batch_size))
+            if not chunk:
+                break
+            for transformed_item in self._transform_chunk(chunk):
+                if isinstance(transformed_item, six.string_types):
+                    # filters outputting serialized items, e.g. tojson
+                    transformed_item = json.loads(transformed_item)
+                yield BaseRecord(transformed_item)
         self.logger.debug('Transformed items')
@@ -6,9 +6,15 @@ class NoTransform(BaseTransform):
     It leaves the batch as is.
     This is provided for the cases where no transformations are needed on the original items.
     """
-
     def __init__(self, *args, **kwargs):
         super(NoTransform, self).__init__(*args, **kwargs)
 
     def transform_batch(self, batch):
         return batch
+
+    def is_noop(self):
+        # subclasses may do something with the batch
+        return type(self) is NoTransform
+
+    def get_required_fields(self):
+        return set()
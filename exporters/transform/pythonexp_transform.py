@@ -1,5 +1,5 @@
 from exporters.transform.base_transform import BaseTransform
-from exporters.python_interpreter import Interpreter, create_context
+from exporters.python_interpreter import Interpreter
 from exporters.utils import str_list
 
 
@@ -21,18 +21,22 @@ class PythonexpTransform(BaseTransform):
         if not self.is_valid_python_expression(self.python_expressions):
             raise ValueError('Python expression is not valid')
         self.interpreter = Interpreter()
+        self._evaluate = None
         self.logger.info('PythonexpTransform has been initiated. Expressions: {!r}'.format(
             self.python_expressions)
         )
 
     def transform_batch(self, batch):
-        for item in batch:
-            context = create_context(item=item)
-            for expression in self.python_expressions:
-                self.interpreter.eval(expression, context=context)
+        for item, _ in self.interpreter.eval_batch(self.python_expressions, batch):
             yield item
         self.logger.debug('Transformed items')
 
+    def apply(self, item):
+        if self._evaluate is None:
+            self._evaluate = self.interpreter.evaluator(self.python_expressions)
+        self._evaluate(item)
+        return item
+
     # TODO: Make a expression validator
     def is_valid_python_expression(self, python_expressions):
         return True
@@ -1,6 +1,6 @@
 import six
 from exporters.transform.base_transform import BaseTransform
-from exporters.python_interpreter import Interpreter, create_context
+from exporters.python_interpreter import Interpreter
 
 
 class PythonMapTransform(BaseTransform):
@@ -14,11 +14,11 @@ class PythonMapTransform(BaseTransform):
         super(PythonMapTransform, self).__init__(*args, **kwargs)
         self.map_expression = self.read_option('map')
         self.interpreter = Interpreter()
-        self.interpreter.check(self.map_expression)
-
-    def _map_item(self, it):
-        context = create_context(item=it)
-        return self.interpreter.eval(expression=self.map_expression, context=context)
+        self._evaluate = self.interpreter.evaluator([self.map_expression])
 
     def transform_batch(self, batch):
-        return (self._map_item(it) for it in batch)
+        results = self.interpreter.eval_batch([self.map_expression], batch)
+        return (result for _, (result,) in results)
+
+    def apply(self, item):
+        return self._evaluate(item)[0]
@@ -1,37 +1,159 @@
+import io
 import os
 import shutil
 import tempfile
 import uuid
 import re
 import hashlib
+import zlib
+from collections import OrderedDict
 from six.moves import UserDict
 
-from exporters.compression import get_compress_file
+from exporters.compression import get_compress_file, get_compression_extension
 from exporters.utils import remove_if_exists
 
 
 def get_filename(name_without_ext, file_extension, compression_format):
-    if compression_format != 'none':
-        return '{}.{}.{}'.format(name_without_ext, file_extension, compression_format)
+    compression_extension = get_compression_extension(compression_format)
+    if compression_extension:
+        return '{}.{}.{}'.format(name_without_ext, file_extension, compression_extension)
     else:
         return '{}.{}'.format(name_without_ext, file_extension)
 
 
+class CrcHash(object):
+    """
+    A crc function with the hashlib interface.
+    """
+
+    def __init__(self, name, crc_function):
+        self.name = name
+        self.crc_function = crc_function
+        self.crc = crc_function(b'')
+
+    def update(self, data):
+        self.crc = self.crc_function(data, self.crc)
+
+    def hexdigest(self):
+        return '{:08x}'.format(self.crc & 0xffffffff)
+
+
+def _make_crc32c_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x82f63b78 if crc & 1 else crc >> 1
+        table.append(crc)
+    return table
+
+
+_CRC32C_TABLE = _make_crc32c_table()
+
+
+def _crc32c(data, crc=0):
+    """
+    crc32c (Castagnoli) in pure python, used when the crc32c package is not
+    installed. It is much slower than the package.
+    """
+    table = _CRC32C_TABLE
+    crc ^= 0xffffffff
+    for byte in bytearray(data):
+        crc = table[(crc ^ byte) & 0xff] ^ (crc >> 8)
+    return crc ^ 0xffffffff
+
+
+def new_hash(algorithm):
+    """
+    Returns a hash object for any hashlib algorithm, crc32, crc32c (fast if
+    the crc32c package is installed), or xxh64 if xxhash is installed.
+    """
+    if algorithm == 'crc32':
+        return CrcHash('crc32', zlib.crc32)
+    if algorithm == 'crc32c':
+        try:
+            from crc32c import crc32c
+        except ImportError:
+            crc32c = _crc32c
+        return CrcHash('crc32c', crc32c)
+    if algorithm == 'xxh64':
+        import xxhash
+        return xxhash.xxh64()
+    return hashlib.new(algorithm)
+
+
 def hash_for_file(path, algorithm, block_size=256*128):
-    hash = hashlib.new(algorithm)
+    hash = new_hash(algorithm)
     with open(path, 'rb') as f:
         for chunk in iter(lambda: f.read(block_size), b''):
             hash.update(chunk)
     return hash.hexdigest()
 
 
+class FileDigests(object):
+    """Digests of a file, updated with its bytes as they are written:
+
+    * the hash of the whole file, with the given algorithm
+    * if part_size is given, the md5 of each part of that size, as
+      needed for the ETag of an S3 multipart upload
+    """
+
+    def __init__(self, algorithm='md5', part_size=None):
+        self.algorithm = algorithm
+        self.hash = new_hash(algorithm)
+        self.part_size = part_size
+        self.part_digests = []
+        self.part_hash = None
+        self.part_left = 0
+
+    def update(self, data):
+        self.hash.update(data)
+        if not self.part_size:
+            return
+        while data:
+            if not self.part_left:
+                self._end_part()
+                self.part_hash = hashlib.md5()
+                self.part_left = self.part_size
+            part_data = data[:self.part_left]
+            self.part_hash.update(part_data)
+            self.part_left -= len(part_data)
+            data = data[len(part_data):]
+
+    def _end_part(self):
+        if self.part_hash is not None:
+            self.part_digests.append(self.part_hash.digest())
+            self.part_hash = None
+
+    def hexdigest(self):
+        return self.hash.hexdigest()
+
+    def multipart_etag(self):
+        """Returns the ETag S3 gives to the file if it is uploaded in parts
+        of part_size, same as utils.calculate_multipart_etag.
+        """
+        self._end_part()
+        self.part_left = 0
+        new_md5 = hashlib.md5(b''.join(self.part_digests))
+        return '"%s-%s"' % (new_md5.hexdigest(), len(self.part_digests))
+
+
+# keeps well under the usual limit of 1024 open files per process
+DEFAULT_MAX_OPEN_FILES = 256
+
+
 class GroupingInfo(UserDict):
     """Contains groups metadata for the grouping feature in writers,
     tracking which group keys being used plus some details for each group:
 
     * how many items were written
-    * which are the buffer files used
+    * how many buffer files were used, and the path of the current one
     * how many items are in the current buffer
+    * the digests and the state of the current buffer file when it
+      is not open
+
+    Buffer file objects are not kept here, so that the state of each group
+    stays small even with lots of groups.
     """
     used_random_strings = set()
 
@@ -53,18 +175,27 @@ class GroupingInfo(UserDict):
         self[key]['path_safe_keys'] = groups
         self[key]['total_items'] = 0
         self[key]['buffered_items'] = 0
-        self[key]['group_file'] = []
+        self[key]['file_count'] = 0
+        self[key]['current_path'] = None
+        # bytes written to the current buffer file when it is not open
+        self[key]['uncompressed_size'] = 0
+        self[key]['digests'] = None
+        self[key]['resume_state'] = None
 
     def ensure_group_info(self, key):
         if key not in self:
             self._init_group_info_key(key)
 
     def add_buffer_file_to_group(self, key, buffer_file):
-        self[key]['group_file'].append(buffer_file)
+        self[key]['file_count'] += 1
+        self[key]['current_path'] = buffer_file.path
+        self[key]['uncompressed_size'] = 0
+        self[key]['digests'] = None
+        self[key]['resume_state'] = None
 
-    def add_to_group(self, key):
-        self[key]['total_items'] += 1
-        self[key]['buffered_items'] += 1
+    def add_to_group(self, key, count=1):
+        self[key]['total_items'] += count
+        self[key]['buffered_items'] += count
 
     def reset_key(self, key):
         self[key]['buffered_items'] = 0
@@ -74,41 +205,118 @@ class GroupingInfo(UserDict):
 
 
 class BufferFile(object):
+    """Buffer file for a group of items. If resume is True, the file is
+    expected to exist, and the items are appended to it. The compression
+    options, like compression_level, are given to the compressed file.
+
+    The uncompressed bytes written and the compressed bytes flushed to disk
+    are counted in memory, so the buffer size can be checked for every item.
+    If hash_algorithm is given, the digests of the file are computed while
+    it is written; hash_part_size adds the md5 of each part of that size.
+    A resumed file gets the digests computed so far, and the state its
+    compressed file returned when suspended, if any.
+
+    If memory_size is given, the compressed bytes are kept in memory until
+    they go over it, see CountingFile. Suspended files are moved to disk.
+    """
 
     def __init__(self, formatter, tmp_folder, compression_format,
-                 file_name=None, hash_algorithm='md5'):
+                 file_name=None, hash_algorithm='md5', resume=False, uncompressed_size=0,
+                 compression_options=None, hash_part_size=None, digests=None,
+                 resume_state=None, memory_size=0):
         self.formatter = formatter
         self.tmp_folder = tmp_folder
         self.file_extension = formatter.file_extension
         self.compression_format = compression_format
+        self.compression_options = compression_options or {}
         self.path = self._get_new_path_name(file_name)
+        if digests is None and hash_algorithm:
+            digests = FileDigests(hash_algorithm, hash_part_size)
+        self.digests = digests
+        self.resume_state = resume_state
+        self.memory_size = memory_size
         self.file = self._create_file()
+        # the CountingFile the compressed bytes are written to
+        self.raw_file = getattr(self.file, 'raw_file', self.file)
+        self.uncompressed_size = uncompressed_size
+        self.file_writer = None
+        if self.formatter.writes_files:
+            self.file_writer = self.formatter.open_file_writer(self._write)
         header = self.formatter.format_header()
-        if header:
-            self.file.write(header)
+        if header and not resume:
+            self._write(header)
 
     def _create_file(self):
-        return get_compress_file(self.compression_format)(self.path)
+        return get_compress_file(self.compression_format)(
+            self.path, digests=self.digests, resume_state=self.resume_state,
+            memory_size=self.memory_size, **self.compression_options)
 
     def _get_new_path_name(self, file_name):
         if not file_name:
             file_name = get_filename(uuid.uuid4(), self.file_extension, self.compression_format)
         return os.path.join(self.tmp_folder, file_name)
 
+    def _write(self, content):
+        self.file.write(content)
+        self.uncompressed_size += len(content)
+
+    @property
+    def compressed_size(self):
+        """Bytes written to disk so far. Compressors buffer some data
+        internally, so it can be a bit behind uncompressed_size.
+        """
+        return self.file.compressed_size
+
     def add_item_to_file(self, item):
+        if self.file_writer is not None:
+            self.file_writer.write_batch([item])
+            return
         content = self.formatter.format(item)
-        self.file.write(content)
+        self._write(content)
 
     def add_item_separator_to_file(self):
+        if self.file_writer is not None:
+            return
         content = self.formatter.item_separator
-        self.file.write(content)
+        self._write(content)
+
+    def add_items_to_file(self, items, first_in_file=False):
+        """Formats the items and writes them at once, with the same output
+        as adding them one by one.
+        """
+        if self.file_writer is not None:
+            self.file_writer.write_batch(items)
+            return
+        content = self.formatter.format_batch(items)
+        if not first_in_file:
+            content = self.formatter.item_separator + content
+        self._write(content)
 
     def end_file(self):
+        if self.file_writer is not None:
+            self.file_writer.close()
         footer = self.formatter.format_footer()
         if footer:
-            self.file.write(footer)
+            self._write(footer)
         self.file.close()
 
+    def discard(self):
+        """Closes the file without ending it nor moving it to disk, for files
+        that are deleted anyway.
+        """
+        self.raw_file.discard()
+        self.file.close()
+
+    def suspend(self):
+        """Releases the file handle without ending the file. Compressed files
+        are closed as a complete member, a new one is appended when resumed,
+        unless they can be suspended and return a state to resume them.
+        """
+        # resumed files are opened from disk
+        self.raw_file.spill()
+        suspend = getattr(self.file, 'suspend', self.file.close)
+        self.resume_state = suspend()
+
 
 class GroupingBufferFilesTracker(object):
     """Class responsible for tracking buffer files
@@ -116,14 +324,33 @@ class GroupingBufferFilesTracker(object):
 
     Group buffer files are kept inside a temporary folder
     that is cleaned up when calling close().
+
+    At most max_open_files buffer files are kept open. When more groups
+    are being written, the least recently used ones are suspended and
+    resumed in append mode when needed again. The files of formatters that
+    write whole files can't be resumed, so the writer ends the least recently
+    used ones instead, see get_groups_to_end, and the next items of those
+    groups go to new files.
+
+    If hash_algorithm is given, buffer files are hashed as they are written,
+    and if memory_buffer_size is given, they are kept in memory up to that
+    size, see BufferFile.
     """
 
-    def __init__(self, formatter, compression_format):
+    def __init__(self, formatter, compression_format, max_open_files=DEFAULT_MAX_OPEN_FILES,
+                 compression_options=None, hash_algorithm=None, hash_part_size=None,
+                 memory_buffer_size=0):
         self.grouping_info = GroupingInfo()
         self.file_extension = formatter.file_extension
         self.formatter = formatter
         self.tmp_folder = tempfile.mkdtemp()
         self.compression_format = compression_format
+        self.compression_options = compression_options or {}
+        self.hash_algorithm = hash_algorithm
+        self.hash_part_size = hash_part_size
+        self.memory_buffer_size = memory_buffer_size
+        self.max_open_files = max_open_files
+        self.open_files = OrderedDict()
 
     def add_item_to_file(self, item, key):
         buffer_file = self.get_current_buffer_file_for_group(key)
@@ -134,24 +361,91 @@ class GroupingBufferFilesTracker(object):
         buffer_file = self.get_current_buffer_file_for_group(key)
         buffer_file.add_item_separator_to_file()
 
+    def add_items_to_file(self, items, key):
+        first_in_file = self.grouping_info.is_first_file_item(key)
+        buffer_file = self.get_current_buffer_file_for_group(key)
+        buffer_file.add_items_to_file(items, first_in_file)
+        self.grouping_info.add_to_group(key, len(items))
+
     def end_group_file(self, key):
         buffer_file = self.get_current_buffer_file_for_group(key)
         buffer_file.end_file()
+        del self.open_files[key]
 
     def close(self):
+        for buffer_file in self.open_files.values():
+            buffer_file.discard()
+        self.open_files.clear()
         shutil.rmtree(self.tmp_folder, ignore_errors=True)
 
     def create_new_group_file(self, key):
-        new_buffer_file = BufferFile(self.formatter, self.tmp_folder, self.compression_format)
+        new_buffer_file = BufferFile(self.formatter, self.tmp_folder, self.compression_format,
+                                     **self._get_buffer_file_options())
         self.grouping_info.add_buffer_file_to_group(key, new_buffer_file)
         self.grouping_info.reset_key(key)
+        self._add_open_file(key, new_buffer_file)
         return new_buffer_file
 
+    def get_groups_to_end(self, key):
+        """Returns the least recently used groups whose files must be ended
+        before opening the file of the given group, so that no more than
+        max_open_files are open, for formatters writing whole files.
+        """
+        if not self.formatter.writes_files or key in self.open_files:
+            return []
+        exceeding = len(self.open_files) + 1 - self.max_open_files
+        return list(self.open_files)[:max(exceeding, 0)]
+
+    def release_group_file(self, key):
+        """Makes the next items of a group go to a new file. Its current file
+        is discarded if it is still open, as it has no items.
+        """
+        buffer_file = self.open_files.pop(key, None)
+        if buffer_file is not None:
+            buffer_file.discard()
+            # its file number is used by the next file
+            self.grouping_info[key]['file_count'] -= 1
+        self.grouping_info.reset_key(key)
+
+    def _add_open_file(self, key, buffer_file):
+        self.open_files[key] = buffer_file
+        if self.formatter.writes_files:
+            return
+        while len(self.open_files) > self.max_open_files:
+            evicted_key, evicted_file = self.open_files.popitem(last=False)
+            evicted_file.suspend()
+            self.grouping_info[evicted_key]['uncompressed_size'] = evicted_file.uncompressed_size
+            self.grouping_info[evicted_key]['digests'] = evicted_file.digests
+            self.grouping_info[evicted_key]['resume_state'] = evicted_file.resume_state
+
+    def _get_buffer_file_options(self):
+        return {
+            'compression_options': self.compression_options,
+            'hash_algorithm': self.hash_algorithm,
+            'hash_part_size': self.hash_part_size,
+            'memory_size': self.memory_buffer_size,
+        }
+
+    def get_current_path(self, key):
+        return self.grouping_info[key]['current_path']
+
     def get_current_buffer_file_for_group(self, key):
-        if self.grouping_info[key]['group_file']:
-            buffer_file = self.grouping_info[key]['group_file'][-1]
-        else:
-            buffer_file = self.create_new_group_file(key)
+        buffer_file = self.open_files.pop(key, None)
+        if buffer_file is not None:
+            # move it to the most recently used end
+            self.open_files[key] = buffer_file
+            return buffer_file
+        current_path = self.get_current_path(key)
+        if current_path is None or self.formatter.writes_files:
+            # files written whole are ended when they are closed
+            return self.create_new_group_file(key)
+        buffer_file = BufferFile(
+            self.formatter, self.tmp_folder, self.compression_format, file_name=current_path,
+            resume=True, uncompressed_size=self.grouping_info[key]['uncompressed_size'],
+            digests=self.grouping_info[key]['digests'],
+            resume_state=self.grouping_info[key]['resume_state'],
+            **self._get_buffer_file_options())
+        self._add_open_file(key, buffer_file)
         return buffer_file
 
 
@@ -167,6 +461,8 @@ class WriteBuffer(object):
         self.items_group_files = items_group_files_handler
         self.compression_format = compression_format
         self.metadata = {}
+        # content of the packed buffer files kept in memory, by path
+        self.memory_buffers = {}
         self.is_new_buffer = True
 
     def buffer(self, item):
@@ -179,6 +475,21 @@ class WriteBuffer(object):
         self.grouping_info.ensure_group_info(key)
         self.items_group_files.add_item_to_file(item, key)
 
+    def buffer_items(self, key, items):
+        """
+        Receive a list of items of the same group and write them at once.
+        """
+        self.grouping_info.ensure_group_info(key)
+        self.items_group_files.add_items_to_file(items, key)
+
+    def get_buffer_capacity(self, key):
+        """
+        Returns how many items can be added to the current buffer of a group
+        before reaching items_per_buffer_write.
+        """
+        buffered_items = self.grouping_info.get(key, {}).get('buffered_items', 0)
+        return self.items_per_buffer_write - buffered_items
+
     def finish_buffer_write(self, key):
         self.items_group_files.end_group_file(key)
 
@@ -186,18 +497,37 @@ class WriteBuffer(object):
         """Prepare current buffer file for group of given key to be written
         (by gathering statistics).
         """
+        buffer_file = self.items_group_files.get_current_buffer_file_for_group(key)
         self.finish_buffer_write(key)
-        file_path = self.items_group_files.get_current_buffer_file_for_group(key).path
+        file_path = buffer_file.path
         file_hash = None
-        if self.hash_algorithm:
-            file_hash = hash_for_file(file_path, self.hash_algorithm)
+        multipart_etag = None
+        digests = buffer_file.digests
+        if digests is not None:
+            if digests.part_size:
+                multipart_etag = digests.multipart_etag()
+            if digests.algorithm == self.hash_algorithm:
+                file_hash = digests.hexdigest()
+        content = buffer_file.raw_file.content
+        if content is not None:
+            self.memory_buffers[file_path] = content
+            file_size = len(content)
+            if self.hash_algorithm and file_hash is None:
+                hash = new_hash(self.hash_algorithm)
+                hash.update(content)
+                file_hash = hash.hexdigest()
+        else:
+            file_size = os.path.getsize(file_path)
+            if self.hash_algorithm and file_hash is None:
+                file_hash = hash_for_file(file_path, self.hash_algorithm)
 
-        file_size = os.path.getsize(file_path)
         write_info = {
             'number_of_records': self.grouping_info[key]['buffered_items'],
             'file_path': file_path,
             'size': file_size,
+            'uncompressed_size': buffer_file.uncompressed_size,
             'file_hash': file_hash,
+            'multipart_etag': multipart_etag,
         }
         self.metadata[file_path] = write_info
         return write_info
@@ -205,14 +535,33 @@ class WriteBuffer(object):
     def add_new_buffer_for_group(self, key):
         self.items_group_files.create_new_group_file(key)
 
+    def get_groups_to_end(self, key):
+        return self.items_group_files.get_groups_to_end(key)
+
+    def release_group_buffer(self, key):
+        self.items_group_files.release_group_file(key)
+
+    def is_in_memory(self, path):
+        return path in self.memory_buffers
+
+    def open_buffer_file(self, path):
+        """Opens a packed buffer file for reading, from memory if it
+        was kept there.
+        """
+        if path in self.memory_buffers:
+            return io.BytesIO(self.memory_buffers[path])
+        return open(path, 'rb')
+
     def clean_tmp_files(self, write_info):
+        self.memory_buffers.pop(write_info.get('file_path'), None)
         remove_if_exists(write_info.get('path'))
         remove_if_exists(write_info.get('file_path'))
 
     def should_write_buffer(self, key):
-        if self.size_per_buffer_write and os.path.getsize(
-                self.grouping_info[key]['group_file'][-1].path) >= self.size_per_buffer_write:
-            return True
+        if self.size_per_buffer_write:
+            buffer_file = self.items_group_files.get_current_buffer_file_for_group(key)
+            if buffer_file.compressed_size >= self.size_per_buffer_write:
+                return True
         buffered_items = self.grouping_info[key].get('buffered_items', 0)
         return buffered_items >= self.items_per_buffer_write
 
@@ -26,6 +26,7 @@ class AzureBlobWriter(BaseWriter):
         'container': {'type': six.string_types}
     }
     hash_algorithm = 'md5'
+    needs_md5_hash = True
     VALID_CONTAINER_NAME_RE = r'[a-zA-Z0-9-]{3,63}'
 
     def __init__(self, *args, **kw):
@@ -73,7 +74,7 @@ class AzureBlobWriter(BaseWriter):
             'hash': b64encode(unhexlify(buffer_info['file_hash'])),
             'number_of_records': buffer_info['number_of_records']
         }
-        self.get_metadata('blobs_written').append(file_info)
+        self.append_metadata('blobs_written', file_info)
 
     def _check_write_consistency(self):
         from azure.common import AzureMissingResourceHttpError
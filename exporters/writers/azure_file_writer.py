@@ -55,10 +55,8 @@ class AzureFileWriter(FilebaseBaseWriter):
             'size': buffer_info['size'],
             'number_of_records': buffer_info['number_of_records']
         }
-        files_written = self.get_metadata('files_written')
-        files_written.append(file_info)
-        self.set_metadata('files_written', files_written)
-        self.get_metadata('files_counter')[filebase_path] += 1
+        self.append_metadata('files_written', file_info)
+        self._count_written_file(filebase_path)
 
     def _ensure_path(self, filebase):
         path = filebase.split('/')
@@ -1,10 +1,17 @@
+import copy
+import itertools
+import threading
+from collections import OrderedDict
+
 import six
 from exporters.export_formatter import DEFAULT_FORMATTER_CLASS
-from exporters.compression import FILE_COMPRESSION
+from exporters.compression import FILE_COMPRESSION, COMPRESSION_LEVELS
 from exporters.exceptions import ConfigurationError
 from exporters.logger.base_logger import WriterLogger
 from exporters.pipeline.base_pipeline_item import BasePipelineItem
-from exporters.write_buffer import WriteBuffer, GroupingBufferFilesTracker
+from exporters.writers.upload_queue import UploadQueue
+from exporters.write_buffer import (
+    WriteBuffer, GroupingBufferFilesTracker, DEFAULT_MAX_OPEN_FILES, new_hash)
 
 
 class ItemsLimitReached(Exception):
@@ -22,6 +29,8 @@ class InconsistentWriteState(Exception):
 ITEMS_PER_BUFFER_WRITE = 500000
 # Setting a default limit of 4Gb per file
 SIZE_PER_BUFFER_WRITE = 4000000000
+# Setting a default limit of 1Gb of buffer files waiting to be uploaded
+MAX_UPLOAD_BYTES_IN_FLIGHT = 1000000000
 
 
 class BaseWriter(BasePipelineItem):
@@ -33,10 +42,31 @@ class BaseWriter(BasePipelineItem):
         'size_per_buffer_write': {'type': six.integer_types, 'default': SIZE_PER_BUFFER_WRITE},
         'items_limit': {'type': six.integer_types, 'default': 0},
         'check_consistency': {'type': bool, 'default': False},
-        'compression': {'type': six.string_types, 'default': 'gz'}
+        'compression': {'type': six.string_types, 'default': 'gz'},
+        'compression_level': {'type': six.integer_types, 'default': None},
+        'compression_dictionary': {'type': six.string_types, 'default': None},
+        'compression_threads': {'type': six.integer_types, 'default': 1},
+        'memory_buffer_size': {'type': six.integer_types, 'default': 0},
+        'upload_threads': {'type': six.integer_types, 'default': 0},
+        'max_upload_bytes_in_flight': {
+            'type': six.integer_types, 'default': MAX_UPLOAD_BYTES_IN_FLIGHT},
+        'max_open_group_files': {'type': six.integer_types, 'default': DEFAULT_MAX_OPEN_FILES},
+        'hash_algorithm': {'type': six.string_types, 'default': None},
     }
 
+    # default hash of buffer files, overridden by the hash_algorithm option
     hash_algorithm = None
+    # writers comparing buffer file hashes with the md5 of the written files
+    # can only hash them with md5
+    needs_md5_hash = False
+    # if set, the md5 of each part of this size is computed for buffer files
+    hash_part_size = None
+    # writers reading buffer files with write_buffer.open_buffer_file support
+    # keeping them in memory
+    supports_memory_buffers = False
+    # writers whose write() can run in several upload threads at once,
+    # otherwise uploads run one at a time
+    parallel_uploads = False
 
     def __init__(self, options, metadata, *args, **kwargs):
         super(BaseWriter, self).__init__(options, metadata, *args, **kwargs)
@@ -51,22 +81,96 @@ class BaseWriter(BasePipelineItem):
         items_per_buffer_write = self.read_option('items_per_buffer_write')
         size_per_buffer_write = self.read_option('size_per_buffer_write')
         self.compression_format = self._get_compression_format()
+        self.compression_options = self._get_compression_options()
+        self.memory_buffer_size = self._get_memory_buffer_size()
+        self.hash_algorithm = self._get_hash_algorithm()
         self.write_buffer = WriteBuffer(items_per_buffer_write,
                                         size_per_buffer_write,
                                         self._items_group_files_handler(),
                                         self.compression_format, self.hash_algorithm)
         self.set_metadata('items_count', 0)
+        self.metadata_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.uploads = None
+        upload_threads = self.read_option('upload_threads')
+        if upload_threads:
+            self.uploads = UploadQueue(
+                upload_threads, self.read_option('max_upload_bytes_in_flight'))
 
     def _get_compression_format(self):
         compression = self.read_option('compression')
+        if self.export_formatter.writes_files:
+            # those files are compressed by the formatter
+            if 'compression' not in self.options:
+                return 'none'
+            if compression != 'none':
+                raise ConfigurationError('{} files are already compressed, the writer '
+                                         'compression must be none'.format(
+                                             self.export_formatter.__class__.__name__))
         if compression not in FILE_COMPRESSION:
             raise ConfigurationError('The compression format can only be '
                                      'one of the following:  "{}"'
                                      ''.format(FILE_COMPRESSION.keys()))
         return compression
 
+    def _get_hash_algorithm(self):
+        algorithm = self.read_option('hash_algorithm') or self.hash_algorithm
+        if algorithm is None:
+            return None
+        try:
+            new_hash(algorithm)
+        except ValueError:
+            raise ConfigurationError('Unknown hash algorithm "{}", it can be any hashlib '
+                                     'algorithm, crc32, crc32c or xxh64'.format(algorithm))
+        except ImportError as e:
+            raise ConfigurationError('The "{}" hash algorithm is not available: {}'.format(
+                algorithm, e))
+        if algorithm != 'md5' and self._needs_md5_hash():
+            raise ConfigurationError('{} compares file hashes with md5s, the hash algorithm '
+                                     'must be md5'.format(self.__class__.__name__))
+        return algorithm
+
+    def _needs_md5_hash(self):
+        return self.needs_md5_hash
+
+    def _get_compression_options(self):
+        compression = self.compression_format
+        level = self.read_option('compression_level')
+        dictionary = self.read_option('compression_dictionary')
+        threads = self.read_option('compression_threads')
+        if level is not None:
+            if compression not in COMPRESSION_LEVELS:
+                raise ConfigurationError('The "{}" compression format does not support '
+                                         'compression_level'.format(compression))
+            min_level, max_level = COMPRESSION_LEVELS[compression]
+            if not min_level <= level <= max_level:
+                raise ConfigurationError('The compression_level for "{}" must be between '
+                                         '{} and {}'.format(compression, min_level, max_level))
+        if dictionary and compression != 'zstd':
+            raise ConfigurationError('compression_dictionary can only be used with '
+                                     'zstd compression')
+        if threads < 1:
+            raise ConfigurationError('compression_threads must be at least 1')
+        if threads > 1 and compression != 'gz':
+            raise ConfigurationError('compression_threads can only be used with '
+                                     'gz compression')
+        return {'compression_level': level, 'compression_dictionary': dictionary,
+                'compression_threads': threads}
+
+    def _get_memory_buffer_size(self):
+        memory_buffer_size = self.read_option('memory_buffer_size')
+        if memory_buffer_size and not self.supports_memory_buffers:
+            raise ConfigurationError('{} does not support memory_buffer_size'.format(
+                self.__class__.__name__))
+        return memory_buffer_size
+
     def _items_group_files_handler(self):
-        return GroupingBufferFilesTracker(self.export_formatter, self.compression_format)
+        return GroupingBufferFilesTracker(
+            self.export_formatter, self.compression_format,
+            max_open_files=self.read_option('max_open_group_files'),
+            compression_options=self.compression_options,
+            hash_algorithm=self.hash_algorithm, hash_part_size=self.hash_part_size,
+            memory_buffer_size=self.memory_buffer_size)
 
     def write(self, path, key):
         """
@@ -84,16 +188,55 @@ class BaseWriter(BasePipelineItem):
         """
         Buffer a batch of items to be written and update internal counters.
 
+        Items are first split by group, and the items of each group are written
+        to its buffer at once. Buffers are still written as soon as they reach
+        items_per_buffer_write items, and no more than items_limit items are
+        taken from the batch.
+
         Calling this method doesn't guarantee that all items have been written.
         To ensure everything has been written you need to call flush().
         """
+        if self.items_limit:
+            remaining = self.items_limit - self.get_metadata('items_count')
+            if remaining > 0:
+                batch = itertools.islice(batch, remaining)
+        get_key = self.write_buffer.get_key_from_item
+        groups = OrderedDict()
         for item in batch:
-            self.write_buffer.buffer(item)
-            key = self.write_buffer.get_key_from_item(item)
+            key = get_key(item)
+            group_items = groups.get(key)
+            if group_items is None:
+                group_items = groups[key] = []
+            group_items.append(item)
+        for key, group_items in groups.iteritems():
+            self._buffer_group_items(key, group_items)
+        if self.uploads is not None:
+            self.uploads.check()
+        self._check_items_limit()
+
+    def _buffer_group_items(self, key, items):
+        for lru_key in self.write_buffer.get_groups_to_end(key):
+            self._end_group_buffer(lru_key)
+        start = 0
+        while start < len(items):
+            end = start + max(self.write_buffer.get_buffer_capacity(key), 1)
+            chunk = items[start:end]
+            self.write_buffer.buffer_items(key, chunk)
+            # keep items_count up to date for the write() call
+            self.increment_written_items(len(chunk))
             if self.write_buffer.should_write_buffer(key):
                 self._write_current_buffer_for_group_key(key)
-            self.increment_written_items()
-            self._check_items_limit()
+            start = end
+
+    def get_required_fields(self):
+        """
+        Returns the set of item fields this writer needs, or None if it may
+        need any of them. Writers buffering items through the export formatter
+        need nothing else, the formatter fields are asked for separately.
+        """
+        if self.overrides(BaseWriter, 'write_batch'):
+            return None
+        return set()
 
     def _check_items_limit(self):
         """
@@ -113,11 +256,25 @@ class BaseWriter(BasePipelineItem):
         for key in self.grouping_info.keys():
             if self._should_flush(key):
                 self._write_current_buffer_for_group_key(key)
+        if self.uploads is not None:
+            self.uploads.wait()
+
+    def when_written(self, callback):
+        """
+        Calls callback once the buffers written so far have been uploaded,
+        right away unless upload_threads is set.
+        """
+        if self.uploads is None:
+            callback()
+        else:
+            self.uploads.when_done(callback)
 
     def close(self):
         """
         Close all buffers, cleaning all temporary files.
         """
+        if self.uploads is not None:
+            self.uploads.close()
         if self.write_buffer is not None:
             self.write_buffer.close()
 
@@ -138,19 +295,47 @@ class BaseWriter(BasePipelineItem):
         """
         self.logger.warning('Not checking write consistency')
 
-    def increment_written_items(self):
-        self.set_metadata('items_count', self.get_metadata('items_count') + 1)
+    def increment_written_items(self, count=1):
+        self.increment_metadata('items_count', count)
 
-    def _write_current_buffer_for_group_key(self, key):
+    def _write_current_buffer_for_group_key(self, key, new_buffer=True):
         """
         Find the buffer for a given group key, prepare it to be written
         and writes it calling write() method.
+
+        If upload_threads is set, write() is called in an upload thread, and
+        a new buffer is used for the group in the meantime, unless new_buffer
+        is False.
         """
         write_info = self.write_buffer.pack_buffer(key)
-        self.write(write_info.get('file_path'),
-                   self.write_buffer.grouping_info[key]['membership'])
+        membership = self.write_buffer.grouping_info[key]['membership']
+        if new_buffer:
+            self.write_buffer.add_new_buffer_for_group(key)
+        if self.uploads is None:
+            self._write_packed_buffer(write_info, membership)
+        else:
+            self.uploads.submit(self._upload_packed_buffer, write_info['size'],
+                                write_info, membership)
+
+    def _end_group_buffer(self, key):
+        """
+        Writes the buffer of a group without opening a new one, so that its
+        file is closed. Its next items go to a new buffer.
+        """
+        if self._should_flush(key):
+            self._write_current_buffer_for_group_key(key, new_buffer=False)
+        self.write_buffer.release_group_buffer(key)
+
+    def _upload_packed_buffer(self, write_info, membership):
+        if self.parallel_uploads:
+            self._write_packed_buffer(write_info, membership)
+        else:
+            with self._write_lock:
+                self._write_packed_buffer(write_info, membership)
+
+    def _write_packed_buffer(self, write_info, membership):
+        self.write(write_info.get('file_path'), membership)
         self.write_buffer.clean_tmp_files(write_info)
-        self.write_buffer.add_new_buffer_for_group(key)
 
     def finish_writing(self):
         """
@@ -166,11 +351,27 @@ class BaseWriter(BasePipelineItem):
     def set_metadata(self, key, value, module='writer'):
         super(BaseWriter, self).set_metadata(key, value, module)
 
+    def increment_metadata(self, key, amount, module='writer'):
+        super(BaseWriter, self).increment_metadata(key, amount, module)
+
     def update_metadata(self, data, module='writer'):
         super(BaseWriter, self).update_metadata(data, module)
 
     def get_metadata(self, key, module='writer'):
         return super(BaseWriter, self).get_metadata(key, module)
 
+    def append_metadata(self, key, value):
+        """
+        Appends value to a metadata list. Upload threads may call it, so it's
+        done holding metadata_lock, like get_all_metadata copies it.
+        """
+        with self.metadata_lock:
+            self.get_metadata(key).append(value)
+
     def get_all_metadata(self, module='writer'):
-        return super(BaseWriter, self).get_all_metadata(module)
+        metadata = super(BaseWriter, self).get_all_metadata(module)
+        if self.uploads is not None:
+            # upload threads may update it while it is saved
+            with self.metadata_lock:
+                return copy.deepcopy(metadata)
+        return metadata
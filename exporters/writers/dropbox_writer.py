@@ -20,6 +20,9 @@ class DropboxWriter(FilebaseBaseWriter):
         'access_token': {'type': six.string_types, 'env_fallback': 'EXPORTERS_DROPBOXWRITER_TOKEN'},
     }
 
+    supports_memory_buffers = True
+    parallel_uploads = True
+
     def __init__(self, *args, **kw):
         from dropbox import Dropbox
         super(DropboxWriter, self).__init__(*args, **kw)
@@ -49,9 +52,9 @@ class DropboxWriter(FilebaseBaseWriter):
 
     def _write_file(self, dump_path, group_key, file_name=None):
         filebase_path, file_name = self.create_filebase_name(group_key, file_name=file_name)
-        with open(dump_path, 'r') as f:
+        with self.write_buffer.open_buffer_file(dump_path) as f:
             self._upload_file(f, '{}/{}'.format(filebase_path, file_name))
-        self.get_metadata('files_counter')[filebase_path] += 1
+        self._count_written_file(filebase_path)
 
     def get_file_suffix(self, path, prefix):
         number_of_keys = self.get_metadata('files_counter').get(path, 0)
@@ -2,6 +2,7 @@ import datetime
 import hashlib
 import os
 import re
+import threading
 import uuid
 import six
 
@@ -65,30 +66,33 @@ class Filebase(object):
 
 class FilebasedGroupingBufferFilesTracker(GroupingBufferFilesTracker):
 
-    def __init__(self, formatter, filebase, compression_format, start_file_count=0):
-        super(FilebasedGroupingBufferFilesTracker, self).__init__(formatter, compression_format)
+    def __init__(self, formatter, filebase, compression_format, start_file_count=0,
+                 **kwargs):
+        super(FilebasedGroupingBufferFilesTracker, self).__init__(
+            formatter, compression_format, **kwargs)
         self.filebase = filebase
         self.start_file_count = start_file_count
         self.compression_format = compression_format
 
     def create_new_group_file(self, key):
-        group_files = self.grouping_info[key]['group_file']
-        group_folder = self._get_group_folder(group_files)
-        current_file_count = len(group_files) + self.start_file_count
+        group_folder = self._get_group_folder(self.get_current_path(key))
+        current_file_count = self.grouping_info[key]['file_count'] + self.start_file_count
         group_info = self.grouping_info[key]['path_safe_keys']
         name_without_ext = self.filebase.formatted_prefix(
                 groups=group_info, file_number=current_file_count)
         file_name = get_filename(name_without_ext, self.file_extension, self.compression_format)
         file_name = os.path.join(group_folder, file_name)
         new_buffer_file = BufferFile(
-                self.formatter, self.tmp_folder, self.compression_format, file_name=file_name)
+                self.formatter, self.tmp_folder, self.compression_format, file_name=file_name,
+                **self._get_buffer_file_options())
         self.grouping_info.add_buffer_file_to_group(key, new_buffer_file)
         self.grouping_info.reset_key(key)
+        self._add_open_file(key, new_buffer_file)
         return new_buffer_file
 
-    def _get_group_folder(self, group_files):
-        if group_files:
-            return os.path.dirname(group_files[0].path)
+    def _get_group_folder(self, current_path):
+        if current_path:
+            return os.path.dirname(current_path)
         group_folder = os.path.join(self.tmp_folder, str(uuid.uuid4()))
         os.mkdir(group_folder)
         return group_folder
@@ -111,6 +115,7 @@ class FilebaseBaseWriter(BaseWriter):
     hash_algorithm = 'md5'
 
     def __init__(self, *args, **kwargs):
+        self._thread_state = threading.local()
         super(FilebaseBaseWriter, self).__init__(*args, **kwargs)
         self.filebase = Filebase(self.read_option('filebase'))
         self.set_metadata('effective_filebase', self.filebase.template)
@@ -122,12 +127,21 @@ class FilebaseBaseWriter(BaseWriter):
                 '{} has been initiated. Writing to: {}'.format(
                         self.__class__.__name__, self.filebase.template))
 
+    def _needs_md5_hash(self):
+        # md5checksum.md5 files list the buffer file hashes
+        return self.read_option('generate_md5') or super(FilebaseBaseWriter, self)._needs_md5_hash()
+
     def _items_group_files_handler(self):
         return FilebasedGroupingBufferFilesTracker(
                 self.export_formatter,
                 filebase=Filebase(self.read_option('filebase')),
                 start_file_count=self.read_option('start_file_count'),
-                compression_format=self.read_option('compression')
+                compression_format=self.compression_format,
+                max_open_files=self.read_option('max_open_group_files'),
+                compression_options=self.compression_options,
+                hash_algorithm=self.hash_algorithm,
+                hash_part_size=self.hash_part_size,
+                memory_buffer_size=self.memory_buffer_size
         )
 
     def write(self, path, key, file_name=False):
@@ -151,18 +165,27 @@ class FilebaseBaseWriter(BaseWriter):
             file_name = self.filebase.prefix_template + '.' + extension
         return dirname, file_name
 
-    def _write_current_buffer_for_group_key(self, key):
-        write_info = self.write_buffer.pack_buffer(key)
+    @property
+    def last_written_file(self):
+        # set by write(), which may run in several upload threads
+        return getattr(self._thread_state, 'last_written_file', None)
+
+    @last_written_file.setter
+    def last_written_file(self, value):
+        self._thread_state.last_written_file = value
+
+    def _count_written_file(self, filebase_path):
+        with self.metadata_lock:
+            self.get_metadata('files_counter')[filebase_path] += 1
+
+    def _write_packed_buffer(self, write_info, membership):
         file_path = write_info['file_path']
-        self.write(file_path,
-                   self.write_buffer.grouping_info[key]['membership'],
-                   file_name=os.path.basename(file_path))
+        self.write(file_path, membership, file_name=os.path.basename(file_path))
         self.logger.info(
             'Checksum for file {file_path}: {file_hash}'.format(**write_info))
         self.written_files[self.last_written_file] = write_info
 
         self.write_buffer.clean_tmp_files(write_info)
-        self.write_buffer.add_new_buffer_for_group(key)
 
     def finish_writing(self):
         super(FilebaseBaseWriter, self).finish_writing()
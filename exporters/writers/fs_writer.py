@@ -1,3 +1,4 @@
+import errno
 import glob
 import os
 import shutil
@@ -28,7 +29,12 @@ class FSWriter(FilebaseBaseWriter):
         Creates a folders path if it doesn't exist
         """
         if path and not os.path.exists(path):
-            os.makedirs(path)
+            try:
+                os.makedirs(path)
+            except OSError as e:
+                # it may have been created by another upload thread
+                if e.errno != errno.EEXIST:
+                    raise
 
     def get_file_suffix(self, path, prefix):
         """
@@ -47,7 +53,7 @@ class FSWriter(FilebaseBaseWriter):
             'size': buffer_info.get('size'),
             'number_of_records': buffer_info.get('number_of_records')
         }
-        self.get_metadata('files_written').append(file_info)
+        self.append_metadata('files_written', file_info)
 
     def write(self, dump_path, group_key=None, file_name=None):
         if group_key is None:
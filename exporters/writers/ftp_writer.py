@@ -84,7 +84,7 @@ class FTPWriter(FilebaseBaseWriter):
             'filename': destination,
             'size': buffer_info.get('size'),
         }
-        self.get_metadata('files_written').append(file_info)
+        self.append_metadata('files_written', file_info)
 
     @retry_long
     def write(self, dump_path, group_key=None, file_name=None):
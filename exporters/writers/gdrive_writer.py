@@ -28,6 +28,7 @@ class GDriveWriter(FilebaseBaseWriter):
         'credentials': {'type': object},
         'client_secret': {'type': object},
     }
+    needs_md5_hash = True
 
     def __init__(self, *args, **kwargs):
         super(GDriveWriter, self).__init__(*args, **kwargs)
@@ -101,7 +102,7 @@ class GDriveWriter(FilebaseBaseWriter):
             'remote_hash': file['md5Checksum'],
             'title': file['title'],
         }
-        self.get_metadata('files_written').append(key_info)
+        self.append_metadata('files_written', key_info)
 
     def _check_write_consistency(self):
         for file_info in self.get_metadata('files_written'):
@@ -43,6 +43,10 @@ class GStorageWriter(FilebaseBaseWriter):
         }
     }
 
+    needs_md5_hash = True
+    supports_memory_buffers = True
+    parallel_uploads = True
+
     def __init__(self, options, *args, **kwargs):
         from gcloud import storage
         super(GStorageWriter, self).__init__(options, *args, **kwargs)
@@ -76,7 +80,7 @@ class GStorageWriter(FilebaseBaseWriter):
         destination = self._blob_url(self.bucket.name, blob_name)
         self.logger.info('Start uploading {} to {}'.format(dump_path, destination))
 
-        with open(dump_path, 'r') as f:
+        with self.write_buffer.open_buffer_file(dump_path) as f:
             blob = self.bucket.blob(blob_name)
             blob.upload_from_file(f)
 
@@ -107,7 +111,7 @@ class GStorageWriter(FilebaseBaseWriter):
             'remote_hash': blob.md5_hash,
             'title': blob.name,
         }
-        self.get_metadata('files_written').append(key_info)
+        self.append_metadata('files_written', key_info)
 
     def _check_write_consistency(self):
         for file_info in self.get_metadata('files_written'):
@@ -2,6 +2,7 @@ import email
 import os
 import datetime
 import six
+from exporters.compression import get_compression_extension
 from exporters.writers.base_writer import BaseWriter
 from exporters.default_retries import retry_short
 from exporters.utils import str_list
@@ -69,12 +70,13 @@ class MailWriter(BaseWriter):
         return ''
 
     def _get_file_name(self):
-        if self.compression_format != 'none':
+        compression_extension = get_compression_extension(self.compression_format)
+        if compression_extension:
             return '{}{}.{}.{}'.format(
                     self.file_base_name,
                     self.mails_sent,
                     self.export_formatter.file_extension,
-                    self.compression_format
+                    compression_extension
             )
         else:
             return '{}{}.{}'.format(
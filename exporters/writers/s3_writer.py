@@ -78,6 +78,11 @@ class S3Writer(FilebaseBaseWriter):
         'save_metadata': {'type': bool, 'default': True, 'required': False}
     }
 
+    hash_part_size = CHUNK_SIZE
+    needs_md5_hash = True
+    supports_memory_buffers = True
+    parallel_uploads = True
+
     def __init__(self, options, *args, **kwargs):
         import boto
         super(S3Writer, self).__init__(options, *args, **kwargs)
@@ -114,9 +119,7 @@ class S3Writer(FilebaseBaseWriter):
             'size': buffer_info['size'],
             'number_of_records': buffer_info['number_of_records']
         }
-        keys_written = self.get_metadata('keys_written')
-        keys_written.append(key_info)
-        self.set_metadata('keys_written', keys_written)
+        self.append_metadata('keys_written', key_info)
 
     def _get_total_count(self, dump_path):
         return self.write_buffer.get_metadata(dump_path, 'number_of_records') or 0
@@ -143,10 +146,14 @@ class S3Writer(FilebaseBaseWriter):
         from boto.utils import compute_md5
         try:
             key.set_metadata('total', self._get_total_count(dump_path))
+            if not md5:
+                file_hash = self.write_buffer.get_metadata(dump_path, 'file_hash')
+                if file_hash:
+                    md5 = key.get_md5_from_hexdigest(file_hash)
             if md5:
                 key.set_metadata('md5', md5)
             else:
-                with open(dump_path, 'r') as f:
+                with self.write_buffer.open_buffer_file(dump_path) as f:
                     key.set_metadata('md5', compute_md5(f))
         except S3ResponseError:
             self.logger.warning(
@@ -154,7 +161,8 @@ class S3Writer(FilebaseBaseWriter):
                     'so we could not add metadata info')
 
     def _upload_small_file(self, dump_path, key_name):
-        with closing(self.bucket.new_key(key_name)) as key, open(dump_path, 'r') as f:
+        with closing(self.bucket.new_key(key_name)) as key, \
+                self.write_buffer.open_buffer_file(dump_path) as f:
             buffer_info = self.write_buffer.metadata[dump_path]
             md5 = key.get_md5_from_hexdigest(buffer_info['file_hash'])
             if self.save_metadata:
@@ -177,13 +185,17 @@ class S3Writer(FilebaseBaseWriter):
         with closing(self.bucket.get_key(key_name)) as key:
             self._ensure_proper_key_permissions(key)
             if self.save_metadata:
-                md5 = calculate_multipart_etag(dump_path, CHUNK_SIZE)
+                md5 = self.write_buffer.get_metadata(dump_path, 'multipart_etag')
+                if not md5:
+                    md5 = calculate_multipart_etag(dump_path, CHUNK_SIZE)
                 self._save_metadata_for_key(key, dump_path, md5=md5)
 
     def _write_s3_key(self, dump_path, key_name):
         destination = 's3://{}/{}'.format(self.bucket.name, key_name)
         self.logger.info('Start uploading {} to {}'.format(dump_path, destination))
-        if should_use_multipart_upload(dump_path, self.bucket):
+        # files kept in memory are uploaded in a single request
+        if (not self.write_buffer.is_in_memory(dump_path) and
+                should_use_multipart_upload(dump_path, self.bucket)):
             self._upload_large_file(dump_path, key_name)
         else:
             self._upload_small_file(dump_path, key_name)
@@ -197,7 +209,7 @@ class S3Writer(FilebaseBaseWriter):
         key_name = filebase_path + '/' + file_name
         self._write_s3_key(dump_path, key_name)
         self._update_metadata(dump_path, key_name)
-        self.get_metadata('files_counter')[filebase_path] += 1
+        self._count_written_file(filebase_path)
 
     @retry_long
     def _write_s3_pointer(self, save_pointer, filebase):
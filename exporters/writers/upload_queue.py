@@ -0,0 +1,70 @@
+from multiprocessing.pool import ThreadPool
+
+
+class UploadQueue(object):
+    """
+    Runs uploads on a pool of threads, so that the pipeline can keep
+    buffering items while files are uploaded.
+
+    No more than max_bytes_in_flight bytes are queued or being uploaded:
+    submitting a file over the limit waits for the oldest uploads to finish
+    first. A single file is always accepted, whatever its size.
+
+    Uploads are checked in submission order. Errors raised by an upload are
+    raised again by the next submit, check or wait call, and callbacks given
+    to when_done are called in the submitting thread once every upload
+    submitted before them has finished.
+    """
+
+    def __init__(self, threads, max_bytes_in_flight):
+        self.pool = ThreadPool(threads)
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self.bytes_in_flight = 0
+        # (async result, size, callbacks to call when it's done) tuples
+        self.pending = []
+
+    def submit(self, function, size, *args):
+        while self.pending and self.bytes_in_flight + size > self.max_bytes_in_flight:
+            self._wait_oldest()
+        self.check()
+        self.pending.append((self.pool.apply_async(function, args), size, []))
+        self.bytes_in_flight += size
+
+    def when_done(self, callback):
+        """
+        Calls callback once the uploads submitted so far are done, right away
+        if there are none.
+        """
+        if self.pending:
+            self.pending[-1][2].append(callback)
+        else:
+            callback()
+
+    def _wait_oldest(self):
+        result, size, callbacks = self.pending[0]
+        result.get()
+        self.pending.pop(0)
+        self.bytes_in_flight -= size
+        for callback in callbacks:
+            callback()
+
+    def check(self):
+        """
+        Collects the uploads finished so far, in submission order.
+        """
+        while self.pending and self.pending[0][0].ready():
+            self._wait_oldest()
+
+    def wait(self):
+        """
+        Waits for all the submitted uploads to finish.
+        """
+        while self.pending:
+            self._wait_oldest()
+
+    def close(self):
+        """
+        Stops the upload threads, without waiting for pending uploads.
+        """
+        self.pending = []
+        self.pool.terminate()
@@ -23,7 +23,7 @@ setup(
     author_email = 'info@scrapinghub',
     license = 'BSD',
     packages = find_packages(exclude=['tests']),
-    install_requires = ['six', 'retrying', 'requests', 'PyYAML', 'decorator'],
+    install_requires = ['six', 'retrying', 'requests', 'PyYAML', 'decorator', 'scandir'],
     dependency_links = [
         'git@github.com:scrapinghub/collection-scanner.git#egg=collection_scanner',
         'git@github.com:scrapinghub/flatson.git#egg=flatson',
@@ -31,6 +31,8 @@ setup(
     ],
     extras_require = {
         'bz2': ['bz2file'],
+        'zstd': ['zstandard'],
+        'lz4': ['lz4'],
         'sftp': ['pysftp', 'ecdsa', 'paramiko', 'pycrypto' 'wsgiref'],
         's3': ['boto', 'dateparser'],
         'hubstorage': ['hubstorage', 'collection_scanner'],
@@ -46,5 +48,9 @@ setup(
         'mysql': ['mysql-python', 'SQLAlchemy'],
         'azure': ['azure'],
         'xml': ['dicttoxml'],
+        'parquet': ['pyarrow'],
+        'avro': ['fastavro'],
+        'vectorized': ['numpy', 'pandas'],
+        'crc32c': ['crc32c'],
     },
 )
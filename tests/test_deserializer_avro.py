@@ -0,0 +1,37 @@
+import io
+import unittest
+from exporters.deserializers import AvroDeserializer
+from exporters.export_formatter.avro_export_formatter import AvroExportFormatter
+from exporters.iterio import IterIO
+from exporters.records.base_record import BaseRecord
+from .utils import meta
+
+
+def write_avro(items, **options):
+    formatter = AvroExportFormatter({'options': options}, meta())
+    output = io.BytesIO()
+    file_writer = formatter.open_file_writer(output.write)
+    file_writer.write_batch(items)
+    file_writer.close()
+    output.seek(0)
+    return output
+
+
+class AvroDeserializerTest(unittest.TestCase):
+    def setUp(self):
+        self.items = [
+            BaseRecord({'id': i, 'name': u'name{}'.format(i), 'tags': [u'a', u'b']})
+            for i in range(200)
+        ]
+
+    def test_deserializer(self):
+        # small blocks, so that the file is decoded block by block
+        stream = IterIO(write_avro(self.items, sync_interval=100), chunk_size=64)
+        items = list(AvroDeserializer({}, None).deserialize(stream))
+        self.assertEqual(self.items, items)
+
+    def test_deserializer_with_projection(self):
+        deserializer = AvroDeserializer({}, None)
+        deserializer.set_projection(['id', 'missing'])
+        items = list(deserializer.deserialize(IterIO(write_avro(self.items))))
+        self.assertEqual([{'id': i} for i in range(200)], items)
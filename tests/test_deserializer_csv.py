@@ -20,3 +20,16 @@ class DecompressorsTest(unittest.TestCase):
             {'bar': 'xdxd', 'baz': 'xdxd', 'id': '3'}
         ]
         assert items == expected_items
+
+    def test_deserializer_with_projection(self):
+        deserializer = CSVDeserializer({}, None)
+        deserializer.set_projection(['id', 'baz', 'missing'])
+        with open('tests/data/dummy_data.csv', 'rb') as f:
+            items = list(deserializer.deserialize(IterIO(f)))
+
+        expected_items = [
+            {'baz': 'world', 'id': '1'},
+            {'baz': 'bar', 'id': '2'},
+            {'baz': 'xdxd', 'id': '3'}
+        ]
+        assert items == expected_items
@@ -1,3 +1,5 @@
+import gzip
+import json
 import os
 import pickle
 import shutil
@@ -543,6 +545,88 @@ class BaseExportManagerTest(unittest.TestCase):
             last_read = [args[0]['last_read'] for name, args, kwargs in m.mock_calls]
             self.assertEqual(last_read, [2, 5, 8, 11, 14, 16])
 
+    def test_persisted_positions_with_upload_threads(self):
+        options = {
+            'reader': {
+                'name': 'exporters.readers.random_reader.RandomReader',
+                'options': {
+                    'number_of_items': 17,
+                    'batch_size': 3
+                }
+            },
+            'writer': {
+                'name': 'exporters.writers.fs_writer.FSWriter',
+                'options': {
+                    'filebase': os.path.join(self.tmp_dir, 'output_'),
+                    'items_per_buffer_write': 3,
+                    'upload_threads': 2,
+                }
+            },
+            'persistence': {
+                'name': 'tests.utils.NullPersistence',
+            }
+        }
+        self.exporter = exporter = BaseExporter(options)
+        with mock.patch.object(exporter.persistence, 'commit_position') as m, \
+                mock.patch.object(exporter.filter_before, 'get_last_position',
+                                  side_effect=range(100)), \
+                mock.patch.object(exporter.filter_before, 'position_committed') as committed:
+            exporter.export()
+            positions = [args[0] for name, args, kwargs in m.mock_calls]
+            self.assertEqual([2, 5, 8, 11, 14, 16],
+                             [position['last_read'] for position in positions])
+            self.assertEqual([3, 6, 9, 12, 15, 17],
+                             [position['writer_metadata']['items_count']
+                              for position in positions])
+            # filters are told the positions they gave are committed
+            self.assertEqual(range(6), [args[0] for name, args, kwargs in committed.mock_calls])
+
+    def _projection_config(self, tmp_dir, **exporter_options):
+        return {
+            'reader': {
+                'name': 'exporters.readers.fs_reader.FSReader',
+                'options': {'input': 'tests/data/dummy_data.jl.gz'}
+            },
+            'writer': {
+                'name': 'exporters.writers.fs_writer.FSWriter',
+                'options': {'filebase': os.path.join(tmp_dir, 'output_')}
+            },
+            'persistence': {
+                'name': 'tests.utils.NullPersistence',
+            },
+            'exporter_options': exporter_options,
+        }
+
+    def test_projection_is_computed_from_modules(self):
+        with TemporaryDirectory() as tmp_dir:
+            config = self._projection_config(tmp_dir, projection=True, formatter={
+                'name': 'exporters.export_formatter.csv_export_formatter.CSVExportFormatter',
+                'options': {'fields': ['name']}
+            })
+            config['filter'] = {
+                'name': 'exporters.filters.key_value_filter.KeyValueFilter',
+                'options': {'keys': [{'name': 'age.value', 'value': 42}]}
+            }
+            exporter = BaseExporter(config)
+            self.assertEqual({'age', 'name'}, exporter.reader.deserializer.projection)
+
+            config['transform'] = {
+                'name': 'exporters.transform.pythonexp_transform.PythonexpTransform',
+                'options': {'python_expressions': ['item']}
+            }
+            exporter = BaseExporter(config)
+            self.assertIsNone(exporter.reader.deserializer.projection)
+
+    def test_export_with_explicit_projection(self):
+        with TemporaryDirectory() as tmp_dir:
+            exporter = BaseExporter(self._projection_config(tmp_dir, projection=['name']))
+            exporter.export()
+            [output] = os.listdir(tmp_dir)
+            with gzip.open(os.path.join(tmp_dir, output)) as f:
+                items = [json.loads(line) for line in f]
+            self.assertEqual([{'name': 'bob'}, {'name': 'foo'}, {'name': 'guybrush'}], items[:3])
+            self.assertEqual({'name'}, set(key for item in items for key in item))
+
     def test_disabling_retries(self):
         count_holder = [0]
         options = {
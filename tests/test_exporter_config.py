@@ -289,3 +289,38 @@ class ConfigValidationTest(unittest.TestCase):
             },
         })
         check_for_errors(config)  # should not raise
+
+    def test_projection_must_be_a_list_of_fields(self):
+        for projection in ['id', False, 0, {'id': 1}]:
+            config = valid_config_with_updates({'exporter_options': {'projection': projection}})
+            with self.assertRaises(ConfigurationError) as cm:
+                check_for_errors(config)
+            self.assertEqual(['projection'], list(cm.exception.errors), projection)
+
+        for projection in [None, True, [], ['id', u'name']]:
+            config = valid_config_with_updates({'exporter_options': {'projection': projection}})
+            check_for_errors(config)  # should not raise
+
+    def test_formatters_writing_files_need_file_writers(self):
+        for formatter_name in [
+                'exporters.export_formatter.parquet_export_formatter.ParquetExportFormatter',
+                'exporters.export_formatter.avro_export_formatter.AvroExportFormatter']:
+            formatter = {'name': formatter_name}
+            config = valid_config_with_updates({
+                'exporter_options': {'formatter': formatter},
+                'writer': {'name': 'exporters.writers.console_writer.ConsoleWriter'},
+            })
+            with self.assertRaises(ConfigurationError) as cm:
+                check_for_errors(config)
+            self.assertEqual({'formatter': 'The formatter writes whole files, it can only be '
+                                           'used with file based writers.'},
+                             cm.exception.errors)
+
+            config = valid_config_with_updates({
+                'exporter_options': {'formatter': formatter},
+                'writer': {
+                    'name': 'exporters.writers.fs_writer.FSWriter',
+                    'options': {'filebase': '/tmp/output_'},
+                },
+            })
+            check_for_errors(config)  # should not raise
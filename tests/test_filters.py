@@ -1,8 +1,14 @@
 # -*- coding: utf-8 -*-
+import copy
+import os
 import random
+import shutil
+import tempfile
 import unittest
+from exporters.exceptions import ConfigurationError
 from exporters.filters.base_filter import BaseFilter
 from exporters.filters.dupe_filter import DupeFilter
+from exporters.filters.dupe_key_stores import BloomKeyStore
 from exporters.filters.key_value_filter import KeyValueFilter
 from exporters.filters.key_value_filters import InvalidOperator
 from exporters.filters.key_value_regex_filter import KeyValueRegexFilter
@@ -36,6 +42,20 @@ class BaseFilterTest(unittest.TestCase):
         output = list(myfilter.filter_batch([{'key': 1}, {'key': 2}]))
         self.assertEqual([{'key': 1}], output)
 
+    def test_filtered_out_metadata_is_flushed_when_batch_is_not_consumed(self):
+        class CustomFilter(BaseFilter):
+            def filter(self, item):
+                return item.get('key') == 1
+
+        myfilter = CustomFilter(self.options, meta())
+        batch = myfilter.filter_batch([{'key': 2}, {'key': 1}, {'key': 2}, {'key': 1}])
+        self.assertEqual({'key': 1}, next(batch))
+        batch.close()
+        self.assertEqual(1, myfilter.get_metadata('filtered_out'))
+        self.assertEqual(2, myfilter.total)
+        self.assertEqual([], list(myfilter.filter_batch([{'key': 2}, {'key': 2}])))
+        self.assertEqual(3, myfilter.get_metadata('filtered_out'))
+
 
 class NoFilterTest(unittest.TestCase):
 
@@ -303,6 +323,44 @@ class KeyValueFiltersTest(unittest.TestCase):
         batch = list(batch)
         self.assertEqual(2, len(batch))
 
+    def test_filter_with_in_key_value_and_unhashable_values(self):
+        keys = [
+            {'name': 'tags', 'value': [['a', 'b'], 'c'], 'operator': 'in'}
+        ]
+        batch = [
+            {'name': 'item1', 'tags': ['a', 'b']},
+            {'name': 'item2', 'tags': 'c'},
+            {'name': 'item3', 'tags': ['c']},
+        ]
+        filter = KeyValueFilter({'options': {'keys': keys}}, meta())
+        result = list(filter.filter_batch(batch))
+        self.assertEqual(['item1', 'item2'], [item['name'] for item in result])
+
+    def test_filter_with_re_match_operator_and_several_keys(self):
+        keys = [
+            {'name': 'address.country', 'value': 'e[sg]', 'operator': 're_match'},
+            {'name': 'address.zip', 'value': [1, 2], 'operator': 'in'},
+        ]
+        batch = [
+            {'name': 'item1', 'address': {'country': u'españa', 'zip': 1}},
+            {'name': 'item2', 'address': {'country': u'egypt', 'zip': 3}},
+            {'name': 'item3', 'address': {'country': u'uk', 'zip': 2}},
+            {'name': 'item4', 'address': {'country': u'es'}},
+        ]
+        filter = KeyValueFilter({'options': {'keys': keys}}, meta())
+        result = list(filter.filter_batch(batch))
+        self.assertEqual(['item1'], [item['name'] for item in result])
+        self.assertEqual(3, filter.get_metadata('filtered_out'))
+
+    def test_filter_without_nested_field_separator_requires_key(self):
+        keys = [{'name': 'country.code', 'value': 'es'}]
+        filter = KeyValueFilter(
+            {'options': {'keys': keys, 'nested_field_separator': ''}}, meta())
+        batch = [{'country.code': 'es'}, {'country.code': 'uk'}]
+        self.assertEqual([{'country.code': 'es'}], list(filter.filter_batch(batch)))
+        with self.assertRaises(KeyError):
+            list(filter.filter_batch([{'country': {'code': 'es'}}]))
+
     def test_filter_with_non_existing_op(self):
 
         keys = [
@@ -322,8 +380,22 @@ class KeyValueFiltersTest(unittest.TestCase):
             KeyValueFilter({'options': {'keys': keys}}, meta())
 
 
+def path_for_generation(store, generation):
+    return '{}.{}'.format(store.path, generation)
+
+
 class DupeFilterTest(unittest.TestCase):
 
+    def setUp(self):
+        self.store_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.store_path)
+
+    def _filter(self, backend, **options):
+        options.update(backend=backend, store_path=self.store_path)
+        return DupeFilter({'options': options}, meta())
+
     def test_filter_duplicates_with_default_key(self):
         keys = ['8062219f00c79c88', '1859834d918981df', 'e2abb7b480edf910']
         items = [
@@ -403,3 +475,136 @@ class DupeFilterTest(unittest.TestCase):
         batch = filter.filter_batch(batch)
         batch = list(batch)
         self.assertEqual(3, len(batch))
+
+    def _dupe_batch(self):
+        return [{'_key': str(i % 50), 'name': 'item%d' % i} for i in range(200)]
+
+    def test_filter_duplicates_with_disk_backend(self):
+        filter = self._filter('disk', cache_size=10)
+        try:
+            batch = list(filter.filter_batch(self._dupe_batch()))
+            self.assertEqual(['item%d' % i for i in range(50)], [i['name'] for i in batch])
+        finally:
+            filter.finish_filtering()
+
+    def test_filter_duplicates_with_bloom_backend(self):
+        filter = self._filter('bloom', error_rate=0.0001)
+        try:
+            batch = list(filter.filter_batch(self._dupe_batch()))
+            self.assertEqual(['item%d' % i for i in range(50)], [i['name'] for i in batch])
+        finally:
+            filter.finish_filtering()
+
+    def test_filter_keys_of_different_types(self):
+        for backend in ['memory', 'disk', 'bloom']:
+            filter = self._filter(backend)
+            try:
+                batch = [{'_key': 1}, {'_key': '1'}, {'_key': u'1'}]
+                self.assertEqual([{'_key': 1}, {'_key': '1'}],
+                                 list(filter.filter_batch(batch)), backend)
+            finally:
+                filter.finish_filtering()
+
+    def test_bloom_checkpoint_logs_new_keys(self):
+        filter = self._filter('bloom')
+        try:
+            path = filter.key_set.path
+            snapshot_path = path + '.0'
+            os.utime(snapshot_path, (0, 0))
+            list(filter.filter_batch([{'_key': 'a'}, {'_key': 'b'}]))
+            self.assertEqual({'path': path, 'generation': 0, 'logged': 2},
+                             filter.get_last_position())
+            list(filter.filter_batch([{'_key': 'a'}, {'_key': 'c'}]))
+            self.assertEqual({'path': path, 'generation': 0, 'logged': 3},
+                             filter.get_last_position())
+            # only the new hashes were written
+            self.assertEqual(0, os.path.getmtime(snapshot_path))
+            self.assertEqual(3 * 16, os.path.getsize(filter.key_set.log_path))
+        finally:
+            filter.finish_filtering()
+
+    def test_bloom_snapshot_when_log_is_bigger_than_filters(self):
+        store = BloomKeyStore(self.store_path, initial_capacity=10)
+        try:
+            store.add('old')
+            old_state = store.checkpoint()
+            for key in range(30):
+                store.add(key)
+            state = store.checkpoint()
+            self.assertEqual({'generation': 1, 'logged': 0},
+                             {key: state[key] for key in ['generation', 'logged']})
+            self.assertEqual(0, os.path.getsize(store.log_path))
+            store.add('new')
+            state = store.checkpoint()
+            self.assertEqual(1, state['logged'])
+
+            resumed = BloomKeyStore(self.store_path, state=state)
+            self.assertEqual([False] * 32,
+                             [resumed.add(key) for key in range(30) + ['old', 'new']])
+
+            # older states can be resumed until a newer one is released
+            resumed = BloomKeyStore(self.store_path, state=old_state)
+            self.assertEqual([False, True], [resumed.add('old'), resumed.add(1)])
+            self.assertFalse(os.path.exists(store.log_path))
+            resumed.release(old_state)
+            self.assertTrue(os.path.exists(resumed.log_path))
+
+            store = BloomKeyStore(self.store_path, state=old_state)
+            for key in range(30):
+                store.add(key)
+            state = store.checkpoint()
+            store.release(state)
+            self.assertFalse(os.path.exists(path_for_generation(store, 0)))
+            self.assertTrue(os.path.exists(path_for_generation(store, 1)))
+        finally:
+            store.delete()
+        self.assertFalse(os.path.exists(path_for_generation(store, 1)))
+
+    def test_resume_older_positions(self):
+        for backend in ['disk', 'bloom']:
+            filter = self._filter(backend)
+            list(filter.filter_batch([{'_key': 'a'}]))
+            position = copy.deepcopy(filter.get_last_position())
+            # checkpointed, but their position is not commited
+            for key in range(3):
+                list(filter.filter_batch([{'_key': key}]))
+                filter.get_last_position()
+            filter.close()
+
+            for _ in range(2):
+                resumed = self._filter(backend)
+                resumed.set_last_position(position)
+                try:
+                    batch = [{'_key': 'a'}, {'_key': 1}, {'_key': 2}]
+                    self.assertEqual([{'_key': 1}, {'_key': 2}],
+                                     list(resumed.filter_batch(batch)), backend)
+                finally:
+                    resumed.close()
+            resumed.finish_filtering()
+
+    def test_filter_duplicates_with_wrong_backend(self):
+        with self.assertRaises(ConfigurationError):
+            DupeFilter({'options': {'backend': 'redis'}}, meta())
+
+    def test_disk_backends_need_store_path(self):
+        for backend in ['disk', 'bloom']:
+            with self.assertRaisesRegexp(ConfigurationError, 'store_path'):
+                DupeFilter({'options': {'backend': backend}}, meta())
+
+    def test_resume_keeps_keys_until_last_position(self):
+        for backend in ['disk', 'bloom']:
+            filter = self._filter(backend)
+            list(filter.filter_batch([{'_key': 'a'}, {'_key': 'b'}]))
+            position = filter.get_last_position()
+            # seen after the last commited position, so must be read again on resume
+            list(filter.filter_batch([{'_key': 'c'}]))
+            filter.close()
+
+            resumed = self._filter(backend)
+            resumed.set_last_position(position)
+            try:
+                batch = [{'_key': 'a'}, {'_key': 'c'}, {'_key': 'd'}]
+                self.assertEqual([{'_key': 'c'}, {'_key': 'd'}],
+                                 list(resumed.filter_batch(batch)), backend)
+            finally:
+                resumed.finish_filtering()
@@ -0,0 +1,84 @@
+import unittest
+from exporters.exceptions import InvalidExpression
+from exporters.filters.vectorized_filter import VectorizedFilter
+from exporters.records.base_record import BaseRecord
+
+from .utils import meta
+
+
+def get_batch():
+    return [
+        BaseRecord({'name': 'item%d' % i, 'price': i * 10,
+                    'address': {'country': ['es', 'uk', 'us'][i % 3]}})
+        for i in range(10)
+    ]
+
+
+class VectorizedFilterTest(unittest.TestCase):
+
+    def _filter(self, expression, **options):
+        options['expression'] = expression
+        return VectorizedFilter({'options': options}, meta())
+
+    def _names(self, expression, batch=None, **options):
+        vectorized_filter = self._filter(expression, **options)
+        result = vectorized_filter.filter_batch(batch or get_batch())
+        return [item['name'] for item in result]
+
+    def test_numeric_comparisons(self):
+        self.assertEqual(['item7', 'item8', 'item9'], self._names('price > 60'))
+        self.assertEqual(['item2', 'item3'], self._names('20 <= price < 40'))
+        self.assertEqual(['item1'], self._names('price == 10'))
+
+    def test_nested_fields_and_membership(self):
+        self.assertEqual(['item1', 'item4', 'item7'],
+                         self._names("address.country == 'uk'"))
+        self.assertEqual(['item0', 'item1', 'item3', 'item4'],
+                         self._names("address.country.isin(['es', 'uk']) and price < 50"))
+        self.assertEqual(['item2', 'item5', 'item8'],
+                         self._names("address.country not in ['es', 'uk']"))
+
+    def test_nested_field_separator(self):
+        self.assertEqual(['item1', 'item4', 'item7'],
+                         self._names("field('address,country') == 'uk'",
+                                     nested_field_separator=','))
+
+    def test_string_methods_and_boolean_operators(self):
+        self.assertEqual(['item1', 'item2'],
+                         self._names("name.match('item[12]$') or not price > 10"
+                                     " and name.startswith('item2')"))
+        self.assertEqual(['item9'], self._names("name.endswith('9')"))
+
+    def test_missing_and_non_numeric_values(self):
+        batch = [
+            BaseRecord({'name': 'a', 'price': '12'}),
+            BaseRecord({'name': 'b', 'price': 'unknown'}),
+            BaseRecord({'name': 'c'}),
+            BaseRecord({'name': 'd', 'price': 5}),
+        ]
+        self.assertEqual(['a'], self._names('price > 10', batch))
+        self.assertEqual(['c'], self._names('price is None', batch))
+
+    def test_string_methods_on_mixed_values(self):
+        batch = [
+            BaseRecord({'name': 'a', 'sku': 'X1', 'address': {'country': 'es'}}),
+            BaseRecord({'name': 'b', 'sku': 12, 'address': 'es'}),
+            BaseRecord({'name': 'c', 'sku': ['X1'], 'address': None}),
+            BaseRecord({'name': 'd', 'sku': u'X2', 'address': {'city': 'x'}}),
+        ]
+        self.assertEqual(['a', 'd'], self._names("sku.match('X')", batch))
+        self.assertEqual(['a'], self._names("sku.contains('1')", batch))
+        self.assertEqual(['a'], self._names("address.country.startswith('e')", batch))
+        self.assertEqual(['b', 'c', 'd'], self._names("address.country is None", batch))
+
+    def test_filtered_out_metadata_with_several_chunks(self):
+        vectorized_filter = self._filter("address.country == 'es'", batch_size=4)
+        result = list(vectorized_filter.filter_batch(iter(get_batch())))
+        self.assertEqual(['item0', 'item3', 'item6', 'item9'], [i['name'] for i in result])
+        self.assertEqual(6, vectorized_filter.get_metadata('filtered_out'))
+
+    def test_invalid_expressions(self):
+        for expression in ['', 'price', 'price + 1 > 2', '__import__("os")',
+                           "name.lower() == 'a'", 'price is 1', '1 < 2']:
+            with self.assertRaises(InvalidExpression):
+                self._filter(expression)
@@ -1,12 +1,16 @@
+import datetime
 import json
 import io
 import csv
 import random
 import unittest
 from exporters.exceptions import ConfigurationError
+from exporters.export_formatter.avro_export_formatter import AvroExportFormatter, infer_schema
 from exporters.export_formatter.base_export_formatter import BaseExportFormatter
 from exporters.export_formatter.csv_export_formatter import CSVExportFormatter
 from exporters.export_formatter.json_export_formatter import JsonExportFormatter
+from exporters.export_formatter.parquet_export_formatter import ParquetExportFormatter
+from exporters.export_formatter.xml_export_formatter import XMLExportFormatter
 from exporters.records.base_record import BaseRecord
 from tests.utils import meta
 
@@ -39,6 +43,202 @@ class JsonFormatterTest(unittest.TestCase):
         item = self.export_formatter.format(item)
         self.assertIsInstance(json.loads(item), dict)
 
+    def test_format_batch(self):
+        items = [BaseRecord({'key': i, 'date': datetime.datetime(2016, 1, i + 1)})
+                 for i in range(3)]
+        for options in [{}, {'pretty_print': True}, {'jsonlines': False}]:
+            formatter = JsonExportFormatter({'options': options}, meta())
+            content = formatter.format_batch(items)
+            self.assertEqual(formatter.item_separator.join(
+                formatter.format(item) for item in items), content)
+            self.assertEqual(
+                [{'key': i, 'date': '2016-01-0{}T00:00:00'.format(i + 1)} for i in range(3)],
+                json.loads('[' + content.replace('}\n{', '},{') + ']'))
+
+    def test_format_unserializable_value(self):
+        with self.assertRaisesRegexp(TypeError, 'is not JSON serializable'):
+            self.export_formatter.format(BaseRecord({'key': object()}))
+
+
+class XMLFormatterTest(unittest.TestCase):
+
+    def test_format_batch(self):
+        options = {'options': {'fields_order': ['key', 'value']}}
+        formatter = XMLExportFormatter(options, meta())
+        items = [
+            BaseRecord([('value', u'<v\xe1lue & "more">'), ('key', 1)]),
+            BaseRecord([('nested', {'list': [1.5, None, {'a': True}, ['b'],
+                                             datetime.datetime(2016, 1, 1)]}),
+                        ('key', 2)]),
+        ]
+        self.assertEqual(
+            '<item><key type="int">1</key>'
+            '<value type="str">&lt;v\xc3\xa1lue &amp; &quot;more&quot;&gt;</value></item>\n'
+            '<item><key type="int">2</key><nested type="dict"><list type="list">'
+            '<item type="float">1.5</item><item type="null"></item>'
+            '<item type="dict"><a type="bool">True</a></item>'
+            '<item type="list"><item type="str">b</item></item>'
+            '<item type="str">2016-01-01T00:00:00</item></list></nested></item>',
+            formatter.format_batch(items))
+
+    def test_format_without_attr_type(self):
+        formatter = XMLExportFormatter({'options': {'attr_type': False}}, meta())
+        self.assertEqual(
+            '<item><list><item ><item>a</item></item></list></item>',
+            formatter.format(BaseRecord({'list': [['a']]})))
+
+    def test_format_invalid_names(self):
+        formatter = XMLExportFormatter({}, meta())
+        self.assertEqual(
+            '<item><key_name type="int">1</key_name><n2 type="int">2</n2></item>',
+            formatter.format(BaseRecord([('key name', 1), ('2', 2)])))
+
+
+class ParquetFormatterTest(unittest.TestCase):
+
+    def write_file(self, formatter, items):
+        output = io.BytesIO()
+        file_writer = formatter.open_file_writer(output.write)
+        file_writer.write_batch(items)
+        file_writer.close()
+        output.seek(0)
+        return output
+
+    def test_write_row_groups(self):
+        import pyarrow.parquet as pq
+        formatter = ParquetExportFormatter({'options': {'row_group_size': 10}}, meta())
+        items = [BaseRecord({'key': i, 'value': u'value{}'.format(i % 3)}) for i in range(25)]
+        parquet_file = pq.ParquetFile(self.write_file(formatter, items))
+        self.assertEqual(3, parquet_file.metadata.num_row_groups)
+        self.assertEqual(items, parquet_file.read().to_pandas().to_dict('records'))
+
+    def test_write_with_schema(self):
+        import pyarrow.parquet as pq
+        options = {
+            'options': {
+                'compression': 'zstd',
+                'schema': {
+                    'properties': {
+                        'key': {'type': 'integer'},
+                        'price': {'type': ['number', 'null']},
+                        'name': {'type': 'string'},
+                    }
+                }
+            }
+        }
+        formatter = ParquetExportFormatter(options, meta())
+        self.assertEqual({'key', 'price', 'name'}, formatter.get_required_fields())
+        items = [BaseRecord({'key': 1, 'name': u'a', 'price': 1}),
+                 BaseRecord({'key': 2, 'name': u'b', 'extra': 'dropped'})]
+        table = pq.read_table(self.write_file(formatter, items))
+        self.assertEqual(['key', 'name', 'price'], table.schema.names)
+        self.assertEqual('double', str(table.schema.field('price').type))
+        self.assertEqual({'key': [1, 2], 'name': [u'a', u'b'], 'price': [1.0, None]},
+                         dict(table.to_pydict()))
+
+    def test_later_row_groups_keep_the_column_types(self):
+        import pyarrow.parquet as pq
+        formatter = ParquetExportFormatter({'options': {'row_group_size': 1}}, meta())
+        # ints and nulls are converted to the column type
+        items = [BaseRecord({'a': 1.5, 'b': None}), BaseRecord({'a': 2, 'b': u'b'})]
+        table = pq.read_table(self.write_file(formatter, items))
+        self.assertEqual({'a': [1.5, 2.0], 'b': [None, u'b']}, dict(table.to_pydict()))
+        # but values are never truncated or converted to text
+        for items in [[BaseRecord({'a': 1}), BaseRecord({'a': 1.5})],
+                      [BaseRecord({'a': None}), BaseRecord({'a': 1})]]:
+            with self.assertRaisesRegexp(ValueError, 'Values of field "a" of type'):
+                self.write_file(formatter, items)
+
+    def test_fields_missing_in_first_row_group(self):
+        formatter = ParquetExportFormatter({'options': {'row_group_size': 1}}, meta())
+        items = [BaseRecord({'a': 1}), BaseRecord({'a': 2, 'b': 2})]
+        with self.assertRaisesRegexp(ValueError, r"Fields \['b'\] are not in the parquet"):
+            self.write_file(formatter, items)
+
+        import pyarrow.parquet as pq
+        options = {'options': {'row_group_size': 1, 'fields': ['a']}}
+        formatter = ParquetExportFormatter(options, meta())
+        table = pq.read_table(self.write_file(formatter, items))
+        self.assertEqual({'a': [1, 2]}, dict(table.to_pydict()))
+
+    def test_invalid_options(self):
+        with self.assertRaisesRegexp(ConfigurationError, 'parquet compression'):
+            ParquetExportFormatter({'options': {'compression': 'bz2'}}, meta())
+        with self.assertRaisesRegexp(ConfigurationError, 'Unsupported type'):
+            ParquetExportFormatter(
+                {'options': {'schema': {'properties': {'key': {'type': 'object'}}}}}, meta())
+
+
+class AvroFormatterTest(unittest.TestCase):
+
+    def write_file(self, formatter, batches):
+        output = io.BytesIO()
+        file_writer = formatter.open_file_writer(output.write)
+        for batch in batches:
+            file_writer.write_batch(batch)
+        file_writer.close()
+        output.seek(0)
+        return output
+
+    def test_infer_schema(self):
+        items = [{'key': 1, 'value': 1.5, 'tags': [u'a']},
+                 {'key': 2, 'value': None, 'attrs': {'a': 1, 'b': u'b'}, 'flag': True}]
+        self.assertEqual({
+            'type': 'record',
+            'name': 'Item',
+            'fields': [
+                {'name': 'attrs', 'default': None,
+                 'type': ['null', {'type': 'map', 'values': ['long', 'string', 'double']}]},
+                {'name': 'flag', 'default': None, 'type': ['null', 'boolean']},
+                {'name': 'key', 'default': None, 'type': ['null', 'long', 'double']},
+                {'name': 'tags', 'default': None,
+                 'type': ['null', {'type': 'array', 'items': 'string'}]},
+                {'name': 'value', 'default': None, 'type': ['null', 'double']},
+            ]
+        }, infer_schema(items, 'Item'))
+
+    def test_write_with_schema(self):
+        import fastavro
+        schema = {
+            'type': 'record',
+            'name': 'Product',
+            'fields': [
+                {'name': 'key', 'type': 'long'},
+                {'name': 'name', 'type': ['null', 'string'], 'default': None},
+            ]
+        }
+        options = {'options': {'schema': schema, 'codec': 'zstandard'}}
+        formatter = AvroExportFormatter(options, meta())
+        self.assertEqual({'key', 'name'}, formatter.get_required_fields())
+        batches = [[BaseRecord({'key': 1, 'name': u'a', 'extra': 'dropped'})],
+                   [BaseRecord({'key': 2})]]
+        reader = fastavro.reader(self.write_file(formatter, batches))
+        self.assertEqual('zstandard', reader.metadata['avro.codec'])
+        self.assertEqual('Product', reader.writer_schema['name'])
+        self.assertEqual([{'key': 1, 'name': u'a'}, {'key': 2, 'name': None}], list(reader))
+
+    def test_inferred_schema_allows_wider_types(self):
+        import fastavro
+        formatter = AvroExportFormatter({}, meta())
+        batches = [[BaseRecord({'key': 1, 'value': None})],
+                   [BaseRecord({'key': 1.5, 'value': u'a'})]]
+        reader = fastavro.reader(self.write_file(formatter, batches))
+        self.assertEqual([{'key': 1, 'value': None}, {'key': 1.5, 'value': u'a'}],
+                         list(reader))
+        batches = [[BaseRecord({'key': 1})], [BaseRecord({'key': u'a'})]]
+        with self.assertRaises(ValueError):
+            self.write_file(formatter, batches)
+
+    def test_fields_missing_in_first_batch(self):
+        formatter = AvroExportFormatter({}, meta())
+        batches = [[BaseRecord({'a': 1})], [BaseRecord({'a': 2, 'b': u'new field'})]]
+        with self.assertRaisesRegexp(ValueError, r"\['b'\]"):
+            self.write_file(formatter, batches)
+
+    def test_invalid_codec(self):
+        with self.assertRaisesRegexp(ConfigurationError, 'avro codec'):
+            AvroExportFormatter({'options': {'codec': 'gzip'}}, meta())
+
 
 class CSVFormatterTest(unittest.TestCase):
 
@@ -133,6 +333,29 @@ class CSVFormatterTest(unittest.TestCase):
         memfile = self._create_memfile((it for it in formatted_batch), header=['"key1","key2"'])
         self.assertEqual(self.batch, list(csv.DictReader(memfile)))
 
+    def test_format_batch_in_a_single_chunk(self):
+        # given:
+        options = {
+            'options': {
+                'fields': ['key1', 'key2', 'key3', 'key4']
+            }
+        }
+        formatter = CSVExportFormatter(options)
+        batch = self.batch + [
+            BaseRecord({'key1': u'v\xe1lue', 'key3': 1.5, 'key4': None}),
+            BaseRecord({'key1': 'multi\nline', 'key2': {'nested': [u'v\xe1lue']}}),
+        ]
+
+        # when:
+        content = formatter.format_batch(batch)
+
+        # then:
+        self.assertEqual('\n'.join(formatter.format(item) for item in batch), content)
+        rows = list(csv.reader(io.BytesIO(content)))
+        self.assertEqual(len(batch), len(rows))
+        self.assertEqual(['v\xc3\xa1lue', '', '1.5', ''], rows[5])
+        self.assertEqual(['multi\nline', "{'nested': ['v\\xc3\\xa1lue']}", '', ''], rows[6])
+
     def _create_memfile(self, lines, header=None):
         if not header:
             header = []
@@ -0,0 +1,123 @@
+import unittest
+
+from exporters.filters.base_filter import BaseFilter
+from exporters.filters.key_value_filters import KeyValueFilter
+from exporters.filters.no_filter import NoFilter
+from exporters.groupers.file_key_grouper import FileKeyGrouper
+from exporters.groupers.no_grouper import NoGrouper
+from exporters.pipeline.fused_pipeline import FusedPipeline
+from exporters.records.base_record import BaseRecord
+from exporters.transform.base_transform import BaseTransform
+from exporters.transform.no_transform import NoTransform
+from exporters.transform.pythonexp_transform import PythonexpTransform
+from exporters.transform.pythonmap import PythonMapTransform
+
+from .utils import meta
+
+
+class BatchOnlyFilter(BaseFilter):
+    def filter_batch(self, batch):
+        for item in batch:
+            if item['value'] % 3:
+                yield item
+
+
+class OddFilter(NoFilter):
+    def filter_batch(self, batch):
+        return (item for item in batch if item['value'] % 2)
+
+
+class TenTimesTransform(PythonexpTransform):
+    def transform_batch(self, batch):
+        for item in batch:
+            item['value'] *= 10
+            yield item
+
+
+def get_batch(size=10):
+    return [BaseRecord({'key': i, 'value': i, 'country': 'es' if i % 2 else 'uk'})
+            for i in range(size)]
+
+
+def as_stages(*stages):
+    result = []
+    for stage in stages:
+        if isinstance(stage, BaseFilter):
+            result.append((stage, stage.filter_batch))
+        elif isinstance(stage, BaseTransform):
+            result.append((stage, stage.transform_batch))
+        else:
+            result.append((stage, stage.group_batch))
+    return result
+
+
+class FusedPipelineTest(unittest.TestCase):
+
+    def test_noop_stages_are_left_out(self):
+        pipeline = FusedPipeline(as_stages(
+            NoFilter({}, meta()), NoTransform({}, meta()), NoGrouper({}, meta())))
+        self.assertEqual([], pipeline.segments)
+        batch = get_batch()
+        self.assertIs(batch, pipeline.process_batch(batch))
+
+    def test_noop_subclasses_are_kept(self):
+        pipeline = FusedPipeline(as_stages(OddFilter({}, meta()), NoTransform({}, meta())))
+        self.assertEqual(1, len(pipeline.segments))
+        items = list(pipeline.process_batch(get_batch()))
+        self.assertEqual([1, 3, 5, 7, 9], [item['value'] for item in items])
+
+    def test_overridden_batch_methods_are_not_fused(self):
+        transform = TenTimesTransform(
+            {'options': {'python_expressions': ['item.update(value=0)']}}, meta())
+        self.assertFalse(transform.supports_apply())
+        pipeline = FusedPipeline(as_stages(transform))
+        items = list(pipeline.process_batch(get_batch(3)))
+        self.assertEqual([0, 10, 20], [item['value'] for item in items])
+
+    def test_stages_are_fused_in_a_single_loop(self):
+        key_value_filter = KeyValueFilter(
+            {'options': {'keys': [{'name': 'country', 'value': 'es'}]}}, meta())
+        transform = PythonexpTransform(
+            {'options': {'python_expressions': ['item.update(value=item["value"] * 10)']}},
+            meta())
+        after_filter = KeyValueFilter(
+            {'options': {'keys': [{'name': 'value', 'value': [10, 30, 70], 'operator': 'in'}]}},
+            meta())
+        grouper = FileKeyGrouper({'options': {'keys': ['country']}}, meta())
+        pipeline = FusedPipeline(as_stages(key_value_filter, transform, after_filter, grouper))
+        self.assertEqual(1, len(pipeline.segments))
+
+        items = list(pipeline.process_batch(get_batch()))
+        self.assertEqual([10, 30, 70], [item['value'] for item in items])
+        self.assertEqual([('es',)] * 3, [item.group_membership for item in items])
+        self.assertEqual(5, key_value_filter.get_metadata('filtered_out'))
+        self.assertEqual(10, key_value_filter.total)
+        self.assertEqual(5, after_filter.total)
+
+    def test_batch_only_stages_split_fused_loops(self):
+        transform = PythonexpTransform(
+            {'options': {'python_expressions': ['item.update(double=item["value"] * 2)']}},
+            meta())
+        batch_filter = BatchOnlyFilter({}, meta())
+        grouper = FileKeyGrouper({'options': {'keys': ['country']}}, meta())
+        pipeline = FusedPipeline(as_stages(transform, batch_filter, grouper))
+        self.assertEqual(3, len(pipeline.segments))
+
+        items = list(pipeline.process_batch(get_batch()))
+        self.assertEqual([1, 2, 4, 5, 7, 8], [item['value'] for item in items])
+        self.assertEqual([2, 4, 8, 10, 14, 16], [item['double'] for item in items])
+
+    def test_transforms_can_replace_items(self):
+        transform = PythonMapTransform({'options': {'map': '{"id": item["key"]}'}}, meta())
+        pipeline = FusedPipeline(as_stages(transform))
+        self.assertEqual([{'id': 0}, {'id': 1}], list(pipeline.process_batch(get_batch(2))))
+
+    def test_filter_counts_are_kept_when_batch_is_not_consumed(self):
+        key_value_filter = KeyValueFilter(
+            {'options': {'keys': [{'name': 'country', 'value': 'es'}]}}, meta())
+        pipeline = FusedPipeline(as_stages(key_value_filter))
+        batch = pipeline.process_batch(get_batch())
+        self.assertEqual(1, next(batch)['key'])
+        batch.close()
+        self.assertEqual(1, key_value_filter.get_metadata('filtered_out'))
+        self.assertEqual(2, key_value_filter.total)
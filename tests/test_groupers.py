@@ -1,7 +1,9 @@
 import random
 import unittest
 from exporters.groupers.base_grouper import BaseGrouper
+from exporters.exceptions import ConfigurationError
 from exporters.groupers.file_key_grouper import FileKeyGrouper
+from exporters.groupers.hash_partition_grouper import HashPartitionGrouper
 from exporters.groupers.python_exp_grouper import PythonExpGrouper
 from exporters.records.base_record import BaseRecord
 
@@ -178,3 +180,42 @@ class PythonExpGrouperTest(unittest.TestCase):
         grouped = grouper.group_batch(batch)
         with self.assertRaises(Exception):
             next(grouped)
+
+
+class HashPartitionGrouperTest(unittest.TestCase):
+    def get_grouper(self, **options):
+        return HashPartitionGrouper({'options': options})
+
+    def test_items_are_grouped_in_stable_partitions(self):
+        grouper = self.get_grouper(keys=['country_code', 'state'], partitions=12)
+        batch = get_batch()
+        partitions = {}
+        for item in grouper.group_batch(batch):
+            self.assertEqual(['country_code', 'state'], item.group_key)
+            key = (item['country_code'], item['state'])
+            partitions.setdefault(key, set()).add(item.group_membership)
+        self.assertEqual(9, len(partitions))
+        self.assertTrue(all(len(memberships) == 1 for memberships in partitions.values()))
+
+        other_grouper = self.get_grouper(keys=['country_code', 'state'], partitions=12)
+        item = BaseRecord({'country_code': u'es', 'state': 'madrid'})
+        self.assertEqual(partitions[('es', 'madrid')],
+                         {other_grouper.apply(item).group_membership})
+
+    def test_partition_names_are_zero_padded(self):
+        grouper = self.get_grouper(keys=['key'], partitions=100)
+        memberships = {item.group_membership for item in grouper.group_batch(get_batch())}
+        self.assertTrue(all(len(name) == 2 for name, in memberships))
+        self.assertTrue(all(0 <= int(name) < 100 for name, in memberships))
+
+    def test_partitions_are_evenly_sized(self):
+        grouper = self.get_grouper(keys=['key'], partitions=4)
+        sizes = {}
+        for item in grouper.group_batch(get_batch(4000)):
+            sizes[item.group_membership] = sizes.get(item.group_membership, 0) + 1
+        self.assertEqual(4, len(sizes))
+        self.assertTrue(all(800 < size < 1200 for size in sizes.values()))
+
+    def test_invalid_partitions(self):
+        with self.assertRaises(ConfigurationError):
+            self.get_grouper(keys=['key'], partitions=0)
@@ -1,3 +1,5 @@
+import copy
+import json
 from gzip import GzipFile
 
 from exporters.readers import FSReader
@@ -153,6 +155,123 @@ class FSReaderTest(object):
         }})
         assert list(reader.get_next_batch()) == [{"foo": 1}, {"bar": 1}]
 
+    def test_nested_dirs_read_in_path_order(self, tmpdir_with_nested_dirs):
+        reader = self._make_fs_reader({'input': {
+            'dir': tmpdir_with_nested_dirs.strpath,
+        }})
+        assert list(reader.get_next_batch()) == [
+            {"name": "a-"}, {"name": "a.jl.gz"}, {"name": "a/b.jl.gz"},
+            {"name": "a/c/d.jl.gz"}, {"name": "a0"},
+        ]
+
+    def test_resume_from_directory_cursor(self, tmpdir_with_nested_dirs):
+        reader = self._make_fs_reader({'input': {
+            'dir': tmpdir_with_nested_dirs.strpath,
+        }})
+        reader.set_last_position({'fs_cursor': {
+            'unit': 0, 'path': tmpdir_with_nested_dirs.join('a', 'b.jl.gz').strpath,
+        }})
+        assert list(reader.get_next_batch()) == [{"name": "a/c/d.jl.gz"}, {"name": "a0"}]
+        assert reader.get_last_position()['fs_cursor'] == {
+            'unit': 0, 'path': tmpdir_with_nested_dirs.join('a0').strpath,
+        }
+        assert reader.get_last_position()['readed_streams'] == []
+
+    def test_incremental_manifest_skips_read_files(self, tmpdir_with_nested_dirs, tmpdir):
+        options = {
+            'input': {'dir': tmpdir_with_nested_dirs.strpath},
+            'incremental_manifest': tmpdir.join('.manifest').strpath,
+        }
+        reader = self._make_fs_reader(options)
+        assert len(list(reader.get_next_batch())) == 5
+        reader.finish_reading()
+        reader.close()
+
+        changed = tmpdir_with_nested_dirs.join('a', 'b.jl.gz')
+        _write_gzipped_item(changed, {'name': 'a/b.jl.gz', 'changed': True})
+        changed.setmtime(changed.mtime() + 10)
+        _write_gzipped_item(tmpdir_with_nested_dirs.join('new.jl.gz'), {'name': 'new.jl.gz'})
+
+        reader = self._make_fs_reader(options)
+        assert list(reader.get_next_batch()) == [
+            {'name': 'a/b.jl.gz', 'changed': True}, {'name': 'new.jl.gz'},
+        ]
+        reader.close()
+
+    def test_incremental_manifest_after_resume(self, tmpdir_with_nested_dirs, tmpdir):
+        options = {
+            'input': {'dir': tmpdir_with_nested_dirs.strpath},
+            'incremental_manifest': tmpdir.join('.manifest').strpath,
+            'batch_size': 2,
+        }
+        reader = self._make_fs_reader(options)
+        assert len(list(reader.get_next_batch())) == 2
+        position = copy.deepcopy(reader.get_last_position())
+        assert position['manifest_row'] == 1
+        # read after the position, so forgotten when resuming it
+        assert len(list(reader.get_next_batch())) == 2
+        assert reader.get_last_position()['manifest_row'] == 3
+        reader.close()
+
+        reader = FSReader({'name': 'exporters.readers.fs_reader.FSReader',
+                           'options': options}, meta())
+        reader.set_last_position(position)
+        assert len(list(reader.get_next_batch())) == 2
+        assert len(list(reader.get_next_batch())) == 2
+        assert list(reader.get_next_batch()) == []
+        reader.finish_reading()
+        reader.close()
+
+        # streams read before and after resuming are in the manifest
+        reader = self._make_fs_reader(options)
+        assert list(reader.get_next_batch()) == []
+        reader.close()
+
+    def test_incremental_manifest_without_position(self, tmpdir_with_nested_dirs, tmpdir):
+        # as the stream bypass does
+        options = {
+            'input': {'dir': tmpdir_with_nested_dirs.strpath},
+            'incremental_manifest': tmpdir.join('.manifest').strpath,
+        }
+        reader = FSReader({'name': 'exporters.readers.fs_reader.FSReader',
+                           'options': options}, meta())
+        for stream in reader.get_read_streams():
+            reader.add_stream_to_manifest(stream.filename)
+        reader.finish_reading()
+        reader.close()
+
+        reader = self._make_fs_reader(options)
+        assert list(reader.get_next_batch()) == []
+        reader.close()
+
+    def test_incremental_manifest_not_updated_until_finished(
+            self, tmpdir_with_nested_dirs, tmpdir):
+        options = {
+            'input': {'dir': tmpdir_with_nested_dirs.strpath},
+            'incremental_manifest': tmpdir.join('.manifest').strpath,
+        }
+        reader = self._make_fs_reader(options)
+        assert len(list(reader.get_next_batch())) == 5
+        reader.close()
+
+        reader = self._make_fs_reader(options)
+        assert len(list(reader.get_next_batch())) == 5
+        reader.close()
+
+
+def _write_gzipped_item(path, item):
+    with GzipFile(path.strpath, 'w') as zf:
+        zf.write(json.dumps(item))
+
+
+@pytest.fixture
+def tmpdir_with_nested_dirs(tmpdir):
+    for name in ['a-', 'a.jl.gz', 'a/b.jl.gz', 'a/c/d.jl.gz', 'a0']:
+        path = tmpdir.join(*name.split('/'))
+        path.dirpath().ensure(dir=True)
+        _write_gzipped_item(path, {'name': name})
+    return tmpdir
+
 
 @pytest.fixture
 def tmpdir_with_dotfiles(tmpdir):
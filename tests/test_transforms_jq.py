@@ -40,3 +40,22 @@ class JqTransformTest(unittest.TestCase):
     def test_invalid_jq_expression(self):
         with self.assertRaisesRegexp(ValueError, "jq: 1 compile error"):
             JQTransform({'options': {'jq_filter': 'blah'}})
+
+    def test_transform_batch_in_several_chunks(self):
+        jq_filter = 'select(.value % 2 == 0) | {value}'
+        transform = JQTransform({'options': {'jq_filter': jq_filter, 'batch_size': 3}})
+        batch = [BaseRecord({'name': 'item%d' % i, 'value': i}) for i in range(10)]
+        expected = [{'value': i} for i in range(0, 10, 2)]
+        self.assertEqual(expected, list(transform.transform_batch(batch)))
+
+    def test_only_first_output_is_kept_for_each_item(self):
+        batch = [BaseRecord({'values': [1, 2]}), BaseRecord({'values': []}),
+                 BaseRecord({'values': [3]})]
+        transform = JQTransform({'options': {'jq_filter': '.values[] | {value: .}'}})
+        expected = [{'value': 1}, {'value': 3}]
+        self.assertEqual(expected, list(transform.transform_batch(batch)))
+
+    def test_transform_with_serialized_output(self):
+        transform = JQTransform({'options': {'jq_filter': '{country: .country_code} | tojson'}})
+        expected = [{'country': 'es'}, {'country': 'uk'}]
+        self.assertEqual(expected, list(transform.transform_batch(self.batch)))
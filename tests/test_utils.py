@@ -1,3 +1,5 @@
+import math
+import mock
 import unittest
 
 from exporters.bypasses.base import BaseBypass
@@ -299,6 +301,31 @@ class PythonInterpreterTest(unittest.TestCase):
         with self.assertRaises(InvalidExpression):
             self.interpreter.check('2+2; 5+6')
 
+    def test_expressions_are_checked_once(self):
+        with mock.patch.object(self.interpreter, 'check',
+                               wraps=self.interpreter.check) as check:
+            for i in range(3):
+                self.assertEqual(i + 1, self.interpreter.eval('item + 1', {'item': i}))
+        self.assertEqual(1, check.call_count)
+
+    def test_not_allowed_expression_is_not_cached(self):
+        for _ in range(2):
+            with self.assertRaises(InvalidExpression):
+                self.interpreter.eval('lambda: 1', {})
+
+    def test_eval_batch(self):
+        items = [{'a': 1}, {'a': 2}]
+        results = list(self.interpreter.eval_batch(
+            ["item['a'] * 2", "math.sqrt(item['a'] * factor)"], items, factor=8))
+        self.assertEqual([(items[0], [2, math.sqrt(8)]), (items[1], [4, 4.0])], results)
+
+    def test_eval_batch_names_dont_leak_between_items(self):
+        items = [{'a': [1]}, {'a': []}]
+        results = self.interpreter.eval_batch(["[x for x in item['a']] or x"], items)
+        self.assertEqual((items[0], [[1]]), next(results))
+        with self.assertRaises(NameError):
+            next(results)
+
 
 class BaseByPassTest(unittest.TestCase):
     def test_not_implemented(self):
@@ -2,27 +2,41 @@ import bz2
 import csv
 import datetime
 import gzip
+import hashlib
+import io
 import json
 import os
 import random
 import shutil
+import struct
 import tempfile
+import threading
 import unittest
+import zipfile
+import zlib
 import mock
 from contextlib import closing
 from freezegun import freeze_time
+from exporters.compression import get_compress_file, ParallelGzipFile
+from exporters.decompressors import ZLibDecompressor
 from exporters.exceptions import ConfigurationError
 from exporters.export_formatter.csv_export_formatter import CSVExportFormatter
+from exporters.export_formatter.avro_export_formatter import AvroExportFormatter
+from exporters.export_formatter.parquet_export_formatter import ParquetExportFormatter
 from exporters.export_formatter.xml_export_formatter import XMLExportFormatter
 from exporters.records.base_record import BaseRecord
-from exporters.write_buffer import WriteBuffer, GroupingBufferFilesTracker
+from exporters.utils import calculate_multipart_etag
+from exporters.write_buffer import (
+    WriteBuffer, GroupingBufferFilesTracker, FileDigests, hash_for_file, new_hash)
 from exporters.writers import FSWriter
 from exporters.writers.base_writer import BaseWriter, InconsistentWriteState
 from exporters.writers.console_writer import ConsoleWriter
 from exporters.writers.filebase_base_writer import Filebase
 from exporters.export_formatter.json_export_formatter import JsonExportFormatter
 from exporters.groupers import PythonExpGrouper
+from exporters.iterio import IterIO
 from exporters.writers.filebase_base_writer import FilebaseBaseWriter
+from exporters.writers.upload_queue import UploadQueue
 from .utils import meta
 
 
@@ -123,6 +137,40 @@ class CustomWriterTest(unittest.TestCase):
         finally:
             writer.close()
 
+    def test_grouped_batch_is_written_by_buffer_size(self):
+        # given:
+        formatter = JsonExportFormatter({'options': {'jsonlines': False}}, meta())
+        writer = FakeWriter({'options': {'items_per_buffer_write': 3}},
+                            export_formatter=formatter)
+        batch = []
+        for i in range(7):
+            item = BaseRecord({'key': i})
+            item.group_membership = ('even',) if i % 2 == 0 else ('odd',)
+            batch.append(item)
+        written = []
+
+        def write(path, key):
+            with gzip.open(path) as f:
+                written.append((key, f.read()))
+
+        # when:
+        try:
+            with mock.patch.object(writer, 'write', side_effect=write):
+                writer.write_batch(batch)
+                writer.flush()
+        finally:
+            writer.close()
+
+        # then:
+        def expected_file(keys):
+            return '[' + ',\n'.join(json.dumps({'key': key}) for key in keys) + '\n]'
+        self.assertEqual(sorted([
+            (('even',), expected_file([0, 2, 4])),
+            (('odd',), expected_file([1, 3, 5])),
+            (('even',), expected_file([6])),
+        ]), sorted(written))
+        self.assertEqual(7, writer.get_metadata('items_count'))
+
     def test_custom_writer_with_csv_formatter(self):
         # given:
 
@@ -318,6 +366,204 @@ class WriteBufferTest(unittest.TestCase):
                          'Wrong metadata')
         self.assertIsNone(self.write_buffer.get_metadata('somekey', 'nokey'))
 
+    def test_buffer_size_is_counted_without_stat_calls(self):
+        with mock.patch('exporters.write_buffer.os.path.getsize') as getsize:
+            for i in range(500):
+                item = BaseRecord({'key': i, 'value': os.urandom(100).encode('hex')})
+                item.group_membership = ('group',)
+                self.write_buffer.buffer(item)
+                self.write_buffer.should_write_buffer(('group',))
+        self.assertFalse(getsize.called)
+        self.assertTrue(self.write_buffer.should_write_buffer(('group',)))
+
+        write_info = self.write_buffer.pack_buffer(('group',))
+        with gzip.open(write_info['file_path']) as f:
+            content = f.read()
+        self.assertEqual(len(content), write_info['uncompressed_size'])
+        self.assertEqual(os.path.getsize(write_info['file_path']), write_info['size'])
+
+    def _write_grouped_items(self, compression_format, max_open_files):
+        formatter = JsonExportFormatter({'options': {'jsonlines': False}}, meta())
+        files_tracker = GroupingBufferFilesTracker(
+            formatter, compression_format, max_open_files=max_open_files)
+        write_buffer = WriteBuffer(1000, 0, files_tracker, compression_format)
+        for i in range(50):
+            item = BaseRecord({'key': i})
+            item.group_membership = (str(i % 10),)
+            write_buffer.buffer(item)
+            self.assertLessEqual(len(files_tracker.open_files), max_open_files)
+        return write_buffer
+
+    def test_buffer_files_for_many_groups_are_reopened(self):
+        def open_zip(path):
+            return closing(zipfile.ZipFile(path).open(os.path.basename(path)[:-4]))
+
+        open_functions = {'gz': gzip.open, 'zip': open_zip, 'none': open}
+        for compression_format, open_function in open_functions.items():
+            write_buffer = self._write_grouped_items(compression_format, max_open_files=3)
+            try:
+                for group in range(10):
+                    write_info = write_buffer.pack_buffer((str(group),))
+                    self.assertEqual(5, write_info['number_of_records'])
+                    with open_function(write_info['file_path']) as f:
+                        items = json.loads(f.read())
+                    self.assertEqual([{'key': i} for i in range(group, 50, 10)], items)
+            finally:
+                write_buffer.close()
+
+    def test_open_buffer_files_are_discarded_on_close(self):
+        for compression_format in ['gz', 'zip', 'bz2', 'zstd', 'lz4', 'none']:
+            formatter = JsonExportFormatter({}, meta())
+            files_tracker = GroupingBufferFilesTracker(
+                formatter, compression_format, memory_buffer_size=2000)
+            write_buffer = WriteBuffer(1000, 0, files_tracker, compression_format)
+            for group in ['a', 'b']:
+                item = BaseRecord({'key': 1})
+                item.group_membership = (group,)
+                write_buffer.buffer(item)
+            with mock.patch('exporters.compression.CountingFile.spill') as spill:
+                files_tracker.close()
+            self.assertFalse(spill.called)
+            self.assertFalse(os.path.exists(files_tracker.tmp_folder))
+
+    def test_buffer_files_are_hashed_while_written(self):
+        for compression_format in ['gz', 'zip', 'none']:
+            formatter = JsonExportFormatter({}, meta())
+            files_tracker = GroupingBufferFilesTracker(
+                formatter, compression_format, max_open_files=2,
+                hash_algorithm='md5', hash_part_size=100)
+            write_buffer = WriteBuffer(1000, 0, files_tracker, compression_format, 'md5')
+            try:
+                for i in range(300):
+                    item = BaseRecord({'key': i, 'value': os.urandom(10).encode('hex')})
+                    item.group_membership = (str(i % 3),)
+                    write_buffer.buffer(item)
+                for group in range(3):
+                    with mock.patch('exporters.write_buffer.hash_for_file') as hash_file:
+                        write_info = write_buffer.pack_buffer((str(group),))
+                    self.assertFalse(hash_file.called)
+                    file_path = write_info['file_path']
+                    self.assertEqual(hash_for_file(file_path, 'md5'), write_info['file_hash'])
+                    self.assertEqual(calculate_multipart_etag(file_path, 100),
+                                     write_info['multipart_etag'])
+            finally:
+                write_buffer.close()
+
+    def test_small_buffer_files_are_kept_in_memory(self):
+        formatter = JsonExportFormatter({}, meta())
+        files_tracker = GroupingBufferFilesTracker(
+            formatter, 'gz', max_open_files=2, hash_algorithm='md5',
+            memory_buffer_size=2000)
+        write_buffer = WriteBuffer(1000, 0, files_tracker, 'gz', 'md5')
+        try:
+            for group, count, size in [('evicted', 5, 10), ('small', 30, 10), ('large', 100, 100)]:
+                for i in range(count):
+                    item = BaseRecord({'key': i, 'value': os.urandom(size).encode('hex')})
+                    item.group_membership = (group,)
+                    write_buffer.buffer(item)
+
+            write_info = write_buffer.pack_buffer(('small',))
+            self.assertTrue(write_buffer.is_in_memory(write_info['file_path']))
+            self.assertFalse(os.path.exists(write_info['file_path']))
+            with write_buffer.open_buffer_file(write_info['file_path']) as f:
+                content = f.read()
+            self.assertEqual(len(content), write_info['size'])
+            self.assertEqual(hashlib.md5(content).hexdigest(), write_info['file_hash'])
+            items = gzip.GzipFile(fileobj=io.BytesIO(content)).read().splitlines()
+            self.assertEqual(30, len(items))
+            write_buffer.clean_tmp_files(write_info)
+            self.assertFalse(write_buffer.is_in_memory(write_info['file_path']))
+
+            # files are moved to disk when they grow, or when they are suspended
+            for group, count in [('large', 100), ('evicted', 5)]:
+                write_info = write_buffer.pack_buffer((group,))
+                self.assertFalse(write_buffer.is_in_memory(write_info['file_path']))
+                with gzip.open(write_info['file_path']) as f:
+                    self.assertEqual(count, len(f.read().splitlines()))
+                self.assertEqual(hash_for_file(write_info['file_path'], 'md5'),
+                                 write_info['file_hash'])
+        finally:
+            write_buffer.close()
+
+    def test_file_digests(self):
+        content = os.urandom(1000)
+        for algorithm, expected in [('md5', hashlib.md5(content).hexdigest()),
+                                    ('crc32', '{:08x}'.format(zlib.crc32(content) & 0xffffffff))]:
+            digests = FileDigests(algorithm, part_size=300)
+            for start in range(0, 1000, 70):
+                digests.update(content[start:start + 70])
+            self.assertEqual(expected, digests.hexdigest())
+            part_digests = b''.join(hashlib.md5(content[start:start + 300]).digest()
+                                    for start in range(0, 1000, 300))
+            self.assertEqual('"{}-4"'.format(hashlib.md5(part_digests).hexdigest()),
+                             digests.multipart_etag())
+
+    def test_crc32c_hash(self):
+        hash = new_hash('crc32c')
+        hash.update(b'1234')
+        hash.update(b'56789')
+        self.assertEqual('e3069283', hash.hexdigest())
+        hash = new_hash('crc32c')
+        hash.update(b'\xff' * 32)
+        self.assertEqual('62a8ab43', hash.hexdigest())
+
+    def test_grouping_info_keeps_only_current_path(self):
+        write_buffer = self._write_grouped_items('gz', max_open_files=3)
+        try:
+            group_info = write_buffer.grouping_info[('1',)]
+            self.assertEqual(1, group_info['file_count'])
+            self.assertTrue(os.path.exists(group_info['current_path']))
+            self.assertNotIn('group_file', group_info)
+        finally:
+            write_buffer.close()
+
+
+class UploadQueueTest(unittest.TestCase):
+
+    def test_bytes_in_flight_are_bounded(self):
+        uploads = UploadQueue(2, max_bytes_in_flight=100)
+        started = []
+        try:
+            for i in range(5):
+                uploads.submit(started.append, 60, i)
+                self.assertLessEqual(uploads.bytes_in_flight, 100)
+            # a file bigger than the limit is still accepted
+            uploads.submit(started.append, 1000, 5)
+            self.assertEqual(1000, uploads.bytes_in_flight)
+            uploads.wait()
+            self.assertEqual(0, uploads.bytes_in_flight)
+            self.assertEqual(list(range(6)), sorted(started))
+        finally:
+            uploads.close()
+
+    def test_callbacks_wait_for_previous_uploads(self):
+        uploads = UploadQueue(2, max_bytes_in_flight=1000)
+        done = []
+        try:
+            uploads.when_done(lambda: done.append('first'))
+            self.assertEqual(['first'], done)
+            uploads.submit(done.append, 10, 'upload')
+            uploads.when_done(lambda: done.append('second'))
+            uploads.wait()
+            self.assertEqual(['first', 'upload', 'second'], done)
+        finally:
+            uploads.close()
+
+    def test_upload_errors_are_raised(self):
+        def upload(path):
+            raise IOError('Could not upload ' + path)
+
+        uploads = UploadQueue(1, max_bytes_in_flight=1000)
+        done = []
+        try:
+            uploads.submit(upload, 10, 'some_file')
+            uploads.when_done(lambda: done.append(True))
+            with self.assertRaisesRegexp(IOError, 'Could not upload some_file'):
+                uploads.wait()
+            self.assertEqual([], done)
+        finally:
+            uploads.close()
+
 
 class ConsoleWriterTest(unittest.TestCase):
     def setUp(self):
@@ -491,7 +737,6 @@ class FSWriterTest(unittest.TestCase):
         expected_file = '{}/exporter_test0000.jl.zip'.format(self.tmp_dir)
         self.assertTrue(expected_file in writer.written_files)
 
-        import zipfile
         written = []
         with zipfile.ZipFile(expected_file) as z:
             with z.open('exporter_test0000.jl') as f:
@@ -499,6 +744,46 @@ class FSWriterTest(unittest.TestCase):
                     written.append(json.loads(line))
         self.assertEqual(written, self.get_batch())
 
+    def test_compression_zip64_format(self):
+        path = os.path.join(self.tmp_dir, 'exporter_test.jl.zip')
+        content = ''.join(json.dumps({'key': i}) + '\n' for i in range(1000))
+        with mock.patch('zipfile.ZIP64_LIMIT', 100):
+            compressed_file = get_compress_file('zip')(path)
+            compressed_file.write(content)
+            compressed_file.close()
+        with zipfile.ZipFile(path) as z:
+            self.assertEqual(content, z.read('exporter_test.jl'))
+            self.assertEqual(len(content), z.getinfo('exporter_test.jl').file_size)
+        with open(path, 'rb') as f:
+            self.assertIn(zipfile.stringEndArchive64, f.read())
+
+    def test_compression_zip_local_header(self):
+        path = os.path.join(self.tmp_dir, 'exporter_test.jl.zip')
+        content = ''.join(json.dumps({'key': i}) + '\n' for i in range(1000))
+        for zip64_limit in [zipfile.ZIP64_LIMIT, 100]:
+            with mock.patch('zipfile.ZIP64_LIMIT', zip64_limit):
+                compressed_file = get_compress_file('zip')(path)
+                compressed_file.write(content)
+                compressed_file.close()
+            with open(path, 'rb') as f:
+                data = f.read()
+            header_size = struct.calcsize(zipfile.structFileHeader)
+            header = struct.unpack(zipfile.structFileHeader, data[:header_size])
+            # version needed, flags and the sizes, left for the zip64 extra field
+            self.assertEqual((45, 0x08), (header[1], header[3]))
+            self.assertEqual((0xffffffff, 0xffffffff), header[8:10])
+            name_length, extra_length = header[10:12]
+            extra = data[header_size + name_length:header_size + name_length + extra_length]
+            self.assertEqual((1, 16, 0, 0), struct.unpack('<HHQQ', extra))
+            with zipfile.ZipFile(path) as z:
+                info = z.getinfo('exporter_test.jl')
+                self.assertEqual(content, z.read('exporter_test.jl'))
+            # the data descriptor has 8 byte sizes
+            descriptor_offset = header_size + name_length + extra_length + info.compress_size
+            self.assertEqual(
+                (b'PK\x07\x08', info.CRC, info.compress_size, len(content)),
+                struct.unpack('<4sLQQ', data[descriptor_offset:descriptor_offset + 24]))
+
     def test_compression_bz2_format(self):
         writer_config = self.get_writer_config()
         writer_config['options'].update({'compression': 'bz2'})
@@ -537,6 +822,279 @@ class FSWriterTest(unittest.TestCase):
                 written.append(json.loads(line))
         self.assertEqual(written, self.get_batch())
 
+    def test_compression_gzip_level(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'compression': 'gz', 'compression_level': 1})
+        writer = FSWriter(writer_config, meta())
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.jl.gz'.format(self.tmp_dir)
+        with gzip.open(expected_file, 'r') as fin:
+            written = [json.loads(line) for line in fin]
+        self.assertEqual(written, self.get_batch())
+
+        content = ''.join(json.dumps({'key': i, 'value': i % 7}) for i in range(10000))
+        sizes = []
+        for level in [1, None]:
+            path = os.path.join(self.tmp_dir, 'level_{}.gz'.format(level))
+            compressed_file = get_compress_file('gz')(path, compression_level=level)
+            compressed_file.write(content)
+            compressed_file.close()
+            sizes.append(os.path.getsize(path))
+        fastest_size, default_size = sizes
+        self.assertGreater(fastest_size, default_size)
+
+    def test_compression_gzip_threads(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'compression': 'gz', 'compression_threads': 3})
+        writer = FSWriter(writer_config, meta())
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.jl.gz'.format(self.tmp_dir)
+        with gzip.open(expected_file, 'r') as fin:
+            written = [json.loads(line) for line in fin]
+        self.assertEqual(written, self.get_batch())
+
+    def test_parallel_gzip_blocks(self):
+        path = os.path.join(self.tmp_dir, 'parallel.gz')
+        parts = []
+        # a resumed file gets a new gzip member
+        for _ in range(2):
+            compressed_file = ParallelGzipFile(path, compression_threads=2, block_size=1000)
+            for i in range(500):
+                part = json.dumps({'key': i, 'value': random.random()}) + '\n'
+                compressed_file.write(part)
+                parts.append(part)
+            compressed_file.close()
+            self.assertEqual(os.path.getsize(path), compressed_file.compressed_size)
+        with gzip.open(path, 'r') as fin:
+            self.assertEqual(''.join(parts), fin.read())
+        with open(path, 'rb') as fin:
+            decompressed = ZLibDecompressor({}, None).decompress(IterIO(fin))
+            self.assertEqual(''.join(parts), ''.join(decompressed))
+
+    def test_compression_zstd_format(self):
+        import zstandard
+        dictionary = zstandard.train_dictionary(
+            1024, [json.dumps({'key': i, 'value': random.random()}) for i in range(1000)])
+        dictionary_path = os.path.join(self.tmp_dir, 'dictionary')
+        with open(dictionary_path, 'wb') as f:
+            f.write(dictionary.as_bytes())
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({
+            'compression': 'zstd', 'compression_level': 5,
+            'compression_dictionary': dictionary_path})
+        writer = FSWriter(writer_config, meta())
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.jl.zst'.format(self.tmp_dir)
+        self.assertTrue(expected_file in writer.written_files)
+
+        decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+        with open(expected_file, 'rb') as fin:
+            content = decompressor.stream_reader(fin, read_across_frames=True).read()
+        written = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(written, self.get_batch())
+
+    def test_compression_lz4_format(self):
+        import lz4.frame
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'compression': 'lz4'})
+        writer = FSWriter(writer_config, meta())
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.jl.lz4'.format(self.tmp_dir)
+        self.assertTrue(expected_file in writer.written_files)
+
+        with lz4.frame.open(expected_file, 'rb') as fin:
+            written = [json.loads(line) for line in fin.read().splitlines()]
+        self.assertEqual(written, self.get_batch())
+
+    def test_invalid_compression_options(self):
+        options = self.get_writer_config()
+        options['options'].update({'compression': 'gz', 'compression_level': 10})
+        self.assertRaisesRegexp(ConfigurationError,
+                                'The compression_level for "gz" must be between 0 and 9',
+                                FilebaseBaseWriter, options, meta())
+        options['options'].update({'compression': 'none', 'compression_level': 1})
+        self.assertRaisesRegexp(ConfigurationError,
+                                'does not support compression_level',
+                                FilebaseBaseWriter, options, meta())
+        options['options'].update({'compression': 'gz', 'compression_level': None,
+                                   'compression_dictionary': '/tmp/dictionary'})
+        self.assertRaisesRegexp(ConfigurationError,
+                                'can only be used with zstd',
+                                FilebaseBaseWriter, options, meta())
+        options['options'].update({'compression': 'zip', 'compression_dictionary': None,
+                                   'compression_threads': 2})
+        self.assertRaisesRegexp(ConfigurationError,
+                                'can only be used with gz',
+                                FilebaseBaseWriter, options, meta())
+
+    def test_parquet_format(self):
+        import pyarrow.parquet as pq
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({
+            'filebase': '{}/{{groups[0]}}/exporter_test'.format(self.tmp_dir),
+            'max_open_group_files': 1,
+        })
+        formatter = ParquetExportFormatter({'options': {'row_group_size': 2}}, meta())
+        writer = FSWriter(writer_config, meta(), export_formatter=formatter)
+        batch = self.get_batch() + self.get_batch()
+        for i, item in enumerate(batch):
+            item.group_membership = ('group{}'.format(i % 2),)
+        try:
+            writer.write_batch(batch)
+            writer.flush()
+        finally:
+            writer.close()
+        self.assertEqual(2, len(writer.written_files))
+        for path in writer.written_files:
+            self.assertTrue(path.endswith('.parquet'))
+            table = pq.read_table(path)
+            self.assertEqual(2, table.num_rows)
+
+    def test_parquet_format_with_more_groups_than_open_files(self):
+        import pyarrow.parquet as pq
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({
+            'filebase': '{}/{{groups[0]}}/exporter_test'.format(self.tmp_dir),
+            'max_open_group_files': 2,
+        })
+        formatter = ParquetExportFormatter({}, meta())
+        writer = FSWriter(writer_config, meta(), export_formatter=formatter)
+        try:
+            for i in range(5):
+                batch = [BaseRecord({'value': i * 5 + group}) for group in range(5)]
+                for item in batch:
+                    item.group_membership = ('group{}'.format(item['value'] % 5),)
+                writer.write_batch(batch)
+                open_files = writer.write_buffer.items_group_files.open_files
+                self.assertLessEqual(len(open_files), 2)
+            writer.flush()
+        finally:
+            writer.close()
+        values = []
+        for group in range(5):
+            group_files = sorted(path for path in writer.written_files
+                                 if '/group{}/'.format(group) in path)
+            self.assertEqual(['{}/group{}/exporter_test{:04d}.parquet'.format(
+                self.tmp_dir, group, number) for number in range(len(group_files))],
+                group_files)
+            for path in group_files:
+                values.extend(pq.read_table(path).to_pydict()['value'])
+        self.assertEqual(range(25), sorted(values))
+
+    def test_avro_format(self):
+        import fastavro
+        formatter = AvroExportFormatter({}, meta())
+        writer = FSWriter(self.get_writer_config(), meta(), export_formatter=formatter)
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.avro'.format(self.tmp_dir)
+        self.assertIn(expected_file, writer.written_files)
+        with open(expected_file, 'rb') as f:
+            self.assertEqual(self.get_batch(), list(fastavro.reader(f)))
+
+    def test_parquet_format_is_not_compressed_again(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'compression': 'gz'})
+        formatter = ParquetExportFormatter({}, meta())
+        self.assertRaisesRegexp(ConfigurationError,
+                                'ParquetExportFormatter files are already compressed',
+                                FSWriter, writer_config, meta(), export_formatter=formatter)
+
+    def test_upload_threads(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({
+            'upload_threads': 2,
+            'max_upload_bytes_in_flight': 100,
+            'items_per_buffer_write': 2,
+        })
+        writer = FSWriter(writer_config, meta())
+        committed = []
+        try:
+            for i in range(3):
+                writer.write_batch(self.get_batch())
+                writer.when_written(lambda i=i: committed.append(i))
+            writer.flush()
+            writer.finish_writing()
+        finally:
+            writer.close()
+        self.assertEqual([0, 1, 2], committed)
+        self.assertEqual(3, len(writer.written_files))
+        for number in range(3):
+            expected_file = '{}/exporter_test{:04d}.jl.gz'.format(self.tmp_dir, number)
+            self.assertIn(expected_file, writer.written_files)
+            with gzip.open(expected_file) as f:
+                self.assertEqual(self.get_batch(), [json.loads(line) for line in f])
+
+    def test_metadata_is_appended_holding_the_lock(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'upload_threads': 2})
+        writer = FSWriter(writer_config, meta())
+        try:
+            with writer.metadata_lock:
+                thread = threading.Thread(
+                    target=writer.append_metadata, args=('files_written', 'file'))
+                thread.start()
+                thread.join(0.1)
+                self.assertEqual([], writer.get_metadata('files_written'))
+            thread.join()
+            self.assertEqual(['file'], writer.get_metadata('files_written'))
+        finally:
+            writer.close()
+
+    def test_memory_buffers_not_supported(self):
+        options = self.get_writer_config()
+        options['options']['memory_buffer_size'] = 1000
+        self.assertRaisesRegexp(ConfigurationError,
+                                'FSWriter does not support memory_buffer_size',
+                                FSWriter, options, meta())
+
+    def test_hash_algorithm(self):
+        writer_config = self.get_writer_config()
+        writer_config['options'].update({'hash_algorithm': 'crc32c'})
+        writer = FSWriter(writer_config, meta())
+        try:
+            writer.write_batch(self.get_batch())
+            writer.flush()
+        finally:
+            writer.close()
+        expected_file = '{}/exporter_test0000.jl.gz'.format(self.tmp_dir)
+        self.assertEqual([hash_for_file(expected_file, 'crc32c')],
+                         [info['file_hash'] for info in writer.write_buffer.metadata.values()])
+
+    def test_invalid_hash_algorithm(self):
+        options = self.get_writer_config()
+        options['options']['hash_algorithm'] = 'unknown'
+        self.assertRaisesRegexp(ConfigurationError,
+                                'Unknown hash algorithm "unknown"',
+                                FSWriter, options, meta())
+        options['options'].update({'hash_algorithm': 'sha1', 'generate_md5': True})
+        self.assertRaisesRegexp(ConfigurationError,
+                                'the hash algorithm must be md5',
+                                FSWriter, options, meta())
+
     def test_invalid_compression_format(self):
         options = self.get_writer_config()
         options['options']['compression'] = 'unknown'